@@ -0,0 +1,6 @@
+"""
+Offline performance benchmarks for the Propylon Document Manager API.
+
+Each module is runnable with ``python -m benchmarks.<module>`` from the
+repository root and writes JSON results that can be compared across commits.
+"""
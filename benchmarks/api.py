@@ -0,0 +1,166 @@
+"""
+Latency benchmarks for the API hot paths.
+
+Builds a seeded synthetic corpus in a throwaway test database and times the
+file listing, shared-with-me, upload, download (by token and by signed URL)
+and compare endpoints through the Django test client, recording queries per
+request and p50/p95/p99.
+
+    python -m benchmarks.api --users 10 --files 50 --versions 3 --output bench.json
+    python -m benchmarks.api --compare bench.json    # exit 1 on p95 regressions
+"""
+import argparse
+import json
+import random
+import sys
+
+from benchmarks import harness
+
+
+def build_scenarios(corpus, rng):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    from propylon_document_manager.file_versions.models import FileVersion
+    from propylon_document_manager.utils.signed_urls import sign_download
+
+    users = corpus["users"]
+    tokens = {user.pk: Token.objects.create(user=user).key for user in users}
+    clients = {}
+    for user in users:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {tokens[user.pk]}")
+        clients[user.pk] = client
+
+    def pick_user():
+        return rng.choice(users)
+
+    def pick_root():
+        owner = pick_user()
+        return owner, rng.choice(corpus["roots"][owner.email])
+
+    def list_files(_):
+        response = clients[pick_user().pk].get("/api/file_versions/")
+        assert response.status_code == 200, response.status_code
+
+    def shared_with_me(_):
+        response = clients[pick_user().pk].get("/api/file_versions/shared-with-me/")
+        assert response.status_code == 200, response.status_code
+
+    def upload(index):
+        owner, root = pick_root()
+        payload = f"benchmark upload {index} {rng.random()}\n".encode() * 64
+        response = clients[owner.pk].post(
+            "/api/upload/",
+            {
+                "file": SimpleUploadedFile(root.file_name, payload, content_type="text/plain"),
+                "name": root.file_name,
+                "virtual_path": f"/bench-uploads/{owner.pk}/{index}-{root.file_name}",
+            },
+            format="multipart",
+        )
+        assert response.status_code == 201, response.status_code
+
+    def download(_):
+        owner, root = pick_root()
+        response = clients[owner.pk].get(f"/api/download/{root.virtual_path}/", {"token": tokens[owner.pk]})
+        assert response.status_code == 200, response.status_code
+        b"".join(response.streaming_content)
+        response.close()
+
+    def signed_download(_):
+        owner, root = pick_root()
+        signature, _ = sign_download(root, owner)
+        response = APIClient().get(f"/api/signed/{signature}/{root.file_name}")
+        assert response.status_code == 200, response.status_code
+        b"".join(response.streaming_content)
+        response.close()
+
+    def compare(_):
+        owner, root = pick_root()
+        versions = list(
+            FileVersion.objects.filter(root_file=root).order_by("version_number").values_list("pk", flat=True)
+        )
+        left, right = (versions[0], versions[-1]) if len(versions) > 1 else (versions[0], versions[0])
+        response = clients[owner.pk].get("/api/compare/", {"left_id": left, "right_id": right})
+        assert response.status_code == 200, response.status_code
+
+    def batch(_):
+        owner = pick_user()
+        roots = corpus["roots"][owner.email]
+        sample = rng.sample(roots, min(len(roots), 25))
+        response = clients[owner.pk].post(
+            "/api/file_versions/batch/", {"ids": [root.pk for root in sample]}, format="json"
+        )
+        assert response.status_code == 200, response.status_code
+
+    return {
+        "list": list_files,
+        "shared_with_me": shared_with_me,
+        "upload": upload,
+        "download": download,
+        "signed_download": signed_download,
+        "compare": compare,
+        "batch": batch,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5, help="Number of synthetic users")
+    parser.add_argument("--files", type=int, default=20, help="Root documents per user")
+    parser.add_argument("--versions", type=int, default=3, help="Versions per document")
+    parser.add_argument("--share-ratio", type=float, default=0.25, help="Fraction of documents shared")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed requests per scenario")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for corpus and request selection")
+    parser.add_argument("--scenario", action="append", help="Only run the named scenario (repeatable)")
+    parser.add_argument("--output", default="-", help="Where to write JSON results ('-' for stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against an earlier results file")
+    parser.add_argument("--metric", default="p95_ms", help="Metric used by --compare")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown for --compare")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    harness.setup_django()
+
+    from propylon_document_manager.utils.synthetic_corpus import build_corpus
+
+    with harness.benchmark_environment():
+        corpus = build_corpus(
+            users=args.users,
+            files=args.files,
+            versions=args.versions,
+            share_ratio=args.share_ratio,
+            seed=args.seed,
+        )
+        scenarios = build_scenarios(corpus, random.Random(args.seed))
+        selected = args.scenario or list(scenarios)
+        results = {name: harness.measure(scenarios[name], args.iterations) for name in selected}
+        metadata = harness.run_metadata(
+            users=args.users,
+            files=args.files,
+            versions=args.versions,
+            share_ratio=args.share_ratio,
+            iterations=args.iterations,
+            seed=args.seed,
+        )
+
+    payload = harness.write_results(args.output, metadata, results)
+    harness.print_table(results)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        rows, regressions = harness.compare_results(baseline, payload, args.metric, args.threshold)
+        harness.print_comparison(rows, args.metric)
+        if regressions:
+            sys.stderr.write(f"\nRegressed beyond {args.threshold:.0%}: {', '.join(regressions)}\n")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
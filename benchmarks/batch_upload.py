@@ -0,0 +1,87 @@
+"""
+Files per second through one-file uploads versus /api/upload/batch/.
+
+Uploads ``--files`` small text documents once through ``/api/upload/`` and
+once in batches of ``--batch-size`` through ``/api/upload/batch/``, into a
+throwaway test database. Each run happens in a transaction that is rolled
+back, so post-upload processing (queued until commit) never starts and both
+modes time only the request path.
+
+    python -m benchmarks.batch_upload --files 2000 --batch-size 500
+"""
+import argparse
+import sys
+import time
+
+from benchmarks import harness
+
+
+def run(files, batch_size, repeat):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.db import transaction
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from propylon_document_manager.file_versions.models import User
+
+    user = User.objects.create_user(email="bench-upload@example.com", password="bench")
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def document(run_index, index):
+        name = f"doc-{index:05d}.txt"
+        content = f"benchmark document {run_index} {index}\n".encode() * 32
+        return f"/bench-import/{run_index}/{index // 100}/{name}", SimpleUploadedFile(name, content, "text/plain")
+
+    def single(run_index):
+        for index in range(files):
+            virtual_path, upload = document(run_index, index)
+            response = client.post(
+                "/api/upload/", {"file": upload, "name": upload.name, "virtual_path": virtual_path}, format="multipart"
+            )
+            assert response.status_code == 201, response.status_code
+
+    def batched(run_index):
+        for start in range(0, files, batch_size):
+            documents = [document(run_index, index) for index in range(start, min(start + batch_size, files))]
+            response = client.post(
+                "/api/upload/batch/",
+                {"files": [upload for _, upload in documents], "virtual_paths": [path for path, _ in documents]},
+                format="multipart",
+            )
+            assert response.status_code == 201, response.status_code
+
+    results = {}
+    with override_settings(UPLOAD_BATCH_MAX_FILES=max(batch_size, 1)):
+        for mode, upload in (("single", single), ("batch", batched)):
+            timings = []
+            for run_index in range(repeat):
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    upload(run_index)
+                    timings.append(time.perf_counter() - started)
+                    transaction.set_rollback(True)
+            seconds = min(timings)
+            results[mode] = {"seconds": round(seconds, 3), "files_per_second": round(files / seconds, 1)}
+    results["speedup"] = round(results["single"]["seconds"] / results["batch"]["seconds"], 2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500, help="Documents uploaded per run")
+    parser.add_argument("--batch-size", type=int, default=250, help="Files per batch request")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    harness.setup_django()
+    with harness.benchmark_environment():
+        results = run(args.files, args.batch_size, args.repeat)
+    for mode in ("single", "batch"):
+        print(f"{mode:<8} {results[mode]['seconds']:>8}s {results[mode]['files_per_second']:>10} files/s")
+    print(f"speedup  {results['speedup']}x with {args.batch_size} files per batch")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Shared benchmark plumbing: an offline Django test database, latency sampling,
+percentiles and machine-readable result files that can be diffed across commits.
+"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+def setup_django(settings_module="tests.settings"):
+    """Configure Django for a benchmark run, defaulting to the fast test settings."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def benchmark_environment():
+    """
+    Create a throwaway test database and media root for the duration of the run.
+
+    SQLite settings get an in-memory database; a Postgres ``DATABASES`` entry gets a
+    ``test_`` prefixed database exactly as the test suite would. Post-upload work
+    is always deferred to the background pool, as in production, so results stay
+    comparable across commits whatever ``BACKGROUND_TASKS_EAGER`` says.
+    """
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+    from propylon_document_manager.utils.background import drain
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    media_root = tempfile.mkdtemp(prefix="bench-media-")
+    try:
+        with override_settings(MEDIA_ROOT=media_root, BACKGROUND_TASKS_EAGER=False):
+            yield media_root
+            drain()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples`` (``pct`` in 0-100)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies, queries=None):
+    """Reduce raw per-request samples (seconds) to the numbers recorded in result files."""
+    total = sum(latencies)
+    summary = {
+        "iterations": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "min_ms": round(min(latencies) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput_per_s": round(len(latencies) / total, 2) if total else None,
+    }
+    if queries:
+        summary["queries_mean"] = round(statistics.fmean(queries), 2)
+        summary["queries_max"] = max(queries)
+    return summary
+
+
+def measure(func, iterations, warmup=2, count_queries=True):
+    """
+    Call ``func(i)`` ``iterations`` times and return its latency/query summary.
+
+    ``func`` is timed with ``perf_counter``; when ``count_queries`` is set the
+    queries issued on the default connection are recorded per call. Background
+    work a call queued is drained after it, outside the timing, so it neither
+    counts towards nor competes with the next call.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from propylon_document_manager.utils.background import drain
+
+    for index in range(warmup):
+        func(-index - 1)
+        drain()
+
+    latencies, queries = [], []
+    for index in range(iterations):
+        if count_queries:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                func(index)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured.captured_queries))
+        else:
+            started = time.perf_counter()
+            func(index)
+            latencies.append(time.perf_counter() - started)
+        drain()
+    return summarize(latencies, queries)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**parameters):
+    from django import get_version
+    from django.db import connection
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "django": get_version(),
+        "database": connection.vendor,
+        "platform": platform.platform(),
+        "parameters": parameters,
+    }
+
+
+def write_results(path, metadata, scenarios):
+    payload = {"meta": metadata, "scenarios": scenarios}
+    if path == "-":
+        json.dump(payload, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle, indent=2)
+    return payload
+
+
+def compare_results(baseline, current, metric="p95_ms", threshold=0.2):
+    """
+    Compare two result payloads on ``metric``.
+
+    Returns ``(rows, regressions)`` where each row is ``(scenario, old, new, change)``
+    and ``regressions`` lists the scenarios that got slower by more than ``threshold``.
+    """
+    rows, regressions = [], []
+    for name, result in current["scenarios"].items():
+        old = baseline["scenarios"].get(name, {}).get(metric)
+        new = result.get(metric)
+        change = (new - old) / old if old and new is not None else None
+        rows.append((name, old, new, change))
+        if change is not None and change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_table(scenarios, stream=sys.stderr):
+    columns = ["p50_ms", "p95_ms", "p99_ms", "queries_mean", "throughput_per_s"]
+    stream.write(f"{'scenario':<24}" + "".join(f"{column:>18}" for column in columns) + "\n")
+    for name, result in scenarios.items():
+        cells = "".join(f"{str(result.get(column, '-')):>18}" for column in columns)
+        stream.write(f"{name:<24}{cells}\n")
+
+
+def print_comparison(rows, metric, stream=sys.stderr):
+    stream.write(f"\n{'scenario':<24}{'baseline ' + metric:>20}{'current':>14}{'change':>10}\n")
+    for name, old, new, change in rows:
+        delta = f"{change:+.1%}" if change is not None else "n/a"
+        stream.write(f"{name:<24}{str(old):>20}{str(new):>14}{delta:>10}\n")
@@ -0,0 +1,62 @@
+"""
+Serial versus process-pool text extraction of a large synthetic PDF.
+
+The parallel run uses ``PdfExtractor`` with ``--workers`` processes; the
+speedup grows with the number of CPU cores available.
+
+    python -m benchmarks.pdf_extraction --pages 2000 --workers 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import harness
+
+
+def run(pages, workers, repeat):
+    from django.test import override_settings
+
+    from propylon_document_manager.utils.file_extraction import PdfExtractor
+    from propylon_document_manager.utils.synthetic_corpus import make_pdf
+
+    content = make_pdf([f"Page {number}. " + "Lorem ipsum dolor sit amet. " * 40 for number in range(1, pages + 1)])
+    handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    try:
+        handle.write(content)
+        handle.close()
+        extractor = PdfExtractor()
+        results = {}
+        modes = {"serial": {"PDF_PARALLEL_MIN_PAGES": pages + 1}, "parallel": {"PDF_PARALLEL_MIN_PAGES": 1}}
+        for mode, overrides in modes.items():
+            with override_settings(PDF_EXTRACTION_WORKERS=workers, **overrides):
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    extractor.extract(handle.name)
+                    timings.append(time.perf_counter() - started)
+            results[mode] = {"seconds": round(min(timings), 3), "pages_per_second": round(pages / min(timings), 1)}
+        results["speedup"] = round(results["serial"]["seconds"] / results["parallel"]["seconds"], 2)
+        return results
+    finally:
+        os.unlink(handle.name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500, help="Pages in the generated PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Extraction processes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    harness.setup_django()
+    results = run(args.pages, args.workers, args.repeat)
+    for mode in ("serial", "parallel"):
+        print(f"{mode:<10} {results[mode]['seconds']:>8}s {results[mode]['pages_per_second']:>10} pages/s")
+    print(f"speedup    {results['speedup']}x with {args.workers} workers")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
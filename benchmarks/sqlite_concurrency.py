@@ -0,0 +1,158 @@
+"""
+Concurrent read/write throughput of a file-backed SQLite database with the
+driver defaults versus ``settings.SQLITE_PRAGMAS``.
+
+Writer threads insert small rows in short transactions, the way uploads do,
+while reader threads run indexed range queries, the way listings do. Each mode
+reports completed operations per second and how many ran into
+``database is locked``.
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 2 --duration 5
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import harness
+
+
+def create_database(path, rows):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE document (id INTEGER PRIMARY KEY, owner INTEGER NOT NULL, path TEXT NOT NULL, size INTEGER)"
+    )
+    connection.execute("CREATE INDEX document_owner ON document (owner, path)")
+    connection.executemany(
+        "INSERT INTO document (owner, path, size) VALUES (?, ?, ?)",
+        ((i % 50, f"/folder-{i % 200}/doc-{i}.txt", i) for i in range(rows)),
+    )
+    connection.commit()
+    connection.close()
+
+
+def open_connection(path, pragmas, timeout):
+    # isolation_level=None matches Django's autocommit handling of sqlite3
+    connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+    if pragmas:
+        from propylon_document_manager.utils.sqlite import apply_pragmas
+
+        apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def run_mode(path, pragmas, readers, writers, duration, timeout):
+    stop = threading.Event()
+    counters = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    read_latencies, write_latencies = [], []
+
+    def reader(index):
+        connection = open_connection(path, pragmas, timeout)
+        reads, locked, latencies = 0, 0, []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                connection.execute(
+                    "SELECT id, path, size FROM document WHERE owner = ? ORDER BY path LIMIT 100", (index % 50,)
+                ).fetchall()
+                reads += 1
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                locked += 1
+        connection.close()
+        with lock:
+            counters["reads"] += reads
+            counters["locked"] += locked
+            read_latencies.extend(latencies)
+
+    def writer(index):
+        connection = open_connection(path, pragmas, timeout)
+        writes, locked, latencies = 0, 0, []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(
+                    "INSERT INTO document (owner, path, size) VALUES (?, ?, ?)",
+                    (index % 50, f"/uploads/{index}/{writes}.txt", writes),
+                )
+                connection.execute("COMMIT")
+                writes += 1
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                locked += 1
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+        connection.close()
+        with lock:
+            counters["writes"] += writes
+            counters["locked"] += locked
+            write_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    result = {
+        "reads_per_s": round(counters["reads"] / duration, 1),
+        "writes_per_s": round(counters["writes"] / duration, 1),
+        "locked_errors": counters["locked"],
+    }
+    if read_latencies:
+        result["read"] = harness.summarize(read_latencies)
+    if write_latencies:
+        result["write"] = harness.summarize(write_latencies)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8, help="Reader threads")
+    parser.add_argument("--writers", type=int, default=2, help="Writer threads")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per mode")
+    parser.add_argument("--rows", type=int, default=50000, help="Rows seeded before the run")
+    parser.add_argument("--timeout", type=float, default=0.1, help="sqlite3 driver lock timeout for default mode")
+    parser.add_argument("--output", default="-", help="Where to write JSON results ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    harness.setup_django()
+    from django.conf import settings
+
+    results = {}
+    for mode, pragmas in (("default", None), ("tuned", settings.SQLITE_PRAGMAS)):
+        with tempfile.TemporaryDirectory(prefix="bench-sqlite-") as directory:
+            path = os.path.join(directory, "bench.sqlite")
+            create_database(path, args.rows)
+            results[mode] = run_mode(path, pragmas, args.readers, args.writers, args.duration, args.timeout)
+
+    metadata = harness.run_metadata(
+        readers=args.readers,
+        writers=args.writers,
+        duration=args.duration,
+        rows=args.rows,
+        timeout=args.timeout,
+        pragmas=settings.SQLITE_PRAGMAS,
+    )
+    harness.write_results(args.output, metadata, results)
+    for mode, result in results.items():
+        sys.stderr.write(
+            f"{mode:<8} reads/s={result['reads_per_s']:<10} writes/s={result['writes_per_s']:<10} "
+            f"locked={result['locked_errors']}\n"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FileVersion, User
+from .models import FileVersion, RetentionPolicy, User
 
 @admin.register(FileVersion)
 class FileVersionAdmin(admin.ModelAdmin):
@@ -10,6 +10,11 @@ class FileVersionAdmin(admin.ModelAdmin):
     search_fields = ('file_name', 'uploader__email')
     list_filter = ('uploader', 'created_at')
 
+@admin.register(RetentionPolicy)
+class RetentionPolicyAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'folder', 'keep_last', 'keep_daily_days', 'keep_monthly_months', 'updated_at')
+    search_fields = ('owner__email', 'folder__path')
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('email', 'name')
@@ -0,0 +1,32 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def format_event(data, event=None, event_id=None):
+    """Encode one server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, cls=JSONEncoder)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views negotiate ``text/event-stream`` (or ``?format=sse``).
+
+    Views stream the events themselves; this only renders regular responses,
+    such as errors, as a single event.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = renderer_context.get("response") if renderer_context else None
+        event = "error" if response is not None and response.status_code >= 400 else None
+        return format_event(data, event=event).encode(self.charset)
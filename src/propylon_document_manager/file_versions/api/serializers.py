@@ -1,24 +1,62 @@
 import hashlib
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import Permission
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 
 # Guardian imports
-from guardian.shortcuts import get_perms
+from guardian.shortcuts import get_objects_for_user, get_perms
 
-from ..models import FileVersion
+from ..models import ChangeEvent, FileVersion, Folder, RetentionPolicy
+from ..signals import publish_new_versions
+from ...utils.background import run_in_background
+from ...utils.folders import folder_path_for, normalize_folder_path
+from ...utils.pipeline import process_text
+from ...utils.previews import generate_previews
+from ...utils.retention import prune_document
+
+# Rows inserted or updated per query by batch uploads
+BATCH_SIZE = 500
+
+
+def extraction_stats(obj):
+    """Text statistics of a version, or None until extraction has run"""
+    try:
+        extraction = obj.extraction
+    except ObjectDoesNotExist:
+        return None
+    return {
+        'status': extraction.status,
+        'page_count': extraction.page_count,
+        'char_count': extraction.char_count,
+        'word_count': extraction.word_count,
+        'encoding': extraction.encoding,
+        'duration_ms': extraction.duration_ms,
+    }
 
 
 class FileVersionSerializer(serializers.ModelSerializer):
+    """Querysets should select_related('extraction') and defer 'extraction__text' to avoid N+1 stats lookups"""
     versions = serializers.SerializerMethodField()
+    stats = serializers.SerializerMethodField()
 
     class Meta:
         model = FileVersion
         fields = [
             'id', 'file_name', 'version_number', 'virtual_path', 'mime_type',
-            'file_size', 'checksum', 'created_at', 'versions'
+            'file_size', 'checksum', 'created_at', 'versions', 'stats'
         ]
 
+    def get_stats(self, obj):
+        return extraction_stats(obj)
+
     def get_versions(self, obj):
+        # Batch lookups prefetch every root's versions in one query and pass them in the context
+        versions_by_root = self.context.get('versions_by_root')
+        if versions_by_root is not None:
+            return versions_by_root.get(obj.root_file_id or obj.id, [])
         all_versions = FileVersion.objects.filter(root_file=obj.root_file or obj).order_by('-version_number')
         return [
             {
@@ -36,15 +74,19 @@ class SharedFileVersionSerializer(serializers.ModelSerializer):
     """
     versions = serializers.SerializerMethodField()
     permissions = serializers.SerializerMethodField()
+    stats = serializers.SerializerMethodField()
     owner_email = serializers.CharField(source='uploader.email', read_only=True)
 
     class Meta:
         model = FileVersion
         fields = [
             'id', 'file_name', 'version_number', 'virtual_path', 'mime_type',
-            'file_size', 'checksum', 'created_at', 'versions', 'permissions', 'owner_email'
+            'file_size', 'checksum', 'created_at', 'versions', 'permissions', 'stats', 'owner_email'
         ]
 
+    def get_stats(self, obj):
+        return extraction_stats(obj)
+
     def get_versions(self, obj):
         user = self.context['request'].user
         root_file = obj.root_file or obj
@@ -79,6 +121,62 @@ class SharedFileVersionSerializer(serializers.ModelSerializer):
         return permissions
 
 
+class FolderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Folder
+        fields = [
+            'name', 'path', 'depth', 'file_count', 'total_size', 'subtree_file_count', 'subtree_size'
+        ]
+
+
+class FolderFileSerializer(serializers.ModelSerializer):
+    """Document entry of a folder listing; expects the latest_version and document_size annotations"""
+    latest_version = serializers.IntegerField()
+    document_size = serializers.IntegerField()
+
+    class Meta:
+        model = FileVersion
+        fields = ['id', 'file_name', 'virtual_path', 'mime_type', 'created_at', 'latest_version', 'document_size']
+
+
+class RetentionPolicySerializer(serializers.ModelSerializer):
+    """A retention policy; ``folder`` is a folder path, or null for the policy covering all documents"""
+    folder = serializers.CharField(source='folder.path', allow_null=True, required=False, default=None)
+
+    class Meta:
+        model = RetentionPolicy
+        fields = ['id', 'folder', 'keep_last', 'keep_daily_days', 'keep_monthly_months', 'updated_at']
+        read_only_fields = ['updated_at']
+
+    def validate(self, data):
+        user = self.context["request"].user
+        if "folder" in data:
+            path = data["folder"]["path"]
+            data["folder"] = Folder.objects.ensure_path(user, normalize_folder_path(path)) if path else None
+        folder = data["folder"] if "folder" in data else self.instance.folder
+        clash = RetentionPolicy.objects.filter(owner=user, folder=folder)
+        if self.instance is not None:
+            clash = clash.exclude(pk=self.instance.pk)
+        if clash.exists():
+            raise serializers.ValidationError({"folder": "A policy for this folder already exists."})
+        return data
+
+
+class ChangeEventSerializer(serializers.ModelSerializer):
+    """Feed entry; the stored payload (file name, path, version, ...) is flattened into the event"""
+    type = serializers.CharField(source='event_type')
+    actor = serializers.EmailField(source='actor.email', default=None)
+
+    class Meta:
+        model = ChangeEvent
+        fields = ['id', 'type', 'file_version_id', 'root_file_id', 'actor', 'created_at']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data.update(instance.payload)
+        return data
+
+
 class FileUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
     name = serializers.CharField()
@@ -124,8 +222,17 @@ class FileUploadSerializer(serializers.Serializer):
                 user.user_permissions.add(perm)
 
     def create(self, validated_data):
-        user = self.context["request"].user
         file_obj = validated_data["file"]
+        return self.create_version(
+            validated_data,
+            file_path=file_obj,
+            mime_type=getattr(file_obj, "content_type", "application/octet-stream"),
+            file_size=getattr(file_obj, "size", -1),
+        )
+
+    def create_version(self, validated_data, **blob):
+        """Add a version at the validated path whose blob (file_path, mime_type, file_size, ...) is given."""
+        user = self.context["request"].user
         file_name = validated_data["name"]
         virtual_path = validated_data["virtual_path"]
         notes = validated_data.get("notes", "")
@@ -156,22 +263,218 @@ class FileUploadSerializer(serializers.Serializer):
             uploader = user
 
         file_version = FileVersion.objects.create(
+            folder=Folder.objects.folder_for(uploader, virtual_path),
             file_name=file_name,
             version_number=next_version,
-            file_path=file_obj,
             uploader=uploader,  # Use original uploader for consistency
             virtual_path=virtual_path,
-            mime_type=getattr(file_obj, "content_type", "application/octet-stream"),
-            file_size=getattr(file_obj, "size", -1),
             checksum=checksum,
             notes=notes,
             previous_version=previous_version,
             root_file=root_file or None,
+            **blob,
         )
 
         if file_version.root_file is None:
             file_version.root_file = file_version
             file_version.save(update_fields=["root_file"])
 
+        Folder.objects.record_versions([file_version])
+        ChangeEvent.objects.record_version(file_version, actor=user)
         self.assign_fileversion_permissions(user)
-        return file_version
\ No newline at end of file
+        run_in_background(process_text, file_version.pk)
+        run_in_background(generate_previews, file_version.pk)
+        run_in_background(prune_document, file_version.root_file_id)
+        return file_version
+
+
+def linkable_blob(user, checksum, size):
+    """
+    A version whose stored blob has ``checksum`` and ``size`` and that ``user``
+    can view, or None. Knowing a checksum alone never grants its content: only
+    blobs of the user's own or shared documents are offered.
+    """
+    versions = FileVersion.objects.filter(checksum=checksum, file_size=size).exclude(file_path="")
+    own = versions.filter(uploader=user).order_by("id").first()
+    if own is not None:
+        return own
+    shared = get_objects_for_user(
+        user,
+        'file_versions.view_fileversion',
+        klass=FileVersion.objects.filter(pk__in=versions.values('root_file_id')),
+        accept_global_perms=False
+    )
+    return versions.filter(root_file__in=shared).order_by("id").first()
+
+
+class FileBatchUploadSerializer(FileUploadSerializer):
+    """
+    Uploads many files at once, ``files[i]`` to ``virtual_paths[i]``, in one
+    transaction. Existing documents are resolved in one query and the new
+    versions inserted with bulk_create; ``save()`` returns a result per file,
+    and files that can't be added (no permission, identical content, a path
+    repeated within the batch) are reported without failing the others.
+    """
+    file = None
+    name = None
+    virtual_path = None
+    files = serializers.ListField(child=serializers.FileField(), allow_empty=False)
+    virtual_paths = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+
+    def validate(self, data):
+        if len(data["files"]) != len(data["virtual_paths"]):
+            raise serializers.ValidationError("files and virtual_paths must have the same length")
+        if len(data["files"]) > settings.UPLOAD_BATCH_MAX_FILES:
+            raise serializers.ValidationError(f"At most {settings.UPLOAD_BATCH_MAX_FILES} files per batch")
+        checksums = []
+        for file_obj in data["files"]:
+            hasher = hashlib.sha256()
+            for chunk in file_obj.chunks():
+                hasher.update(chunk)
+            checksums.append(hasher.hexdigest())
+        data["checksums"] = checksums
+        return data
+
+    def resolve_roots(self, paths):
+        """Existing documents at ``paths`` with their latest version, in one query."""
+        latest = FileVersion.objects.filter(root_file=OuterRef("pk")).order_by("-version_number")
+        roots = (
+            FileVersion.objects.filter(virtual_path__in=paths, previous_version__isnull=True)
+            .select_related("uploader")
+            .annotate(
+                latest_id=Subquery(latest.values("id")[:1]),
+                latest_number=Subquery(latest.values("version_number")[:1]),
+            )
+            .order_by("-id")
+        )
+        # Like a single upload, the oldest document at a path wins
+        return {root.virtual_path: root for root in roots}
+
+    @transaction.atomic
+    def create(self, validated_data):
+        user = self.context["request"].user
+        notes = validated_data.get("notes", "")
+        entries = list(zip(validated_data["files"], validated_data["virtual_paths"], validated_data["checksums"]))
+
+        roots = self.resolve_roots({virtual_path for _, virtual_path, _ in entries})
+        others = [root.pk for root in roots.values() if root.uploader_id != user.pk]
+        writable = set(
+            get_objects_for_user(
+                user,
+                'file_versions.change_fileversion',
+                klass=FileVersion.objects.filter(pk__in=others),
+                accept_global_perms=False
+            ).values_list("id", flat=True)
+        ) if others else set()
+        identical = set(
+            FileVersion.objects.filter(
+                root_file__in=[root.pk for root in roots.values()], checksum__in=validated_data["checksums"]
+            ).values_list("root_file_id", "checksum")
+        )
+
+        results = [None] * len(entries)
+        pending = []
+        folders = {}
+        seen = set()
+        for index, (file_obj, virtual_path, checksum) in enumerate(entries):
+            root_file = roots.get(virtual_path)
+            error = None
+            if virtual_path in seen:
+                error = "This path appears more than once in the batch."
+            elif root_file and root_file.uploader_id != user.pk and root_file.pk not in writable:
+                error = "You don't have permission to upload to this file."
+            elif root_file and (root_file.pk, checksum) in identical:
+                error = "Identical file already uploaded"
+            seen.add(virtual_path)
+            if error:
+                results[index] = {"virtual_path": virtual_path, "status": "failed", "error": error}
+                continue
+
+            # Keep the original uploader for the root file reference
+            uploader = root_file.uploader if root_file else user
+            folder_key = (uploader.pk, folder_path_for(virtual_path))
+            if folder_key not in folders:
+                folders[folder_key] = Folder.objects.folder_for(uploader, virtual_path)
+            pending.append((index, FileVersion(
+                folder=folders[folder_key],
+                file_name=file_obj.name,
+                version_number=root_file.latest_number + 1 if root_file else 1,
+                file_path=file_obj,
+                uploader=uploader,
+                virtual_path=virtual_path,
+                mime_type=getattr(file_obj, "content_type", "application/octet-stream"),
+                file_size=getattr(file_obj, "size", -1),
+                checksum=checksum,
+                notes=notes,
+                previous_version_id=root_file.latest_id if root_file else None,
+                root_file=root_file,
+            )))
+
+        created = FileVersion.objects.bulk_create([version for _, version in pending], batch_size=BATCH_SIZE)
+        new_roots = [version for version in created if version.root_file is None]
+        for version in new_roots:
+            version.root_file = version
+        FileVersion.objects.bulk_update(new_roots, ["root_file"], batch_size=BATCH_SIZE)
+
+        Folder.objects.record_versions(created)
+        ChangeEvent.objects.record_versions(created, actor=user)
+        publish_new_versions(created)
+        if created:
+            self.assign_fileversion_permissions(user)
+        for version in created:
+            run_in_background(process_text, version.pk)
+            run_in_background(generate_previews, version.pk)
+        for root_file_id in {version.root_file_id for version in created}:
+            run_in_background(prune_document, root_file_id)
+
+        for index, version in pending:
+            results[index] = {
+                "virtual_path": version.virtual_path,
+                "status": "created",
+                "id": version.pk,
+                "version": version.version_number,
+                "checksum": version.checksum,
+            }
+        return results
+
+
+class FileUploadPreflightSerializer(FileUploadSerializer):
+    """
+    Describes an upload of a file with ``sha256`` and ``size`` to ``virtual_path``
+    before any bytes are sent; see FileUploadPreflightView.
+    """
+    file = None
+    name = None
+    notes = None
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+    size = serializers.IntegerField(min_value=0)
+
+    def validate(self, data):
+        data["checksum"] = data["sha256"].lower()
+        return data
+
+
+class FileLinkSerializer(FileUploadPreflightSerializer):
+    """Adds a version that reuses an already stored blob instead of an uploaded file."""
+    name = serializers.CharField()
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, data):
+        data = super().validate(data)
+        data["source"] = linkable_blob(self.context["request"].user, data["checksum"], data["size"])
+        if data["source"] is None:
+            raise serializers.ValidationError(
+                {"detail": "No stored file with this checksum and size; upload the file instead"}
+            )
+        return data
+
+    def create(self, validated_data):
+        source = validated_data["source"]
+        # The new row shares the blob, so it also shares its storage tier
+        return self.create_version(
+            validated_data,
+            file_path=source.file_path.name,
+            mime_type=source.mime_type,
+            file_size=source.file_size,
+            storage_tier=source.storage_tier,
+        )
@@ -4,24 +4,46 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.mixins import RetrieveModelMixin, ListModelMixin
-from rest_framework.viewsets import GenericViewSet
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.decorators import action
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.http import FileResponse, Http404, HttpResponseForbidden
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponseForbidden, HttpResponseNotModified, StreamingHttpResponse
+from django.core import signing
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from urllib.parse import unquote
 from pathlib import Path
-from django.db.models import Q
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Max, Q, Sum
+from django.db.models.functions import Greatest
 
 # Guardian imports for object-level permissions
 from guardian.shortcuts import assign_perm, get_objects_for_user, remove_perm
 
-from ..models import FileVersion
-from .serializers import FileVersionSerializer, FileUploadSerializer, SharedFileVersionSerializer
+from ..models import ChangeEvent, FileVersion, Folder, PackEntry, RetentionPolicy
+from .renderers import EventStreamRenderer, format_event
+from .serializers import (
+    ChangeEventSerializer, FileVersionSerializer, FileUploadSerializer, SharedFileVersionSerializer,
+    FolderSerializer, FolderFileSerializer, RetentionPolicySerializer, FileUploadPreflightSerializer,
+    FileLinkSerializer, FileBatchUploadSerializer, linkable_blob
+)
 from .permissions import HasFileVersionPermission
-from propylon_document_manager.utils.file_extraction import extract_text
+from propylon_document_manager.utils.events import changes_channel, file_channel, get_broker, user_channel
+from propylon_document_manager.utils.file_extraction import stored_text
+from propylon_document_manager.utils.fingerprints import near_duplicates
+from propylon_document_manager.utils.folders import normalize_folder_path
+from propylon_document_manager.utils.history import blame, chain_diffs, version_chain
+from propylon_document_manager.utils.previews import CHECKSUM, PREVIEW_FILE_NAME, preview_path
+from propylon_document_manager.utils.signed_urls import sign_download, verify_download
+from propylon_document_manager.utils.storage_tiers import open_blob, record_access
+from propylon_document_manager.utils.structured_diff import compare_versions
+from propylon_document_manager.site.db_router import set_routing_user
 
 
 class FileVersionViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
@@ -31,7 +53,12 @@ class FileVersionViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
     lookup_field = "id"
 
     def get_queryset(self):
-        return FileVersion.objects.filter(uploader=self.request.user, previous_version__isnull=True)
+        return (
+            FileVersion.objects
+            .filter(uploader=self.request.user, previous_version__isnull=True)
+            .select_related("extraction")
+            .defer("extraction__text")
+        )
 
     @action(detail=False, methods=['get'], url_path='shared-with-me')
     def shared_with_me(self, request):
@@ -47,27 +74,383 @@ class FileVersionViewSet(RetrieveModelMixin, ListModelMixin, GenericViewSet):
             klass=FileVersion.objects.filter(previous_version__isnull=True),
             accept_global_perms=False  # Only object-level permissions
         ).exclude(uploader=user)  # Exclude files uploaded by the user
+        shared_files = shared_files.select_related("extraction").defer("extraction__text")
         
         # Use the shared file serializer to include permission info
         serializer = SharedFileVersionSerializer(shared_files, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Looks up many file versions at once by id and/or by virtual path.
+
+        Ids may name any version; paths resolve to the document's root version.
+        Everything is resolved with a fixed number of queries and returned as maps
+        keyed by the requested id or path. Entries that don't exist or that the user
+        cannot view are listed under "not_found" without revealing which it was.
+        """
+        ids = request.data.get("ids") or []
+        paths = request.data.get("paths") or []
+        if not isinstance(ids, list) or not isinstance(paths, list):
+            return Response({"detail": "ids and paths must be lists"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = settings.BATCH_LOOKUP_MAX_ITEMS
+        if len(ids) + len(paths) > limit:
+            return Response(
+                {"detail": f"At most {limit} ids and paths may be requested at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            ids = list(dict.fromkeys(int(value) for value in ids))
+        except (TypeError, ValueError):
+            return Response({"detail": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        paths = list(dict.fromkeys(str(value) for value in paths))
+
+        versions = FileVersion.objects.select_related("extraction").defer("extraction__text")
+        by_id = versions.in_bulk(ids)
+        # Several users may hold a document at the same path; candidates are narrowed below
+        path_candidates = list(versions.filter(virtual_path__in=paths, previous_version__isnull=True).order_by("id"))
+
+        # One permission pass over every root involved
+        user = request.user
+        root_ids = {fv.root_file_id or fv.id for fv in by_id.values()}
+        root_ids.update(fv.id for fv in path_candidates)
+        readable = FileVersion.objects.readable_root_ids(user, root_ids)
+
+        found_ids = {
+            pk: fv for pk, fv in by_id.items() if (fv.root_file_id or fv.id) in readable
+        }
+        found_paths = {}
+        for fv in path_candidates:
+            if fv.id in readable:
+                found_paths.setdefault(fv.virtual_path, fv)
+
+        versions_by_root = {}
+        rows = (
+            FileVersion.objects
+            .filter(root_file_id__in={fv.root_file_id or fv.id for fv in [*found_ids.values(), *found_paths.values()]})
+            .order_by("-version_number")
+            .values("id", "version_number", "virtual_path", "root_file_id")
+        )
+        for row in rows:
+            versions_by_root.setdefault(row.pop("root_file_id"), []).append(row)
+
+        context = {"request": request, "versions_by_root": versions_by_root}
+        return Response({
+            "ids": {str(pk): FileVersionSerializer(fv, context=context).data for pk, fv in found_ids.items()},
+            "paths": {path: FileVersionSerializer(fv, context=context).data for path, fv in found_paths.items()},
+            "not_found": {
+                "ids": [pk for pk in ids if pk not in found_ids],
+                "paths": [path for path in paths if path not in found_paths],
+            },
+        })
+
+
+class RetentionPolicyViewSet(ModelViewSet):
+    """
+    The current user's retention policies. Uploads prune their own document
+    and ``manage.py prune_versions`` applies policies to all documents.
+    """
+    serializer_class = RetentionPolicySerializer
+    permission_classes = [IsAuthenticated]
+    queryset = RetentionPolicy.objects.all()
+
+    def get_queryset(self):
+        return RetentionPolicy.objects.filter(owner=self.request.user).select_related("folder").order_by("id")
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+class FolderView(APIView):
+    """
+    Lists one of the current user's virtual folders: its counters, its immediate
+    subfolders and the documents directly inside it (paginated with limit/offset).
+    """
+    permission_classes = [IsAuthenticated]
+    default_limit = 200
+    max_limit = 1000
+
+    def get(self, request, path=""):
+        folder_path = normalize_folder_path(unquote(path))
+        folder = Folder.objects.filter(owner=request.user, path=folder_path).first()
+        if folder is None:
+            if folder_path != "/":
+                raise Http404("No such folder")
+            # Users who have not uploaded anything yet still have an empty root
+            folder = Folder(owner=request.user, path="/", name="", depth=0)
+
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+            offset = max(int(request.query_params.get("offset", 0)), 0)
+        except ValueError:
+            return Response({"detail": "limit and offset must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        children, files = [], []
+        if folder.pk:
+            children = Folder.objects.filter(parent=folder).order_by("name")
+            files = (
+                FileVersion.objects.filter(folder=folder, previous_version__isnull=True)
+                .annotate(
+                    latest_version=Max("all_versions__version_number"),
+                    document_size=Sum(Greatest("all_versions__file_size", 0)),
+                )
+                .order_by("file_name", "id")[offset:offset + limit]
+            )
+
+        data = FolderSerializer(folder).data
+        data["folders"] = FolderSerializer(children, many=True).data
+        data["files"] = FolderFileSerializer(files, many=True).data
+        data["limit"] = limit
+        data["offset"] = offset
+        return Response(data)
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type=EventStreamRenderer.media_type)
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class ChangeFeedView(APIView):
+    """
+    Incremental sync feed of the current user's change events: versions created
+    or deleted in documents they can see, and documents shared with or
+    unshared from them.
+
+    Pass the last seen event id as ``since`` and the response's ``cursor`` on
+    the next call. ``wait`` (seconds) long-polls until an event arrives.
+    Requesting ``text/event-stream`` (or ``?format=sse``) instead streams events
+    as they happen; reconnecting clients resume from ``Last-Event-ID``, which
+    takes precedence over ``since``.
+    Waiting requests are woken through the event broker and fall back to
+    re-checking the database every ``CHANGES_POLL_INTERVAL`` seconds. Both
+    modes hold a worker thread while waiting. Events are only listed once they
+    are ``CHANGES_SETTLE_SECONDS`` old, so the cursor never passes an event a
+    slower transaction has yet to commit.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+    default_limit = 500
+    max_limit = 1000
+
+    def get(self, request):
+        try:
+            # EventSource reconnects reuse the original URL, so the header is the newer cursor
+            since = int(request.headers.get("Last-Event-ID") or request.query_params.get("since", 0))
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+            wait = min(float(request.query_params.get("wait", 0)), settings.CHANGES_MAX_WAIT)
+        except ValueError:
+            return Response(
+                {"detail": "since and limit must be integers and wait a number"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if since < 0 or limit < 1:
+            return Response({"detail": "since and limit must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            return event_stream_response(self.stream(request.user, since, limit))
+
+        # Subscribe before reading so an event committed in between still wakes us
+        with get_broker().subscribe([changes_channel(request.user.pk)]) as subscription:
+            events = self.fetch(request.user, since, limit + 1)
+            deadline = time.monotonic() + wait
+            while not events and (remaining := deadline - time.monotonic()) > 0:
+                subscription.get(timeout=min(settings.CHANGES_POLL_INTERVAL, remaining))
+                events = self.fetch(request.user, since, limit + 1)
+
+        has_more = len(events) > limit
+        events = events[:limit]
+        return Response({
+            "events": ChangeEventSerializer(events, many=True).data,
+            "cursor": events[-1].id if events else since,
+            "has_more": has_more,
+        })
+
+    def fetch(self, user, since, limit):
+        events = ChangeEvent.objects.filter(user=user, id__gt=since).select_related("actor").order_by("id")
+        events = list(events[:limit])
+        if settings.CHANGES_SETTLE_SECONDS:
+            # A lower id may still commit behind a recent event, so stop at the first one
+            cutoff = datetime.now(dt_timezone.utc) - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+            for index, event in enumerate(events):
+                if event.created_at > cutoff:
+                    return events[:index]
+        return events
+
+    def stream(self, user, since, limit):
+        subscription = get_broker().subscribe([changes_channel(user.pk)])
+        try:
+            started = last_sent = time.monotonic()
+            # Tell the client how long to wait before reconnecting once the stream ends
+            yield f"retry: {int(settings.CHANGES_POLL_INTERVAL * 1000)}\n\n"
+            while time.monotonic() - started < settings.CHANGES_STREAM_SECONDS:
+                events = self.fetch(user, since, limit)
+                for event in events:
+                    yield format_event(ChangeEventSerializer(event).data, event=event.event_type, event_id=event.id)
+                    since = event.id
+                now = time.monotonic()
+                if events:
+                    last_sent = now
+                elif now - last_sent >= settings.CHANGES_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = now
+                if len(events) < limit:
+                    subscription.get(timeout=settings.CHANGES_POLL_INTERVAL)
+        finally:
+            subscription.close()
+
+
+class EventStreamView(APIView):
+    """
+    Live server-sent events announcing new versions, either of one document
+    (``/api/events/files/<id>/``) or of every document the current user can see
+    (``/api/events/me/``), so open pages can refresh without polling.
+
+    Events are pushed through the event broker and not stored: use
+    /api/changes/ to catch up on anything missed while disconnected.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, *api_settings.DEFAULT_RENDERER_CLASSES]
+
+    def get(self, request, file_id=None):
+        if file_id is None:
+            channel = user_channel(request.user.pk)
+        else:
+            file_version = get_object_or_404(FileVersion, pk=file_id)
+            root_file = file_version.root_file or file_version
+            user = request.user
+            if root_file.uploader != user and not user.has_perm("file_versions.view_fileversion", root_file):
+                return Response(
+                    {"detail": "You don't have permission to access this file."}, status=status.HTTP_403_FORBIDDEN
+                )
+            channel = file_channel(root_file.pk)
+        return event_stream_response(self.stream(channel))
+
+    def stream(self, channel):
+        subscription = get_broker().subscribe([channel])
+        try:
+            started = time.monotonic()
+            yield f"retry: {int(settings.CHANGES_POLL_INTERVAL * 1000)}\n\n"
+            while (remaining := settings.CHANGES_STREAM_SECONDS - (time.monotonic() - started)) > 0:
+                item = subscription.get(timeout=min(settings.CHANGES_KEEPALIVE_SECONDS, remaining))
+                if item is None:
+                    yield ": keepalive\n\n"
+                    continue
+                _, message = item
+                yield format_event(message, event=message["type"])
+        finally:
+            subscription.close()
+
 
 class FileUploadView(APIView):
     parser_classes = [MultiPartParser, FormParser]
+    serializer_class = FileUploadSerializer
+    message = "File uploaded"
 
     def post(self, request, *args, **kwargs):
-        serializer = FileUploadSerializer(data=request.data, context={'request': request})
+        serializer = self.serializer_class(data=request.data, context={'request': request})
         if serializer.is_valid():
             result = serializer.save()
             return Response({
-                "message": "File uploaded",
+                "message": self.message,
                 "version": result.version_number,
                 "checksum": result.checksum,
+                # Empty until text processing has run, which is later unless background tasks are eager;
+                # the owner's /api/events/me/ stream then receives a near_duplicate event instead
+                "near_duplicates": near_duplicates(result, request.user),
             }, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
+
+
+class FileBatchUploadView(APIView):
+    """
+    Uploads many files in one request and one transaction: multipart ``files``
+    parts with a matching list of ``virtual_paths`` (and optional ``notes`` for
+    all of them). Responds with a result per file, in request order.
+    """
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = FileBatchUploadSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = serializer.save()
+        created = sum(result["status"] == "created" for result in results)
+        return Response({
+            "created": created,
+            "failed": len(results) - created,
+            "results": results,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+class FileUploadLinkView(FileUploadView):
+    """
+    Adds a version whose content the server already stores, named by checksum
+    and size, without sending the file (see FileUploadPreflightView).
+    """
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    serializer_class = FileLinkSerializer
+    message = "File linked"
+
+
+class FileUploadPreflightView(APIView):
+    """
+    Tells a client whether uploading a file with a given checksum and size to a
+    path is needed: ``present`` when the document already has a version with
+    that content, ``link`` when a stored blob the user can view has it (use
+    /api/upload/link/), otherwise ``send``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = FileUploadPreflightSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        virtual_path = serializer.validated_data["virtual_path"]
+        checksum = serializer.validated_data["checksum"]
+
+        root_file = FileVersion.objects.filter(virtual_path=virtual_path, previous_version__isnull=True).first()
+        if root_file:
+            present = (
+                FileVersion.objects.filter(root_file=root_file, checksum=checksum)
+                .order_by("-version_number").first()
+            )
+            if present:
+                return Response({"action": "present", "version": present.version_number})
+        if linkable_blob(request.user, checksum, serializer.validated_data["size"]):
+            return Response({"action": "link"})
+        return Response({"action": "send"})
+
+
+def find_revision(virtual_path, revision=None):
+    """The version at ``virtual_path`` with number ``revision``, or its latest one; raises Http404."""
+    file_versions = FileVersion.objects.filter(virtual_path=virtual_path)
+
+    if not file_versions.exists():
+        raise Http404("No such file found")
+
+    if revision is not None:
+        try:
+            version_number = int(revision)
+            return file_versions.get(version_number=version_number)
+        except (ValueError, FileVersion.DoesNotExist):
+            raise Http404("Specified revision not found")
+
+    file_version = file_versions.order_by("-version_number").first()
+    if not file_version:
+        raise Http404("No versions available")
+    return file_version
+
+
+def can_download(user, file_version):
+    # Either user owns the file or has view permission on its document
+    root_file = file_version.root_file or file_version
+    return file_version.uploader == user or user.has_perm("file_versions.view_fileversion", root_file)
+
 
 class FileDownloadByNameView(APIView):
     """
@@ -90,50 +473,123 @@ class FileDownloadByNameView(APIView):
             user = token.user
         except Token.DoesNotExist:
             return HttpResponseForbidden("Invalid authentication token.")
+        set_routing_user(user)
+
+        file_version = find_revision(unquote(raw_virtual_path), request.query_params.get("revision"))
+        if not can_download(user, file_version):
+            return HttpResponseForbidden("You don't have permission to access this file.")
 
-        # Virtual path
-        virtual_path = unquote(raw_virtual_path)
-        revision = request.query_params.get("revision")
+        try:
+            blob = open_blob(file_version)
+        except (FileNotFoundError, PackEntry.DoesNotExist):
+            raise Http404("File not found on disk")
+        record_access(file_version)
 
-        file_versions = FileVersion.objects.filter(virtual_path=virtual_path)
+        return FileResponse(blob, as_attachment=True, filename=file_version.file_name)
 
-        if not file_versions.exists():
-            raise Http404("No such file found")
 
-        if revision is not None:
+class SignedDownloadURLView(APIView):
+    """
+    Mints a short-lived signed URL for downloading a version; access is checked
+    here, once, so downloads through the URL make no database queries.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        virtual_path = request.data.get("virtual_path")
+        if not virtual_path:
+            return Response({"error": "virtual_path is required"}, status=status.HTTP_400_BAD_REQUEST)
+        expires_in = request.data.get("expires_in")
+        if expires_in is not None:
             try:
-                version_number = int(revision)
-                file_version = file_versions.get(version_number=version_number)
-            except (ValueError, FileVersion.DoesNotExist):
-                raise Http404("Specified revision not found")
-        else:
-            file_version = file_versions.order_by("-version_number").first()
-            if not file_version:
-                raise Http404("No versions available")
+                expires_in = int(expires_in)
+            except (TypeError, ValueError):
+                return Response({"error": "expires_in must be a number of seconds"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if expires_in <= 0:
+                return Response({"error": "expires_in must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_version = find_revision(virtual_path, request.data.get("revision"))
+        if not can_download(request.user, file_version):
+            return Response({"error": "You don't have permission to access this file."},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        signature, expires = sign_download(file_version, request.user, expires_in)
+        # Downloads through the URL aren't seen by the database, so the access is recorded now
+        record_access(file_version)
+        url = reverse("signed_download", kwargs={"signature": signature, "file_name": file_version.file_name})
+        return Response({
+            "url": request.build_absolute_uri(url),
+            "expires_at": datetime.fromtimestamp(expires, tz=dt_timezone.utc).isoformat(),
+            "version": file_version.version_number,
+        }, status=status.HTTP_201_CREATED)
 
-        # Check permissions: either user owns the file or has view permission
-        root_file = file_version.root_file or file_version
-        if file_version.uploader != user and not user.has_perm("file_versions.view_fileversion", root_file):
-            return HttpResponseForbidden("You don't have permission to access this file.")
 
-        file_path = file_version.file_path.path
-        if not Path(file_path).exists():
-            raise Http404("File not found on disk")
+class SignedDownloadView(APIView):
+    """
+    Serves a version through a URL minted by SignedDownloadURLView. Only the
+    signature is checked; the blob is opened by its signed storage name, and
+    the version is looked up only when the blob has left the hot tier since.
+    """
+    permission_classes = []
+    authentication_classes = []
 
-        return FileResponse(open(file_path, "rb"), as_attachment=True, filename=file_version.file_name)
+    def get(self, request, signature, file_name):
+        try:
+            payload = verify_download(signature)
+        except signing.BadSignature:
+            return HttpResponseForbidden("Invalid or expired download URL.")
+
+        etag = f'"{payload["c"]}"' if payload["c"] else None
+        if etag and request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        else:
+            try:
+                blob = open(default_storage.path(payload["n"]), "rb")
+            except FileNotFoundError:
+                # Archived or packed since the URL was minted
+                file_version = FileVersion.objects.filter(pk=payload["v"]).first()
+                if file_version is None:
+                    raise Http404("File not found on disk")
+                try:
+                    blob = open_blob(file_version)
+                except (FileNotFoundError, PackEntry.DoesNotExist):
+                    raise Http404("File not found on disk")
+            response = FileResponse(blob, as_attachment=True, filename=payload["f"])
+        if etag:
+            response["ETag"] = etag
+        # A version's content never changes, so shared caches may keep it for as long as the URL is valid
+        response["Cache-Control"] = f"public, max-age={max(int(payload['e'] - time.time()), 0)}, immutable"
+        return response
 
 
 class FileCompareView(APIView):
+    """
+    Both versions' text (``mode=text``, the default), or a structure-aware
+    diff that pairs sections and clauses before diffing them (``mode=structure``).
+    """
     permission_classes = [IsAuthenticated]
 
+    MODES = ("text", "structure")
+
     def get(self, request):
         left_id = request.GET.get("left_id")
         right_id = request.GET.get("right_id")
         if not left_id or not right_id:
             return Response({"detail": "Both left_id and right_id are required"}, status=status.HTTP_400_BAD_REQUEST)
-
-        left = get_object_or_404(FileVersion, pk=left_id)
-        right = get_object_or_404(FileVersion, pk=right_id)
+        mode = request.GET.get("mode", "text")
+        if mode not in self.MODES:
+            return Response(
+                {"detail": f"mode must be one of: {', '.join(self.MODES)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Text extracted at upload time is read along with the versions
+        versions = FileVersion.objects.select_related("extraction")
+        if mode == "structure":
+            # Cached comparisons don't need the text at all
+            versions = versions.defer("extraction__text")
+        left = get_object_or_404(versions, pk=left_id)
+        right = get_object_or_404(versions, pk=right_id)
 
         user = request.user
         
@@ -147,19 +603,171 @@ class FileCompareView(APIView):
         if (right.uploader != user and not user.has_perm("file_versions.view_fileversion", right_root)):
             return Response({"detail": "You don't have permission to access the right file."}, status=status.HTTP_403_FORBIDDEN)
 
+        if mode == "structure":
+            return Response({
+                "left_file": {"id": left.id, "name": left.file_name},
+                "right_file": {"id": right.id, "name": right.file_name},
+                "mode": mode,
+                **compare_versions(left, right, self.text_of),
+            })
+
         return Response({
             "left_file": {
                 "id": left.id,
                 "name": left.file_name,
-                "text": extract_text(left)
+                "text": self.text_of(left)
             },
             "right_file": {
                 "id": right.id,
                 "name": right.file_name,
-                "text": extract_text(right)
+                "text": self.text_of(right)
             }
         }, status=200)
 
+    def text_of(self, file_version):
+        """Stored text when extraction has finished, extracted on the fly otherwise"""
+        return stored_text(file_version)
+
+
+class FileHistoryView(APIView):
+    """
+    How a document evolved along its ``previous_version`` chain: the lines
+    each version added and removed, plus a blame view of the latest version
+    (or ``?version=<n>``) naming the version that introduced each line.
+
+    Built from the stored consecutive-version diffs, so only versions added
+    since the last request are diffed and no text is re-extracted.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, file_id):
+        file_version = get_object_or_404(FileVersion, pk=file_id)
+        root_file = file_version.root_file or file_version
+        user = request.user
+        if root_file.uploader != user and not user.has_perm("file_versions.view_fileversion", root_file):
+            return Response(
+                {"detail": "You don't have permission to access this file."}, status=status.HTTP_403_FORBIDDEN
+            )
+
+        chain = version_chain(root_file)
+        target = chain[-1]
+        if "version" in request.GET:
+            try:
+                number = int(request.GET["version"])
+            except ValueError:
+                return Response({"detail": "version must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            target = next((fv for fv in chain if fv.version_number == number), None)
+            if target is None:
+                raise Http404("No such version")
+        diffs = chain_diffs(chain)
+
+        return Response({
+            "root_file_id": root_file.pk,
+            "file_name": chain[-1].file_name,
+            "virtual_path": root_file.virtual_path,
+            "versions": [self.describe(fv, diffs[fv.pk]) for fv in chain],
+            "blame": {
+                "version_id": target.pk,
+                "version_number": target.version_number,
+                "lines": [
+                    {
+                        "text": line.text,
+                        "version_id": line.file_version.pk,
+                        "version_number": line.file_version.version_number,
+                    }
+                    for line in blame(chain, diffs, until=target)
+                ],
+            },
+        })
+
+    def describe(self, file_version, diff):
+        return {
+            "id": file_version.pk,
+            "version_number": file_version.version_number,
+            "created_at": file_version.created_at,
+            "uploader": file_version.uploader.email,
+            "line_count": diff.line_count,
+            "lines_added": diff.lines_added,
+            "lines_removed": diff.lines_removed,
+            "changes": [
+                {"op": tag, "old_start": i1 + 1, "new_start": j1 + 1, "removed": removed, "added": added}
+                for tag, i1, _, j1, _, removed, added in (op for op in diff.opcodes if op[0] != "equal")
+            ],
+        }
+
+
+class SimilarDocumentsView(APIView):
+    """
+    Near-duplicates of a version among the documents the user can view,
+    found through the fingerprint index (see utils/fingerprints.py).
+    ``threshold`` (0-1) overrides NEAR_DUPLICATE_THRESHOLD.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, file_id):
+        file_version = get_object_or_404(FileVersion, pk=file_id)
+        root_file = file_version.root_file or file_version
+        user = request.user
+        if root_file.uploader != user and not user.has_perm("file_versions.view_fileversion", root_file):
+            return Response(
+                {"detail": "You don't have permission to access this file."}, status=status.HTTP_403_FORBIDDEN
+            )
+        threshold = request.GET.get("threshold")
+        if threshold is not None:
+            try:
+                threshold = float(threshold)
+            except ValueError:
+                threshold = -1
+            if not 0 <= threshold <= 1:
+                return Response(
+                    {"detail": "threshold must be a number between 0 and 1"}, status=status.HTTP_400_BAD_REQUEST
+                )
+        return Response({
+            "id": file_version.pk,
+            "indexed": hasattr(file_version, "fingerprint"),
+            "similar": near_duplicates(file_version, user, threshold=threshold),
+        })
+
+
+class PreviewView(APIView):
+    """
+    Serves the stored previews (thumbnail, manifest and page renders) of a checksum
+    to users who can view at least one version with that content.
+    """
+    permission_classes = [IsAuthenticated]
+
+    CONTENT_TYPES = {".png": "image/png", ".json": "application/json", ".html": "text/html; charset=utf-8"}
+
+    def get(self, request, checksum, name):
+        if not CHECKSUM.match(checksum) or not PREVIEW_FILE_NAME.match(name):
+            raise Http404("No such preview")
+
+        user = request.user
+        versions = FileVersion.objects.filter(checksum=checksum)
+        if not versions.filter(uploader=user).exists():
+            shared = get_objects_for_user(
+                user,
+                'file_versions.view_fileversion',
+                klass=FileVersion.objects.filter(pk__in=versions.values('root_file_id')),
+                accept_global_perms=False
+            )
+            if not shared.exists():
+                raise Http404("No such preview")
+
+        # Content-addressed previews never change, so a matching ETag is always current
+        etag = f'"{checksum}-{name}"'
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        else:
+            path = preview_path(checksum, name)
+            if not default_storage.exists(path):
+                raise Http404("Preview not available yet")
+            content_type = self.CONTENT_TYPES[Path(name).suffix]
+            response = FileResponse(default_storage.open(path, "rb"), content_type=content_type)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+        return response
+
 
 class FileShareView(APIView):
     """
@@ -204,11 +812,45 @@ class FileShareView(APIView):
             # Remove edit permission if not requested
             remove_perm('change_fileversion', target_user, root_file)
 
+        ChangeEvent.objects.record(
+            ChangeEvent.SHARED, root_file, [target_user.pk], actor=request.user, permissions=permissions_granted
+        )
+
         return Response({
             "message": f"File shared with {user_email}",
             "permissions": permissions_granted
         }, status=status.HTTP_200_OK)
 
+    def delete(self, request):
+        """Revokes every permission a user was given on a file"""
+        file_id = request.data.get("file_id")
+        user_email = request.data.get("user_email")
+
+        if not file_id or not user_email:
+            return Response({"detail": "file_id and user_email are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            file_version = FileVersion.objects.get(id=file_id)
+        except FileVersion.DoesNotExist:
+            return Response({"detail": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if file_version.uploader != request.user:
+            return Response({"detail": "You can only unshare files you own"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            from ..models import User
+            target_user = User.objects.get(email=user_email)
+        except User.DoesNotExist:
+            return Response({"detail": "User with this email not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        root_file = file_version.root_file or file_version
+        remove_perm('view_fileversion', target_user, root_file)
+        remove_perm('change_fileversion', target_user, root_file)
+
+        ChangeEvent.objects.record(ChangeEvent.UNSHARED, root_file, [target_user.pk], actor=request.user)
+
+        return Response({"message": f"File unshared from {user_email}"}, status=status.HTTP_200_OK)
+
 
 class CustomObtainAuthToken(ObtainAuthToken):
     """
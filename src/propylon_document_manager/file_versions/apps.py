@@ -5,3 +5,19 @@ class FileVersionsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "propylon_document_manager.file_versions"
     verbose_name = "File Versions"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save, pre_delete
+
+        from propylon_document_manager.utils.sqlite import configure_sqlite_connection
+
+        from . import signals
+        from .models import FileVersion
+
+        connection_created.connect(configure_sqlite_connection, dispatch_uid="configure_sqlite_connection")
+        pre_delete.connect(
+            signals.capture_deletion_audience, sender=FileVersion, dispatch_uid="capture_deletion_audience"
+        )
+        post_delete.connect(signals.record_deletion, sender=FileVersion, dispatch_uid="record_deletion")
+        post_save.connect(signals.publish_new_version, sender=FileVersion, dispatch_uid="publish_new_version")
@@ -0,0 +1,47 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from propylon_document_manager.utils.garbage import collect_blobs, collect_object_permissions, collect_previews
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove blobs no version refers to, previews of checksums no version has, and guardian object "
+        "permissions of deleted objects. Work is done in batches with an optional pause between them; "
+        "--dry-run only reports what would be removed and the space it would reclaim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Candidates examined per batch')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument(
+            '--min-age', type=float, default=3600.0,
+            help='Seconds a blob must be unmodified before it can be removed (uploads in progress are younger)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+        parser.add_argument('--verbose-names', action='store_true', help='List every blob removed')
+
+    def handle(self, *args, **options):
+        batch = {'batch_size': options['batch_size'], 'dry_run': options['dry_run'], 'sleep': options['sleep']}
+        root = default_storage.location
+
+        blobs = blob_bytes = 0
+        for name, size in collect_blobs(root, min_age=options['min_age'], **batch):
+            blobs += 1
+            blob_bytes += size
+            if options['verbose_names']:
+                self.stdout.write(name)
+
+        previews = preview_bytes = 0
+        for _, size in collect_previews(root, **batch):
+            previews += 1
+            preview_bytes += size
+
+        permissions = sum(collect_object_permissions(**batch))
+
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {blobs} blobs ({filesizeformat(blob_bytes)}), '
+            f'{previews} preview sets ({filesizeformat(preview_bytes)}) and {permissions} object permissions; '
+            f'{filesizeformat(blob_bytes + preview_bytes)} reclaimed'
+        ))
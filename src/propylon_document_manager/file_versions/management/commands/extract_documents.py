@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from propylon_document_manager.file_versions.models import FileVersion, TextExtraction
+from propylon_document_manager.utils.file_extraction import registered_extractors, store_extraction
+
+
+class Command(BaseCommand):
+    help = "Extract and store the text of file versions that haven't been extracted yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-extract versions that already have stored text',
+        )
+        parser.add_argument(
+            '--outdated',
+            action='store_true',
+            help='Also re-extract text produced by an older version of its extractor',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        extracted = failed = 0
+
+        versions = FileVersion.objects.order_by("id")
+        if not force:
+            up_to_date = Q(extraction__status=TextExtraction.DONE)
+            if options['outdated']:
+                current = Q(pk__in=[])
+                for mime, extractor in registered_extractors().items():
+                    current |= Q(
+                        mime_type=mime,
+                        extraction__extractor=extractor.name,
+                        extraction__extractor_version=extractor.version,
+                    )
+                up_to_date &= current
+            versions = versions.exclude(up_to_date)
+        for file_version_id in versions.values_list("id", flat=True).iterator():
+            try:
+                store_extraction(file_version_id, force=force)
+                extracted += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Version {file_version_id}: {e}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Extracted {extracted} file versions ({failed} failed)')
+        )
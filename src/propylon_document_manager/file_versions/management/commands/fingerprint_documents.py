@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils.fingerprints import FINGERPRINT_VERSION, store_fingerprint
+
+
+class Command(BaseCommand):
+    help = "Fingerprint the extracted text of file versions missing from the near-duplicate index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute fingerprints that are already current',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        indexed = skipped = failed = 0
+
+        versions = FileVersion.objects.order_by("id")
+        if not force:
+            versions = versions.exclude(fingerprint__algorithm_version=FINGERPRINT_VERSION)
+        for file_version_id in versions.values_list("id", flat=True).iterator():
+            try:
+                if store_fingerprint(file_version_id, force=force) is None:
+                    skipped += 1
+                else:
+                    indexed += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Version {file_version_id}: {e}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Fingerprinted {indexed} file versions ({skipped} without text, {failed} failed)')
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils.previews import generate_previews, has_previews
+
+
+class Command(BaseCommand):
+    help = "Generate missing document previews for existing file versions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate previews that already exist',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        generated = failed = 0
+        seen = set()
+
+        versions = FileVersion.objects.exclude(checksum="").order_by("id").values_list("id", "checksum")
+        for file_version_id, checksum in versions.iterator():
+            # Previews are shared by checksum, so one version per checksum is enough
+            if checksum in seen or (not force and has_previews(checksum)):
+                continue
+            seen.add(checksum)
+            try:
+                generate_previews(file_version_id, force=force)
+                generated += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Version {file_version_id}: {e}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Generated previews for {generated} checksums ({failed} failed)')
+        )
@@ -1,23 +1,69 @@
 from django.core.management.base import BaseCommand, CommandError
-from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.file_versions.models import User
+from propylon_document_manager.utils.synthetic_corpus import generate_corpus
 
-file_versions = [
-    'bill_document',
-    'amendment_document',
-    'act_document',
-    'statute_document',
-]
 
 class Command(BaseCommand):
-    help = "Load basic file version fixtures"
+    help = (
+        "Generate a synthetic corpus of users, virtual folder trees, version chains with real "
+        "PDF/DOCX/ODT/text payloads and guardian share graphs for development and load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3, help='Number of users to create')
+        parser.add_argument('--files', type=int, default=10, help='Root documents per user')
+        parser.add_argument('--versions', type=int, default=3, help='Maximum versions per document')
+        parser.add_argument('--min-versions', type=int, default=1, help='Minimum versions per document')
+        parser.add_argument('--depth', type=int, default=3, help='Depth of the virtual folder tree')
+        parser.add_argument('--fanout', type=int, default=4, help='Subfolders per folder')
+        parser.add_argument('--share-ratio', type=float, default=0.25, help='Fraction of documents shared')
+        parser.add_argument('--max-shares', type=int, default=3, help='Maximum users a document is shared with')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for reproducible corpora')
+        parser.add_argument('--workers', type=int, default=0, help='Processes rendering and writing payloads')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Documents inserted per batch')
+        parser.add_argument(
+            '--email-domain',
+            default='fixtures.local',
+            help='Domain of the generated user emails (use a new one to add another corpus)',
+        )
 
     def handle(self, *args, **options):
-        for file_name in file_versions:
-            FileVersion.objects.create(
-                file_name=file_name,
-                version_number=1
+        if options['min_versions'] < 1 or options['versions'] < options['min_versions']:
+            raise CommandError('--versions must be at least --min-versions, which must be at least 1')
+        if options['users'] < 1 or options['files'] < 0:
+            raise CommandError('--users must be positive and --files must not be negative')
+        if User.objects.filter(email__endswith=f"@{options['email_domain']}").exists():
+            raise CommandError(
+                f"Users @{options['email_domain']} already exist; pass a different --email-domain"
+            )
+
+        def progress(stats):
+            rate = stats['versions'] / stats['elapsed'] if stats['elapsed'] else 0
+            self.stdout.write(
+                f"{stats['documents']} documents, {stats['versions']} versions "
+                f"({rate:.0f} versions/s)"
             )
 
+        stats = generate_corpus(
+            users=options['users'],
+            files=options['files'],
+            min_versions=options['min_versions'],
+            max_versions=options['versions'],
+            depth=options['depth'],
+            fanout=options['fanout'],
+            share_ratio=options['share_ratio'],
+            max_shares=options['max_shares'],
+            seed=options['seed'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            email_domain=options['email_domain'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+
         self.stdout.write(
-            self.style.SUCCESS('Successfully created %s file versions' % len(file_versions))
+            self.style.SUCCESS(
+                f"Successfully created {stats['users']} users, {stats['documents']} documents, "
+                f"{stats['versions']} file versions ({stats['bytes'] / 1024 / 1024:.1f} MiB) and "
+                f"{stats['shares']} object permissions in {stats['elapsed']:.1f}s"
+            )
         )
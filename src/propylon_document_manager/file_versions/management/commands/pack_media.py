@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils.packs import write_pack
+from propylon_document_manager.utils.storage_tiers import COLD, PACKED
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolidate small archived blobs (up to PACK_MAX_BLOB_BYTES) into append-only pack files of about "
+        "PACK_TARGET_BYTES, replacing one file per version with an offset index. Packed versions are still "
+        "downloaded and extracted as before, read in place from their pack."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-blob-bytes', type=int, default=None, help='Largest blob to pack')
+        parser.add_argument('--pack-bytes', type=int, default=None, help='Size at which a new pack is started')
+        parser.add_argument('--batch-size', type=int, default=500, help='Versions examined per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be packed')
+
+    def handle(self, *args, **options):
+        max_blob = settings.PACK_MAX_BLOB_BYTES if options['max_blob_bytes'] is None else options['max_blob_bytes']
+        target = settings.PACK_TARGET_BYTES if options['pack_bytes'] is None else options['pack_bytes']
+        candidates = FileVersion.objects.filter(storage_tier=COLD, file_size__gte=0, file_size__lte=max_blob)
+
+        self.packs = self.blobs = self.total = 0
+        pending, pending_size, seen = [], 0, set()
+        last_id = 0
+        while True:
+            rows = list(
+                candidates.filter(pk__gt=last_id).order_by("id")
+                .values_list("id", "file_path", "checksum", "file_size")[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            for _, name, checksum, size in rows:
+                if not name or name in seen:
+                    continue
+                seen.add(name)
+                pending.append((name, checksum))
+                pending_size += size
+                if pending_size >= target:
+                    self.pack(pending, pending_size, options['dry_run'])
+                    pending, pending_size = [], 0
+        if pending:
+            self.pack(pending, pending_size, options['dry_run'])
+
+        verb = 'Would pack' if options['dry_run'] else 'Packed'
+        packed = FileVersion.objects.filter(storage_tier=PACKED).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {self.blobs} blobs ({filesizeformat(self.total)}) into {self.packs} packs; '
+            f'{packed} versions are packed'
+        ))
+
+    def pack(self, blobs, size, dry_run):
+        if dry_run:
+            self.packs += 1
+            self.blobs += len(blobs)
+            self.total += size
+            return
+        pack, skipped = write_pack(blobs)
+        for name in skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped missing or corrupt blob: {name}'))
+        if pack is not None:
+            self.packs += 1
+            self.blobs += pack.blob_count
+            self.total += pack.size
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from propylon_document_manager.file_versions.models import FileVersion, RetentionPolicy
+from propylon_document_manager.utils.retention import prune_document
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply retention policies to every document whose owner has one, deleting the versions they don't "
+        "keep. Uploads prune their own document as they go; run this periodically so time-based rules "
+        "catch up on documents nobody uploads to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Documents examined per batch')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be pruned')
+
+    def handle(self, *args, **options):
+        roots = FileVersion.objects.filter(
+            previous_version__isnull=True,
+            uploader__in=RetentionPolicy.objects.values("owner"),
+        )
+        pruned = documents = 0
+        last_id = 0
+        while True:
+            ids = list(
+                roots.filter(pk__gt=last_id).order_by("id").values_list("id", flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            for root_id in ids:
+                try:
+                    versions = prune_document(root_id, dry_run=options['dry_run'])
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f'Document {root_id}: {e}'))
+                    continue
+                if versions:
+                    documents += 1
+                    pruned += len(versions)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        verb = 'Would prune' if options['dry_run'] else 'Pruned'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {pruned} versions of {documents} documents'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from propylon_document_manager.file_versions.models import FileVersion, Folder
+from propylon_document_manager.utils.folders import rebuild_folder_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the virtual folder index and its counters from the stored file versions"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_folder_index(Folder, FileVersion)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} folders'))
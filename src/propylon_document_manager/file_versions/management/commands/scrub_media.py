@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from propylon_document_manager.file_versions.models import FileVersion, PackEntry
+from propylon_document_manager.utils.integrity import CORRUPT, MISSING, OK, orphaned_names, verify_blob
+from propylon_document_manager.utils.storage_tiers import COLD, PACKED, cold_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-hash stored blobs against the checksums recorded at upload and report missing, corrupt and "
+        "orphaned (on disk but unreferenced) files. Versions are walked in id-ordered batches and hashed by a "
+        "pool of worker processes under an overall read rate limit; progress is saved to a checkpoint file "
+        "so an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Versions hashed per batch')
+        parser.add_argument('--workers', type=int, default=0, help='Hashing processes (0 or 1 hashes inline)')
+        parser.add_argument('--max-rate', type=float, default=0.0, help='Read limit in MB/s (0 is unlimited)')
+        parser.add_argument(
+            '--since-days', type=float, default=None,
+            help='Only check blobs not verified within this many days',
+        )
+        parser.add_argument('--checkpoint', help='File recording progress; an existing one is resumed from')
+        parser.add_argument('--orphans', action='store_true', help='Also look for blobs no version refers to')
+        parser.add_argument(
+            '--orphan-age', type=float, default=3600.0,
+            help='Seconds a file must be unmodified before it counts as orphaned (uploads in progress are younger)',
+        )
+        parser.add_argument('--report', help='Write the problems found to this JSON file')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        # Each worker gets an equal share of the rate limit
+        rate = int(options['max_rate'] * 1024 * 1024 / max(workers, 1))
+        checkpoint = options['checkpoint']
+        state = {"last_id": 0, "checked": 0, "missing": [], "corrupt": []}
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state.update(json.load(f))
+            self.stdout.write(f'Resuming after version {state["last_id"]}')
+
+        versions = FileVersion.objects.all()
+        if options['since_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['since_days'])
+            versions = versions.filter(Q(verified_at__isnull=True) | Q(verified_at__lt=cutoff))
+
+        cold = cold_storage()
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            while True:
+                rows = list(
+                    versions.filter(pk__gt=state["last_id"]).order_by("id")
+                    .values_list("id", "file_path", "checksum", "file_size", "storage_tier")[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                packed = {
+                    entry.name: entry for entry in PackEntry.objects.select_related("pack").filter(
+                        name__in=[name for _, name, _, _, tier in rows if tier == PACKED]
+                    )
+                }
+                tasks = [self.task(row, cold, packed, rate) for row in rows if row[1]]
+                results = executor.map(verify_blob, tasks) if executor else map(verify_blob, tasks)
+
+                verified = []
+                for pk, status, detail in results:
+                    if status == OK:
+                        verified.append(pk)
+                        continue
+                    state[status].append(pk)
+                    label = 'Missing blob' if status == MISSING else 'Corrupt blob'
+                    self.stdout.write(self.style.WARNING(f'Version {pk}: {label} ({detail})'))
+                FileVersion.objects.filter(pk__in=verified).update(verified_at=timezone.now())
+
+                state["last_id"] = rows[-1][0]
+                state["checked"] += len(tasks)
+                if checkpoint:
+                    self.save_checkpoint(checkpoint, state)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        orphans = []
+        if options['orphans']:
+            for name in orphaned_names(default_storage.location, min_age=options['orphan_age']):
+                orphans.append(name)
+                self.stdout.write(self.style.WARNING(f'Orphaned blob: {name}'))
+
+        if options['report']:
+            with open(options['report'], "w") as f:
+                json.dump({MISSING: state[MISSING], CORRUPT: state[CORRUPT], "orphaned": orphans}, f, indent=2)
+        if checkpoint and os.path.exists(checkpoint):
+            os.unlink(checkpoint)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {state["checked"]} blobs: {len(state[MISSING])} missing, {len(state[CORRUPT])} corrupt'
+            + (f', {len(orphans)} orphaned' if options['orphans'] else '')
+        ))
+
+    def task(self, row, cold, packed, rate):
+        pk, name, checksum, size, tier = row
+        if tier == PACKED:
+            entry = packed.get(name)
+            if entry is None:
+                # No index entry: the hot path doesn't exist either, so it's reported missing
+                return pk, default_storage.path(name), checksum, size, rate
+            # Only the blob's window of the pack is read
+            return pk, default_storage.path(entry.pack.name), checksum, size, rate, entry.offset, entry.length
+        return pk, (cold if tier == COLD else default_storage).path(name), checksum, size, rate
+
+    def save_checkpoint(self, path, state):
+        # Written to a temporary name and renamed, so an interrupted write never loses progress
+        temporary = f"{path}.{os.getpid()}.{time.monotonic_ns()}"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, path)
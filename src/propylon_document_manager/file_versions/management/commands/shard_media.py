@@ -0,0 +1,81 @@
+import os
+import time
+from collections import deque
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils.file_management import link_or_copy, sharded_name
+from propylon_document_manager.utils.storage_tiers import HOT
+
+
+class Command(BaseCommand):
+    help = (
+        "Move stored blobs into the fan-out directory layout (MEDIA_SHARD_LEVELS) while the site stays up. "
+        "Each blob is hard-linked at its new name before its rows are repointed, and the old name is only "
+        "removed after a grace period, so downloads that already looked up the old name still succeed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Versions examined per batch')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument(
+            '--grace', type=float, default=60.0,
+            help='Seconds an old name stays in place after its rows were repointed',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        moved = missing = 0
+        # Old names waiting out the grace period, oldest first
+        retired = deque()
+        last_id = 0
+
+        while True:
+            rows = list(
+                FileVersion.objects.filter(pk__gt=last_id, storage_tier=HOT).order_by("id")
+                .values_list("id", "file_path")
+                [:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            for _, name in rows:
+                target = sharded_name(name)
+                if not name or name == target:
+                    continue
+                source, destination = default_storage.path(name), default_storage.path(target)
+                if not os.path.exists(source) and not os.path.exists(destination):
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(f'Missing blob: {name}'))
+                    continue
+                moved += 1
+                if dry_run:
+                    continue
+                if not os.path.exists(destination):
+                    link_or_copy(source, destination)
+                # Versions sharing the blob are repointed together
+                FileVersion.objects.filter(file_path=name).update(file_path=target)
+                if os.path.exists(source):
+                    retired.append((time.monotonic() + options['grace'], source))
+
+            self.remove_retired(retired, time.monotonic())
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        if retired:
+            time.sleep(max(0.0, retired[-1][0] - time.monotonic()))
+            self.remove_retired(retired, float("inf"))
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved} blobs into the sharded layout ({missing} missing)'))
+
+    def remove_retired(self, retired, now):
+        while retired and retired[0][0] <= now:
+            _, path = retired.popleft()
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,76 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Coalesce
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils.storage_tiers import COLD, HOT, demote
+
+
+class Command(BaseCommand):
+    help = (
+        "Move blobs whose versions haven't been downloaded for COLD_STORAGE_AFTER_DAYS (or --days) to the "
+        "archival tier. A blob shared by several versions only moves once none of them was read recently. "
+        "Archived versions are promoted back automatically when they are downloaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=None, help='Days without a download before archiving')
+        parser.add_argument('--batch-size', type=int, default=500, help='Versions examined per batch')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        days = settings.COLD_STORAGE_AFTER_DAYS if options['days'] is None else options['days']
+        cutoff = timezone.now() - timedelta(days=days)
+        stale = (
+            FileVersion.objects.filter(storage_tier=HOT)
+            .annotate(last_used=Coalesce("last_accessed_at", "created_at"))
+            .filter(last_used__lt=cutoff)
+        )
+        demoted = total = 0
+        last_id = 0
+        while True:
+            rows = list(
+                stale.filter(pk__gt=last_id).order_by("id").values_list("id", "file_path", "file_size")
+                [:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            names = {name: size for _, name, size in rows if name}
+            # Versions sharing a blob that were used recently keep it hot
+            recent = set(
+                FileVersion.objects.filter(file_path__in=names)
+                .annotate(last_used=Coalesce("last_accessed_at", "created_at"))
+                .filter(last_used__gte=cutoff)
+                .values_list("file_path", flat=True)
+            )
+            for name, size in names.items():
+                if name in recent:
+                    continue
+                if options['dry_run']:
+                    moved = max(size, 0)
+                else:
+                    try:
+                        moved = demote(name)
+                    except Exception as e:
+                        self.stdout.write(self.style.WARNING(f'{name}: {e}'))
+                        continue
+                if moved is None:
+                    self.stdout.write(self.style.WARNING(f'Missing blob: {name}'))
+                    continue
+                demoted += 1
+                total += moved
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        archived = FileVersion.objects.filter(storage_tier=COLD).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {demoted} blobs ({filesizeformat(total)}); {archived} versions are in the archival tier'
+        ))
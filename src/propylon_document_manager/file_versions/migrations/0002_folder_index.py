@@ -0,0 +1,72 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from propylon_document_manager.utils.folders import rebuild_folder_index
+
+
+def build_folders(apps, schema_editor):
+    rebuild_folder_index(apps.get_model("file_versions", "Folder"), apps.get_model("file_versions", "FileVersion"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Folder",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("path", models.CharField(max_length=500)),
+                ("name", models.CharField(blank=True, max_length=255)),
+                ("depth", models.PositiveIntegerField(default=0)),
+                ("file_count", models.PositiveIntegerField(default=0)),
+                ("total_size", models.BigIntegerField(default=0)),
+                ("subtree_file_count", models.PositiveIntegerField(default=0)),
+                ("subtree_size", models.BigIntegerField(default=0)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="folders",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "parent",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="children",
+                        to="file_versions.folder",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="fileversion",
+            name="folder",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="file_versions",
+                to="file_versions.folder",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="folder",
+            index=models.Index(fields=["parent", "name"], name="folder_children_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="folder",
+            constraint=models.UniqueConstraint(fields=("owner", "path"), name="unique_folder_path_per_owner"),
+        ),
+        migrations.RunPython(build_folders, migrations.RunPython.noop),
+    ]
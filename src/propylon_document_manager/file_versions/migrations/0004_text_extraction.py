@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0003_change_events"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TextExtraction",
+            fields=[
+                (
+                    "file_version",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="extraction",
+                        serialize=False,
+                        to="file_versions.fileversion",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                            ("unsupported", "Unsupported type"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("text", models.TextField(blank=True)),
+                ("page_count", models.PositiveIntegerField(blank=True, null=True)),
+                ("char_count", models.PositiveIntegerField(default=0)),
+                ("word_count", models.PositiveIntegerField(default=0)),
+                ("encoding", models.CharField(blank=True, max_length=32)),
+                ("duration_ms", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("extracted_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
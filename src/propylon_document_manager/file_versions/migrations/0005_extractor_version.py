@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0004_text_extraction"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="textextraction",
+            name="extractor",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="textextraction",
+            name="extractor_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0005_extractor_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VersionDiff",
+            fields=[
+                (
+                    "file_version",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="diff",
+                        serialize=False,
+                        to="file_versions.fileversion",
+                    ),
+                ),
+                ("base_version_id", models.BigIntegerField(blank=True, null=True)),
+                ("base_line_count", models.PositiveIntegerField(default=0)),
+                ("line_count", models.PositiveIntegerField(default=0)),
+                ("lines_added", models.PositiveIntegerField(default=0)),
+                ("lines_removed", models.PositiveIntegerField(default=0)),
+                ("opcodes", models.JSONField(default=list)),
+                ("algorithm_version", models.PositiveSmallIntegerField(default=1)),
+                ("created_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
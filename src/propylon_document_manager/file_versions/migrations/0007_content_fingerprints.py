@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0006_version_diff"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContentFingerprint",
+            fields=[
+                (
+                    "file_version",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="fingerprint",
+                        serialize=False,
+                        to="file_versions.fileversion",
+                    ),
+                ),
+                ("signature", models.JSONField(default=list)),
+                ("shingle_count", models.PositiveIntegerField(default=0)),
+                ("algorithm_version", models.PositiveSmallIntegerField(default=1)),
+                ("created_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="FingerprintBucket",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.BigIntegerField()),
+                (
+                    "file_version",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fingerprint_buckets",
+                        to="file_versions.fileversion",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["key"], name="fingerprint_bucket_key_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0007_content_fingerprints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fileversion",
+            name="verified_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
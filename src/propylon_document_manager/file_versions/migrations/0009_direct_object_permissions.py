@@ -0,0 +1,126 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def _file_version_type(apps):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    return ContentType.objects.filter(app_label="file_versions", model="fileversion").first()
+
+
+def _copy_to_direct(apps, generic_name, direct_name, holder):
+    content_type = _file_version_type(apps)
+    if content_type is None:
+        return
+    generic = apps.get_model("guardian", generic_name).objects.filter(content_type=content_type)
+    direct = apps.get_model("file_versions", direct_name)
+    file_versions = apps.get_model("file_versions", "FileVersion").objects
+    last_id = 0
+    while True:
+        rows = list(generic.filter(pk__gt=last_id).order_by("id")[:BATCH_SIZE])
+        if not rows:
+            break
+        last_id = rows[-1].pk
+        ids = {int(row.object_pk) for row in rows if row.object_pk.isdigit()}
+        existing = set(file_versions.filter(pk__in=ids).values_list("id", flat=True))
+        # Permissions of versions that no longer exist aren't carried over
+        direct.objects.bulk_create(
+            [
+                direct(
+                    content_object_id=int(row.object_pk),
+                    permission_id=row.permission_id,
+                    **{f"{holder}_id": getattr(row, f"{holder}_id")},
+                )
+                for row in rows
+                if row.object_pk.isdigit() and int(row.object_pk) in existing
+            ],
+            ignore_conflicts=True,
+        )
+    generic.delete()
+
+
+def _copy_to_generic(apps, generic_name, direct_name, holder):
+    content_type = _file_version_type(apps)
+    if content_type is None:
+        return
+    generic = apps.get_model("guardian", generic_name)
+    direct = apps.get_model("file_versions", direct_name)
+    last_id = 0
+    while True:
+        rows = list(direct.objects.filter(pk__gt=last_id).order_by("id")[:BATCH_SIZE])
+        if not rows:
+            break
+        last_id = rows[-1].pk
+        generic.objects.bulk_create(
+            [
+                generic(
+                    content_type=content_type,
+                    object_pk=str(row.content_object_id),
+                    permission_id=row.permission_id,
+                    **{f"{holder}_id": getattr(row, f"{holder}_id")},
+                )
+                for row in rows
+            ],
+            ignore_conflicts=True,
+        )
+    direct.objects.all().delete()
+
+
+def move_to_direct(apps, schema_editor):
+    _copy_to_direct(apps, "UserObjectPermission", "FileVersionUserObjectPermission", "user")
+    _copy_to_direct(apps, "GroupObjectPermission", "FileVersionGroupObjectPermission", "group")
+
+
+def move_to_generic(apps, schema_editor):
+    _copy_to_generic(apps, "UserObjectPermission", "FileVersionUserObjectPermission", "user")
+    _copy_to_generic(apps, "GroupObjectPermission", "FileVersionGroupObjectPermission", "group")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("guardian", "0003_remove_groupobjectpermission_guardian_gr_content_ae6aec_idx_and_more"),
+        ("file_versions", "0008_fileversion_verified_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FileVersionGroupObjectPermission",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "content_object",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="file_versions.fileversion"),
+                ),
+                ("group", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="auth.group")),
+                ("permission", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="auth.permission")),
+            ],
+            options={
+                "abstract": False,
+                "unique_together": {("group", "permission", "content_object")},
+            },
+        ),
+        migrations.CreateModel(
+            name="FileVersionUserObjectPermission",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "content_object",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="file_versions.fileversion"),
+                ),
+                ("permission", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="auth.permission")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "abstract": False,
+                "unique_together": {("user", "permission", "content_object")},
+            },
+        ),
+        migrations.RunPython(move_to_direct, move_to_generic),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0009_direct_object_permissions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RetentionPolicy",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("keep_last", models.PositiveIntegerField(default=0)),
+                ("keep_daily_days", models.PositiveIntegerField(default=0)),
+                ("keep_monthly_months", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "folder",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="retention_policies",
+                        to="file_versions.folder",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="retention_policies",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="retentionpolicy",
+            constraint=models.UniqueConstraint(fields=("owner", "folder"), name="unique_retention_policy_per_folder"),
+        ),
+        migrations.AddConstraint(
+            model_name="retentionpolicy",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("folder__isnull", True)), fields=("owner",), name="unique_default_retention_policy"
+            ),
+        ),
+    ]
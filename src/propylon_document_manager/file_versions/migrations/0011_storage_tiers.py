@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0010_retention_policies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fileversion",
+            name="last_accessed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="fileversion",
+            name="storage_tier",
+            field=models.CharField(choices=[("hot", "Hot"), ("cold", "Archived")], default="hot", max_length=8),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0011_storage_tiers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Pack",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.BigIntegerField(default=0)),
+                ("blob_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="fileversion",
+            name="storage_tier",
+            field=models.CharField(
+                choices=[("hot", "Hot"), ("cold", "Archived"), ("packed", "Packed")], default="hot", max_length=8
+            ),
+        ),
+        migrations.CreateModel(
+            name="PackEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("offset", models.BigIntegerField()),
+                ("length", models.BigIntegerField()),
+                (
+                    "pack",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT, related_name="entries", to="file_versions.pack"
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0012_pack_files"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="fileversion",
+            index=models.Index(fields=["checksum", "file_size"], name="file_version_blob_idx"),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("file_versions", "0013_file_version_blob_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="retentionpolicy",
+            name="folder",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="retention_policies",
+                to="file_versions.folder",
+            ),
+        ),
+    ]
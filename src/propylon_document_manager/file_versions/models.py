@@ -1,10 +1,16 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db.models import CharField, EmailField
+from django.db.models import CharField, EmailField, F
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
+from guardian.models import GroupObjectPermissionBase, UserObjectPermissionBase
 
+from ..utils.events import changes_channel, publish_on_commit
 from ..utils.file_management import unique_file_upload_path
+from ..utils.folders import ancestor_paths, folder_name, folder_path_for, folder_segments
+from ..utils.storage_tiers import HOT, STORAGE_TIERS
 
 class UserManager(BaseUserManager):
     """Custom user manager for the User model. Resolves the issue of missing username field."""
@@ -59,6 +65,128 @@ class User(AbstractUser):
         return reverse("users:detail", kwargs={"pk": self.id})
 
 
+class FolderManager(models.Manager):
+    """Maintains the folder index incrementally as versions are added."""
+
+    def ensure_path(self, owner, path):
+        """Return the folder at ``path`` for ``owner``, creating it and any missing ancestors."""
+        paths = ancestor_paths(path)
+        existing = {folder.path: folder for folder in self.filter(owner=owner, path__in=paths)}
+        parent = None
+        for ancestor in paths:
+            folder = existing.get(ancestor)
+            if folder is None:
+                try:
+                    with transaction.atomic():
+                        folder = self.create(
+                            owner=owner,
+                            path=ancestor,
+                            name=folder_name(ancestor),
+                            parent=parent,
+                            depth=len(folder_segments(ancestor)),
+                        )
+                except IntegrityError:
+                    # Created concurrently by another upload
+                    folder = self.get(owner=owner, path=ancestor)
+            parent = folder
+        return parent
+
+    def folder_for(self, owner, virtual_path):
+        return self.ensure_path(owner, folder_path_for(virtual_path))
+
+    def record_versions(self, file_versions):
+        """
+        Add newly created versions to their folders' counters and their ancestors' rollups.
+
+        Versions without a folder are attached to one first. Counters are
+        updated with ``F()`` expressions so concurrent uploads don't lose increments.
+        """
+        for file_version in file_versions:
+            if file_version.folder_id is None:
+                file_version.folder = self.folder_for(file_version.uploader, file_version.virtual_path)
+                FileVersion.objects.filter(pk=file_version.pk).update(folder=file_version.folder)
+        self._count_versions(file_versions, 1)
+
+    def forget_versions(self, file_versions):
+        """Take versions that are being deleted out of their folders' counters and their ancestors' rollups."""
+        self._count_versions([file_version for file_version in file_versions if file_version.folder_id], -1)
+
+    def _count_versions(self, file_versions, sign):
+        direct = defaultdict(lambda: [0, 0])
+        for file_version in file_versions:
+            entry = direct[(file_version.folder.owner_id, file_version.folder.path, file_version.folder_id)]
+            entry[0] += sign if file_version.previous_version_id is None else 0
+            entry[1] += sign * max(file_version.file_size, 0)
+
+        subtree = defaultdict(lambda: [0, 0])
+        for (owner_id, path, folder_id), (files, size) in direct.items():
+            self.filter(pk=folder_id).update(file_count=F("file_count") + files, total_size=F("total_size") + size)
+            for ancestor in ancestor_paths(path):
+                subtree[(owner_id, ancestor)][0] += files
+                subtree[(owner_id, ancestor)][1] += size
+
+        for (owner_id, path), (files, size) in subtree.items():
+            self.filter(owner_id=owner_id, path=path).update(
+                subtree_file_count=F("subtree_file_count") + files,
+                subtree_size=F("subtree_size") + size,
+            )
+
+
+class Folder(models.Model):
+    """
+    Materialized-path index over the folders implied by each user's virtual paths.
+
+    ``file_count``/``total_size`` cover documents directly in the folder and
+    ``subtree_*`` everything below it, so a listing never has to scan paths.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="folders")
+    path = models.CharField(max_length=500)
+    name = models.CharField(max_length=255, blank=True)
+    parent = models.ForeignKey("self", null=True, blank=True, on_delete=models.CASCADE, related_name="children")
+    depth = models.PositiveIntegerField(default=0)
+
+    # Documents (root versions) and bytes of all versions directly in this folder
+    file_count = models.PositiveIntegerField(default=0)
+    total_size = models.BigIntegerField(default=0)
+    # The same, including every descendant folder
+    subtree_file_count = models.PositiveIntegerField(default=0)
+    subtree_size = models.BigIntegerField(default=0)
+
+    objects = FolderManager()
+
+    def __str__(self):
+        return f"{self.path} ({self.owner_id})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'path'], name='unique_folder_path_per_owner')
+        ]
+        indexes = [
+            models.Index(fields=['parent', 'name'], name='folder_children_idx'),
+        ]
+
+
+class FileVersionManager(models.Manager):
+    """Lookups shared by the views that check document access in bulk."""
+
+    def readable_root_ids(self, user, root_ids):
+        """The ids among ``root_ids`` of documents ``user`` owns or has been given view permission on."""
+        from guardian.shortcuts import get_objects_for_user
+
+        root_ids = set(root_ids)
+        readable = set(self.filter(pk__in=root_ids, uploader=user).values_list("id", flat=True))
+        if root_ids - readable:
+            readable.update(
+                get_objects_for_user(
+                    user,
+                    'file_versions.view_fileversion',
+                    klass=self.filter(pk__in=root_ids - readable),
+                    accept_global_perms=False
+                ).values_list("id", flat=True)
+            )
+        return readable
+
+
 class FileVersion(models.Model):
     file_name = models.CharField(max_length=255)
     version_number = models.PositiveIntegerField()
@@ -74,6 +202,11 @@ class FileVersion(models.Model):
     file_size = models.IntegerField(default=-1)
     checksum = models.CharField(max_length=64, blank=True)
     notes = models.TextField(blank=True)
+    # Last time ``scrub_media`` found the blob intact
+    verified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Where the blob lives, see utils/storage_tiers.py; downloads update last_accessed_at
+    storage_tier = models.CharField(max_length=8, choices=STORAGE_TIERS, default=HOT)
+    last_accessed_at = models.DateTimeField(null=True, blank=True)
 
     # Versioning references
     previous_version = models.ForeignKey(
@@ -84,6 +217,12 @@ class FileVersion(models.Model):
         "self", null=True, blank=True,
         on_delete=models.SET_NULL, related_name="all_versions"
     )
+    folder = models.ForeignKey(
+        Folder, null=True, blank=True,
+        on_delete=models.SET_NULL, related_name="file_versions"
+    )
+
+    objects = FileVersionManager()
 
     def __str__(self):
         return f"{self.file_name} (v{self.version_number}) by {self.uploader.username}"
@@ -96,4 +235,302 @@ class FileVersion(models.Model):
                 name='unique_root_file_per_user_and_path'
             )
         ]
+        indexes = [
+            # Upload preflight and link requests look stored blobs up by content
+            models.Index(fields=['checksum', 'file_size'], name='file_version_blob_idx'),
+        ]
+
+
+class FileVersionUserObjectPermission(UserObjectPermissionBase):
+    """
+    Guardian's per-user object permissions on FileVersions, with a real foreign key.
+
+    Guardian picks these up in place of its generic ``UserObjectPermission``,
+    whose ``object_pk`` is a varchar joined through a cast, so share checks and
+    shared-with-me listings become integer-indexed joins. Rows go away with
+    their FileVersion.
+    """
+    content_object = models.ForeignKey(FileVersion, on_delete=models.CASCADE)
+
+
+class FileVersionGroupObjectPermission(GroupObjectPermissionBase):
+    """Per-group counterpart of FileVersionUserObjectPermission."""
+    content_object = models.ForeignKey(FileVersion, on_delete=models.CASCADE)
+
+
+class RetentionPolicy(models.Model):
+    """
+    Which old versions of a user's documents are kept; applied by utils/retention.py.
+
+    A policy with a folder covers the documents in that folder and below it,
+    one without covers all of the owner's documents, and the nearest policy
+    wins. A version is kept when any rule selects it (0 turns a rule off); a
+    document's first and latest versions are always kept.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="retention_policies")
+    # Restricted, so deleting a folder with a policy fails rather than dropping the policy; unlike
+    # PROTECT, deleting the owner still removes both
+    folder = models.ForeignKey(
+        Folder, null=True, blank=True,
+        on_delete=models.RESTRICT, related_name="retention_policies"
+    )
+    # The newest N versions
+    keep_last = models.PositiveIntegerField(default=0)
+    # The newest version of each day, for versions from the last N days
+    keep_daily_days = models.PositiveIntegerField(default=0)
+    # The newest version of each month, for versions from the last N months
+    keep_monthly_months = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        scope = self.folder.path if self.folder_id else "all documents"
+        return f"{self.owner_id}: {scope}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'folder'], name='unique_retention_policy_per_folder'),
+            models.UniqueConstraint(
+                fields=['owner'],
+                condition=models.Q(folder__isnull=True),
+                name='unique_default_retention_policy'
+            ),
+        ]
+
+
+class Pack(models.Model):
+    """
+    An append-only file under ``MEDIA_ROOT/packs/`` holding many small archived
+    blobs back to back; PackEntry rows are its offset index. See utils/packs.py.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    blob_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.blob_count} blobs)"
+
+
+class PackEntry(models.Model):
+    """Where in which pack the blob stored under ``name`` (a FileVersion.file_path) lives."""
+    name = models.CharField(max_length=255, unique=True)
+    pack = models.ForeignKey(Pack, on_delete=models.PROTECT, related_name="entries")
+    offset = models.BigIntegerField()
+    length = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.pack_id}:{self.offset}"
+
+
+class TextExtraction(models.Model):
+    """
+    Text and statistics extracted from a FileVersion after upload.
+
+    Kept out of the FileVersion row so listings don't load document text;
+    select the related row (deferring ``text``) when only the stats are needed.
+    """
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    UNSUPPORTED = "unsupported"
+    STATUSES = [
+        (PENDING, "Pending"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+        (UNSUPPORTED, "Unsupported type"),
+    ]
+
+    file_version = models.OneToOneField(
+        FileVersion, primary_key=True, on_delete=models.CASCADE, related_name="extraction"
+    )
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    text = models.TextField(blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    char_count = models.PositiveIntegerField(default=0)
+    word_count = models.PositiveIntegerField(default=0)
+    encoding = models.CharField(max_length=32, blank=True)
+    duration_ms = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Extractor that produced the text; outdated versions are redone by extract_documents --outdated
+    extractor = models.CharField(max_length=50, blank=True)
+    extractor_version = models.PositiveIntegerField(default=0)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_version_id} ({self.status})"
+
+
+class VersionDiff(models.Model):
+    """
+    Line diff of a FileVersion's extracted text against its previous version.
+
+    Diffs are computed once per version, so document histories and blame are
+    assembled from stored diffs without extracting any text. ``opcodes`` holds
+    difflib ``[tag, i1, i2, j1, j2]`` opcodes; non-equal ones also carry the
+    removed and the added lines. A document's first version is stored as one
+    insert of all of its lines, so every version's text can be rebuilt from
+    the chain.
+    """
+    file_version = models.OneToOneField(
+        FileVersion, primary_key=True, on_delete=models.CASCADE, related_name="diff"
+    )
+    # Version the diff was computed against; the diff is redone when previous_version changes
+    base_version_id = models.BigIntegerField(null=True, blank=True)
+    base_line_count = models.PositiveIntegerField(default=0)
+    line_count = models.PositiveIntegerField(default=0)
+    lines_added = models.PositiveIntegerField(default=0)
+    lines_removed = models.PositiveIntegerField(default=0)
+    opcodes = models.JSONField(default=list)
+    algorithm_version = models.PositiveSmallIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_version_id} (+{self.lines_added} -{self.lines_removed})"
+
+
+class ContentFingerprint(models.Model):
+    """
+    MinHash signature of a FileVersion's extracted text, for near-duplicate detection.
+
+    The signature's band keys are stored as FingerprintBucket rows, so versions
+    sharing a band are found through the key index rather than by comparing
+    against every signature; see utils/fingerprints.py.
+    """
+    file_version = models.OneToOneField(
+        FileVersion, primary_key=True, on_delete=models.CASCADE, related_name="fingerprint"
+    )
+    signature = models.JSONField(default=list)
+    shingle_count = models.PositiveIntegerField(default=0)
+    algorithm_version = models.PositiveSmallIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_version_id} ({self.shingle_count} shingles)"
+
+
+class FingerprintBucket(models.Model):
+    """One LSH band key of a version's fingerprint."""
+    file_version = models.ForeignKey(FileVersion, on_delete=models.CASCADE, related_name="fingerprint_buckets")
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key'], name='fingerprint_bucket_key_idx'),
+        ]
+
+
+class ChangeEventManager(models.Manager):
+    """Records per-user change events; see ChangeEvent."""
+
+    def audience(self, root_file):
+        """Ids of the users who can see a document: its owner and everyone it is shared with."""
+        from guardian.shortcuts import get_users_with_perms
+
+        users = set(
+            get_users_with_perms(root_file, only_with_perms_in=["view_fileversion"]).values_list("id", flat=True)
+        )
+        users.add(root_file.uploader_id)
+        return users
+
+    def record(self, event_type, file_version, users, actor=None, **payload):
+        payload = {
+            "file_name": file_version.file_name,
+            "virtual_path": file_version.virtual_path,
+            "version_number": file_version.version_number,
+            **payload,
+        }
+        users = sorted(users)
+        events = self.bulk_create([
+            self.model(
+                user_id=user_id,
+                event_type=event_type,
+                file_version_id=file_version.pk,
+                root_file_id=file_version.root_file_id or file_version.pk,
+                actor=actor,
+                payload=payload,
+            )
+            for user_id in users
+        ])
+        # Wake up long-polls and change streams waiting on these users' feeds
+        publish_on_commit([changes_channel(user_id) for user_id in users], {"type": event_type})
+        return events
+
+    def record_version(self, file_version, actor=None):
+        root_file = file_version.root_file or file_version
+        return self.record(ChangeEvent.CREATED, file_version, self.audience(root_file), actor)
+
+    def record_versions(self, file_versions, actor=None):
+        """
+        ``record_version`` for many new versions in one insert. A new document is
+        only visible to its owner yet, so audiences are looked up just for
+        documents that already existed, once each.
+        """
+        audiences = {}
+        events = []
+        for file_version in file_versions:
+            root_file = file_version.root_file or file_version
+            if root_file.pk not in audiences:
+                audiences[root_file.pk] = (
+                    {root_file.uploader_id} if root_file.pk == file_version.pk else self.audience(root_file)
+                )
+            payload = {
+                "file_name": file_version.file_name,
+                "virtual_path": file_version.virtual_path,
+                "version_number": file_version.version_number,
+            }
+            events.extend(
+                self.model(
+                    user_id=user_id,
+                    event_type=ChangeEvent.CREATED,
+                    file_version_id=file_version.pk,
+                    root_file_id=root_file.pk,
+                    actor=actor,
+                    payload=payload,
+                )
+                for user_id in sorted(audiences[root_file.pk])
+            )
+        events = self.bulk_create(events, batch_size=500)
+        users = sorted(set().union(*audiences.values()))
+        publish_on_commit([changes_channel(user_id) for user_id in users], {"type": ChangeEvent.CREATED})
+        return events
+
+
+class ChangeEvent(models.Model):
+    """
+    Monotonic per-user change log backing /api/changes/.
+
+    Each event is written once for every user who can see the document, so a
+    client's feed is a single indexed range scan over ``(user, id)`` and the
+    id doubles as the sync cursor. File ids are kept as plain integers because
+    events must outlive the versions they describe.
+    """
+    CREATED = "created"
+    SHARED = "shared"
+    UNSHARED = "unshared"
+    DELETED = "deleted"
+    EVENT_TYPES = [
+        (CREATED, "Version created"),
+        (SHARED, "Shared"),
+        (UNSHARED, "Unshared"),
+        (DELETED, "Version deleted"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="change_events")
+    event_type = models.CharField(max_length=16, choices=EVENT_TYPES)
+    file_version_id = models.BigIntegerField()
+    root_file_id = models.BigIntegerField()
+    actor = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChangeEventManager()
+
+    def __str__(self):
+        return f"#{self.pk} {self.event_type} {self.file_version_id} for {self.user_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='change_event_feed_idx'),
+        ]
 
@@ -0,0 +1,95 @@
+"""
+Model signal handlers, connected in FileVersionsConfig.ready().
+"""
+import copy
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from ..utils.background import run_in_background
+from ..utils.events import file_channel, get_broker, user_channel
+from .models import ChangeEvent
+
+
+def capture_deletion_audience(sender, instance, **kwargs):
+    # Shares may be removed by the same delete, so collect the audience first
+    root_file = instance.root_file if instance.root_file_id and instance.root_file_id != instance.pk else instance
+    instance._change_audience = ChangeEvent.objects.audience(root_file)
+
+
+def record_deletion(sender, instance, **kwargs):
+    audience = getattr(instance, "_change_audience", None)
+    if not audience:
+        return
+    # Deleting a user cascades to their files while their row still exists, so wait for
+    # the delete to commit and leave out the users that went with it. The copy keeps the
+    # id the collector clears from the instance.
+    deleted = copy.copy(instance)
+
+    def record():
+        users = get_user_model().objects.filter(pk__in=audience).values_list("pk", flat=True)
+        ChangeEvent.objects.record(ChangeEvent.DELETED, deleted, users)
+
+    transaction.on_commit(record)
+
+
+def version_message(file_version, root_file):
+    return {
+        "type": "version_created",
+        "id": file_version.pk,
+        "root_file_id": root_file.pk,
+        "file_name": file_version.file_name,
+        "virtual_path": file_version.virtual_path,
+        "version_number": file_version.version_number,
+        "checksum": file_version.checksum,
+        "created_at": file_version.created_at.isoformat(),
+    }
+
+
+def publish_new_version(sender, instance, created, raw=False, **kwargs):
+    """Push new versions to the live streams of their document and of everyone who can see it."""
+    if not created or raw:
+        return
+
+    def publish():
+        if instance.root_file_id:
+            root_file = instance.root_file
+        elif instance.previous_version_id:
+            root_file = instance.previous_version.root_file or instance.previous_version
+        else:
+            root_file = instance
+        message = version_message(instance, root_file)
+        broker = get_broker()
+        broker.publish(file_channel(root_file.pk), message)
+        for user_id in sorted(ChangeEvent.objects.audience(root_file)):
+            broker.publish(user_channel(user_id), message)
+
+    # Outside a transaction on_commit runs at once, so hand the audience lookup to the
+    # background queue to keep it off the request either way
+    transaction.on_commit(lambda: run_in_background(publish))
+
+
+def publish_new_versions(file_versions):
+    """
+    publish_new_version for versions inserted with bulk_create, which sends no
+    post_save. Audiences are looked up once per document, and not at all for
+    new documents, which only their owner can see yet.
+    """
+    file_versions = list(file_versions)
+
+    def publish():
+        broker = get_broker()
+        audiences = {}
+        for file_version in file_versions:
+            root_file = file_version.root_file or file_version
+            if root_file.pk not in audiences:
+                audiences[root_file.pk] = (
+                    {root_file.uploader_id} if root_file.pk == file_version.pk
+                    else ChangeEvent.objects.audience(root_file)
+                )
+            message = version_message(file_version, root_file)
+            broker.publish(file_channel(root_file.pk), message)
+            for user_id in sorted(audiences[root_file.pk]):
+                broker.publish(user_channel(user_id), message)
+
+    transaction.on_commit(lambda: run_in_background(publish))
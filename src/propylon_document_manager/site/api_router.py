@@ -1,7 +1,7 @@
 from django.conf import settings
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
-from propylon_document_manager.file_versions.api.views import FileVersionViewSet
+from propylon_document_manager.file_versions.api.views import FileVersionViewSet, RetentionPolicyViewSet
 
 
 if settings.DEBUG:
@@ -10,6 +10,7 @@ else:
     router = SimpleRouter()
 
 router.register("file_versions", FileVersionViewSet)
+router.register("retention_policies", RetentionPolicyViewSet)
 
 
 
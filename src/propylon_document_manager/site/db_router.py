@@ -0,0 +1,151 @@
+"""
+Read-replica routing.
+
+Read queries issued while serving a safe (GET/HEAD/OPTIONS) request go to one
+of ``settings.READ_REPLICAS``; everything else uses ``default``. A user who has
+just written is pinned to the primary for ``REPLICA_STICKY_SECONDS`` so they
+always read their own uploads and shares, and replicas lagging more than
+``REPLICA_MAX_LAG_SECONDS`` behind are skipped until they catch up.
+"""
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_CACHE_KEY = "replica-sticky:{}"
+
+_routing_state = contextvars.ContextVar("replica_routing_state", default=None)
+
+# alias -> (monotonic time of the check, lag in seconds)
+_lag_cache = {}
+
+POSTGRES_LAG_QUERY = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RoutingState:
+    def __init__(self, request, read_only):
+        self.request = request
+        self.read_only = read_only
+        self.user = None
+        self.wrote = False
+        self._sticky = None
+
+    def current_user(self):
+        """The authenticated user, without forcing a lazy ``request.user`` to load."""
+        if self.user is not None:
+            return self.user
+        user = self.request.__dict__.get("user")
+        if isinstance(user, SimpleLazyObject):
+            user = None if user._wrapped is empty else user._wrapped
+        if user is not None and user.is_authenticated:
+            return user
+        return None
+
+    def is_sticky(self, user):
+        if self._sticky is None:
+            self._sticky = bool(cache.get(STICKY_CACHE_KEY.format(user.pk)))
+        return self._sticky
+
+
+def set_routing_user(user):
+    """Tell the router who a request belongs to when the view authenticates by itself."""
+    state = _routing_state.get()
+    if state is not None:
+        state.user = user
+
+
+def mark_sticky(user):
+    """Pin ``user``'s reads to the primary for ``REPLICA_STICKY_SECONDS``."""
+    if settings.READ_REPLICAS and user is not None and user.is_authenticated:
+        cache.set(STICKY_CACHE_KEY.format(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def replica_lag(alias):
+    """Replication lag of ``alias`` in seconds, or ``None`` if it cannot be determined."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG_QUERY)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning("Could not determine replication lag of %s", alias, exc_info=True)
+        return None
+
+
+def healthy_replicas():
+    now = time.monotonic()
+    healthy = []
+    for alias in settings.READ_REPLICAS:
+        checked_at, lag = _lag_cache.get(alias, (None, None))
+        if checked_at is None or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+            lag = replica_lag(alias)
+            _lag_cache[alias] = (now, lag)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS:
+            healthy.append(alias)
+    return healthy
+
+
+class ReplicaRouter:
+    """Sends reads made by safe requests to a healthy replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if not settings.READ_REPLICAS or state is None or not state.read_only or state.wrote:
+            return None
+        if model._meta.label in settings.REPLICA_PRIMARY_MODELS:
+            return None
+        if connections["default"].in_atomic_block:
+            return None
+        user = state.current_user()
+        if user is not None and state.is_sticky(user):
+            return None
+        replicas = healthy_replicas()
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.READ_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Records whether the current request may read from replicas and pins writers to the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request, read_only=request.method in SAFE_METHODS)
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        if not state.read_only or state.wrote:
+            mark_sticky(state.user or getattr(request, "user", None))
+        return response
@@ -48,8 +48,36 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "propylon_document_manager.sqlite",
+        # Seconds the sqlite3 driver waits on a locked database before raising
+        "OPTIONS": {"timeout": env.int("SQLITE_TIMEOUT", default=20)},
     }
 }
+# Pragmas applied to every new SQLite connection, in order, by
+# propylon_document_manager.utils.sqlite.configure_sqlite_connection.
+# WAL lets readers proceed while a write is in progress; NORMAL sync is
+# durable across application crashes and only risks the last commits on power loss.
+SQLITE_PRAGMAS = {
+    # The driver's timeout above in milliseconds, so SQLITE_TIMEOUT sets the one lock wait
+    "busy_timeout": DATABASES["default"]["OPTIONS"]["timeout"] * 1000,
+    "journal_mode": env("SQLITE_JOURNAL_MODE", default="wal"),
+    "synchronous": env("SQLITE_SYNCHRONOUS", default="normal"),
+    "mmap_size": env.int("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024),
+    # Negative values are KiB rather than pages
+    "cache_size": env.int("SQLITE_CACHE_SIZE", default=-64000),
+    "temp_store": "memory",
+}
+# Aliases in DATABASES serving read-only traffic, see site/db_router.py
+READ_REPLICAS = []
+# https://docs.djangoproject.com/en/dev/ref/settings/#database-routers
+DATABASE_ROUTERS = ["propylon_document_manager.site.db_router.ReplicaRouter"]
+# Seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = env.int("REPLICA_STICKY_SECONDS", default=10)
+# Replicas further behind than this are skipped
+REPLICA_MAX_LAG_SECONDS = env.float("REPLICA_MAX_LAG_SECONDS", default=5.0)
+# How often each process re-measures replica lag
+REPLICA_LAG_CHECK_INTERVAL = env.float("REPLICA_LAG_CHECK_INTERVAL", default=5.0)
+# Models always read from the primary: credentials may be minted moments before use
+REPLICA_PRIMARY_MODELS = ["authtoken.Token", "sessions.Session"]
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -136,6 +164,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "propylon_document_manager.site.db_router.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware"
@@ -161,6 +190,93 @@ STATICFILES_FINDERS = [
 MEDIA_ROOT = str(BASE_DIR / "media")
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = "/media/"
+# Levels of two-hex-character directories above each uploaded blob (``3f/a2/<name>``),
+# keeping every directory small; existing blobs are moved with ``manage.py shard_media``
+MEDIA_SHARD_LEVELS = env.int("MEDIA_SHARD_LEVELS", default=2)
+# Archival tier that ``manage.py tier_media`` moves blobs nobody read for a while to: a storage
+# class and its root; the default local directory stands in for cheaper object storage
+COLD_STORAGE_BACKEND = env("COLD_STORAGE_BACKEND", default="django.core.files.storage.FileSystemStorage")
+COLD_STORAGE_ROOT = env("COLD_STORAGE_ROOT", default=str(BASE_DIR / "cold-media"))
+# Days without a download after which a version's blob is archived
+COLD_STORAGE_AFTER_DAYS = env.int("COLD_STORAGE_AFTER_DAYS", default=90)
+# Local read-through cache of archived blobs, trimmed to the least recently used beyond the size limit
+COLD_CACHE_ROOT = env("COLD_CACHE_ROOT", default=str(BASE_DIR / "cold-cache"))
+COLD_CACHE_MAX_BYTES = env.int("COLD_CACHE_MAX_BYTES", default=1024 ** 3)
+# Archived blobs up to this size are consolidated into pack files by ``manage.py pack_media``
+PACK_MAX_BLOB_BYTES = env.int("PACK_MAX_BLOB_BYTES", default=256 * 1024)
+# Size at which ``manage.py pack_media`` starts a new pack file
+PACK_TARGET_BYTES = env.int("PACK_TARGET_BYTES", default=64 * 1024 ** 2)
+
+# BACKGROUND TASKS
+# ------------------------------------------------------------------------------
+# Threads running post-upload work, see utils/background.py
+BACKGROUND_TASK_WORKERS = env.int("BACKGROUND_TASK_WORKERS", default=2)
+# Run background tasks inline in the calling thread
+BACKGROUND_TASKS_EAGER = env.bool("BACKGROUND_TASKS_EAGER", default=False)
+
+# PREVIEWS
+# ------------------------------------------------------------------------------
+# Bounding box of first-page thumbnails in pixels
+PREVIEW_THUMBNAIL_SIZE = (240, 320)
+# Approximate characters per preview page for formats without fixed pages
+PREVIEW_PAGE_CHARS = 3000
+# Pages rendered per document
+PREVIEW_MAX_PAGES = env.int("PREVIEW_MAX_PAGES", default=20)
+
+# TEXT EXTRACTION
+# ------------------------------------------------------------------------------
+# Additional or replacement extractors, {"mime/type": "dotted.path.ExtractorClass"},
+# see utils/file_extraction.py
+TEXT_EXTRACTORS = {}
+# Seconds an extractor may run unless it sets its own timeout
+EXTRACTION_TIMEOUT = env.int("EXTRACTION_TIMEOUT", default=300)
+# Processes extracting large PDFs; 0 uses every CPU
+PDF_EXTRACTION_WORKERS = env.int("PDF_EXTRACTION_WORKERS", default=0)
+# Smaller PDFs are extracted in-process, where worker start-up would outweigh the gain
+PDF_PARALLEL_MIN_PAGES = env.int("PDF_PARALLEL_MIN_PAGES", default=200)
+# Minimum pages handed to a worker at once
+PDF_PAGES_PER_TASK = 16
+# Start method of extraction worker processes; "spawn" is safe in threaded servers
+EXTRACTION_MP_CONTEXT = env("EXTRACTION_MP_CONTEXT", default="spawn")
+# Seconds a structure-aware comparison (/api/compare/?mode=structure) stays cached per checksum pair
+STRUCTURED_DIFF_CACHE_SECONDS = env.int("STRUCTURED_DIFF_CACHE_SECONDS", default=7 * 24 * 3600)
+# Estimated text similarity (0-1) from which other documents count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = env.float("NEAR_DUPLICATE_THRESHOLD", default=0.8)
+# Most near-duplicates returned for one version
+NEAR_DUPLICATE_MAX_RESULTS = 20
+
+# API
+# ------------------------------------------------------------------------------
+# Most ids plus paths accepted by one /api/file_versions/batch/ request
+BATCH_LOOKUP_MAX_ITEMS = env.int("BATCH_LOOKUP_MAX_ITEMS", default=100)
+# Most files accepted by one /api/upload/batch/ request; Django's limits on files and
+# fields per request follow it, as each file comes with its virtual path
+UPLOAD_BATCH_MAX_FILES = env.int("UPLOAD_BATCH_MAX_FILES", default=500)
+DATA_UPLOAD_MAX_NUMBER_FILES = UPLOAD_BATCH_MAX_FILES
+DATA_UPLOAD_MAX_NUMBER_FIELDS = max(1000, 2 * UPLOAD_BATCH_MAX_FILES)
+# Longest lifetime in seconds of a signed download URL (/api/download-urls/); access revoked
+# after one is minted only takes effect once it expires
+SIGNED_URL_MAX_AGE = env.int("SIGNED_URL_MAX_AGE", default=300)
+# Broker delivering live events to long-polls and event streams, see utils/events.py
+EVENT_BROKER = env("EVENT_BROKER", default="propylon_document_manager.utils.events.LocalBroker")
+# Messages buffered per subscriber before a slow one starts missing them
+EVENT_QUEUE_SIZE = 1000
+# Longest a /api/changes/ long-poll (?wait=) may block, in seconds
+CHANGES_MAX_WAIT = env.float("CHANGES_MAX_WAIT", default=30.0)
+# How often waiting long-polls and change streams re-check the database, covering
+# events published by other processes that the broker doesn't reach
+CHANGES_POLL_INTERVAL = env.float("CHANGES_POLL_INTERVAL", default=1.0)
+# Change events younger than this many seconds are held back from /api/changes/. Ids are
+# assigned on insert, so where transactions commit concurrently (PostgreSQL) an event may become
+# visible after one with a higher id and be skipped by a since= cursor already past it; SQLite
+# serializes writes, so ids commit in order there and no window is needed
+CHANGES_SETTLE_SECONDS = env.float(
+    "CHANGES_SETTLE_SECONDS", default=0.0 if DATABASES["default"]["ENGINE"].endswith("sqlite3") else 2.0
+)
+# Event streams close after this many seconds; clients reconnect (with Last-Event-ID)
+CHANGES_STREAM_SECONDS = env.int("CHANGES_STREAM_SECONDS", default=300)
+# Comment lines keep idle streams from being cut by proxies
+CHANGES_KEEPALIVE_SECONDS = env.int("CHANGES_KEEPALIVE_SECONDS", default=15)
 
 # TEMPLATES
 # ------------------------------------------------------------------------------
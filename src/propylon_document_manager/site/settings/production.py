@@ -11,6 +11,14 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["propylon.com"])
 # DATABASES
 # ------------------------------------------------------------------------------
 DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)  # noqa: F405
+# Comma separated database URLs of read replicas, e.g. postgres://reader@replica-1/propylon
+READ_REPLICAS = []
+for index, replica_url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    alias = f"replica{index}"
+    DATABASES[alias] = env.db_url_config(replica_url)  # noqa: F405
+    DATABASES[alias]["CONN_MAX_AGE"] = DATABASES["default"]["CONN_MAX_AGE"]  # noqa: F405
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}  # noqa: F405
+    READ_REPLICAS.append(alias)
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -2,11 +2,22 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from propylon_document_manager.file_versions.api.views import (
+    ChangeFeedView,
     CustomObtainAuthToken, 
+    EventStreamView,
+    FileBatchUploadView,
     FileDownloadByNameView, 
+    FileUploadLinkView,
+    FileUploadPreflightView,
     FileUploadView, 
     FileCompareView,
-    FileShareView
+    FileHistoryView,
+    FileShareView,
+    FolderView,
+    PreviewView,
+    SignedDownloadURLView,
+    SignedDownloadView,
+    SimilarDocumentsView
 )
 
 
@@ -19,9 +30,22 @@ urlpatterns = [
     path("api-auth/", include("rest_framework.urls")),
     path("api/token/", CustomObtainAuthToken.as_view(), name="custom_token_auth"),
     path("api/upload/", FileUploadView.as_view(), name="file_upload"),
+    path("api/upload/batch/", FileBatchUploadView.as_view(), name="file_upload_batch"),
+    path("api/upload/preflight/", FileUploadPreflightView.as_view(), name="file_upload_preflight"),
+    path("api/upload/link/", FileUploadLinkView.as_view(), name="file_upload_link"),
     path("api/download/<path:path>/", FileDownloadByNameView.as_view(), name="file_download"),
+    path("api/download-urls/", SignedDownloadURLView.as_view(), name="signed_download_url"),
+    path("api/signed/<str:signature>/<str:file_name>", SignedDownloadView.as_view(), name="signed_download"),
     path("api/compare/", FileCompareView.as_view(), name="file_compare"),
+    path("api/history/<int:file_id>/", FileHistoryView.as_view(), name="file_history"),
+    path("api/similar/<int:file_id>/", SimilarDocumentsView.as_view(), name="file_similar"),
     path("api/share/", FileShareView.as_view(), name="file_share"),
+    path("api/changes/", ChangeFeedView.as_view(), name="change_feed"),
+    path("api/events/me/", EventStreamView.as_view(), name="user_events"),
+    path("api/events/files/<int:file_id>/", EventStreamView.as_view(), name="file_events"),
+    path("api/folders/", FolderView.as_view(), name="folder_root"),
+    path("api/folders/<path:path>/", FolderView.as_view(), name="folder_detail"),
+    path("api/previews/<str:checksum>/<str:name>", PreviewView.as_view(), name="file_preview"),
 ]
 
 if settings.DEBUG:
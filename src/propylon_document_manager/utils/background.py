@@ -0,0 +1,77 @@
+"""
+Minimal in-process background work queue.
+
+Post-upload work (previews, text extraction, ...) is handed to a small thread
+pool once the surrounding transaction commits, so requests return as soon as
+the upload is stored. Set ``BACKGROUND_TASKS_EAGER`` to run tasks inline, as
+the test suite does; ``drain`` waits for queued tasks, e.g. between benchmark
+iterations.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Submitted tasks that haven't finished yet
+_pending = set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_TASK_WORKERS, thread_name_prefix="background-task"
+            )
+        return _executor
+
+
+def _run(func, args, kwargs, in_worker):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, "__name__", func))
+    finally:
+        if in_worker:
+            # Worker threads hold their own connections; don't leak them between tasks
+            close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` after the current transaction commits, off the request thread."""
+    if settings.BACKGROUND_TASKS_EAGER:
+        _run(func, args, kwargs, in_worker=False)
+        return
+    transaction.on_commit(lambda: _submit(func, args, kwargs))
+
+
+def _submit(func, args, kwargs):
+    future = _get_executor().submit(_run, func, args, kwargs, True)
+    with _executor_lock:
+        _pending.add(future)
+    future.add_done_callback(_discard)
+
+
+def _discard(future):
+    with _executor_lock:
+        _pending.discard(future)
+
+
+def drain(timeout=None):
+    """
+    Wait until every submitted task, including tasks those queue in turn, has
+    finished; returns False if some were still running after ``timeout`` seconds.
+    """
+    while True:
+        with _executor_lock:
+            pending = list(_pending)
+        if not pending:
+            return True
+        if wait(pending, timeout=timeout).not_done:
+            return False
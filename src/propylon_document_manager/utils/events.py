@@ -0,0 +1,131 @@
+"""
+Publish/subscribe broker behind the live event streams.
+
+Publishers send JSON-serialisable messages to named channels (``file:<root id>``,
+``user:<user id>``, ...) and stream views subscribe to the channels they serve.
+``EVENT_BROKER`` selects the implementation; the default ``LocalBroker`` fans
+messages out within the current process only, which is enough for a single
+server process and for tests. Deployments running several processes plug in a
+broker backed by shared infrastructure with the same interface.
+"""
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Messages from a set of channels, delivered through a bounded queue."""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.queue = queue.Queue(maxsize=maxsize)
+        # Set when messages were dropped because the subscriber fell behind
+        self.overflowed = False
+
+    def deliver(self, channel, message):
+        try:
+            self.queue.put_nowait((channel, message))
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Next ``(channel, message)`` pair, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Broker:
+    """Interface of event brokers."""
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channels):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """In-process broker; subscribers only see messages published by the same process."""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or settings.EVENT_QUEUE_SIZE
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(channel, message)
+        return len(subscribers)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENT_BROKER)()
+        return _broker
+
+
+def file_channel(root_file_id):
+    return f"file:{root_file_id}"
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def changes_channel(user_id):
+    return f"changes:{user_id}"
+
+
+def publish_on_commit(channels, message):
+    """Publish ``message`` to every channel once the current transaction commits."""
+    channels = list(channels)
+
+    def publish():
+        broker = get_broker()
+        for channel in channels:
+            broker.publish(channel, message)
+
+    transaction.on_commit(publish)
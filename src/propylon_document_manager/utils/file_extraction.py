@@ -1,10 +1,29 @@
+"""
+Text extraction through a registry of extractors keyed by MIME type.
+
+Each extractor has a name, a version (bumped whenever its output changes so
+stored extractions can be redone) and a timeout. Projects add or replace
+extractors with ``register_extractor`` or the ``TEXT_EXTRACTORS`` setting.
+"""
+import contextlib
 import mimetypes
+import multiprocessing
+import os
+import threading
+import time
 import mammoth
 import zipfile
 import pypdf
+from dataclasses import dataclass
+from typing import Optional
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.utils.module_loading import import_string
 
+from .storage_tiers import PACKED, blob_path, open_blob
 
-SUPPORTED_MIME_TYPES = {
+TEXT_MIME_TYPES = {
     'text/plain',
     'text/markdown',
     'text/html',
@@ -19,34 +38,386 @@ SUPPORTED_MIME_TYPES = {
     'text/x-config',
     'text/x-rst',
     'application/x-tex',
-    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',  # DOCX
-    'application/vnd.oasis.opendocument.text',  # ODT
-    'application/pdf'
 }
 
-def extract_text(fv):
-    mime = fv.mime_type or mimetypes.guess_type(fv.file_path.name)[0]
-    if mime not in SUPPORTED_MIME_TYPES:
-        return f"Unsupported MIME type: {mime}"
+# Every MIME type with a registered extractor
+SUPPORTED_MIME_TYPES = set()
 
-    file_path = fv.file_path.path
+# Tried in order for text files; latin-1 decodes any byte sequence, so it always succeeds
+TEXT_ENCODINGS = ("utf-8-sig", "cp1252", "latin-1")
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    page_count: Optional[int] = None
+    encoding: str = ""
+    supported: bool = True
+    extractor: str = ""
+    extractor_version: int = 0
+
+
+class Extractor:
+    """
+    Base class of extractors; ``extract`` returns an ExtractionResult for a
+    file given by its path or, for blobs read in place from a pack file, as a
+    seekable binary file object (see ``open_source``).
+    """
+    name = ""
+    version = 1
+    # Seconds before the extraction is abandoned; None uses settings.EXTRACTION_TIMEOUT
+    timeout = None
+
+    def get_timeout(self):
+        return self.timeout if self.timeout is not None else settings.EXTRACTION_TIMEOUT
+
+    def extract(self, file_path):
+        raise NotImplementedError
+
+
+_registry = {}
+_configured = False
+_registry_lock = threading.Lock()
+
+
+def register_extractor(*mime_types):
+    """Class decorator registering an extractor for ``mime_types``, replacing any previous one."""
+    def decorator(cls):
+        extractor = cls()
+        for mime in mime_types:
+            _registry[mime] = extractor
+            SUPPORTED_MIME_TYPES.add(mime)
+        return cls
+    return decorator
+
+
+def registered_extractors():
+    """Extractor instances by MIME type, including those configured in TEXT_EXTRACTORS."""
+    global _configured
+    with _registry_lock:
+        if not _configured:
+            for configured_mime, path in getattr(settings, "TEXT_EXTRACTORS", {}).items():
+                register_extractor(configured_mime)(import_string(path))
+            _configured = True
+    return _registry
 
-    if mime == "application/pdf":
-        with open(file_path, "rb") as f:
-            reader = pypdf.PdfReader(f)
-            return "\n".join([page.extract_text() or "" for page in reader.pages])
 
+def get_extractor(mime):
+    return registered_extractors().get(mime)
 
-    elif mime == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        with open(file_path, "rb") as f:
+
+def open_source(source):
+    """Open an extractor's source for binary reading; file objects are rewound and left open."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "rb")
+    source.seek(0)
+    return contextlib.nullcontext(source)
+
+
+def _read_text(source):
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+        data = source.read()
+        for encoding in TEXT_ENCODINGS:
+            try:
+                return data.decode(encoding), encoding
+            except UnicodeDecodeError:
+                continue
+        return None
+    for encoding in TEXT_ENCODINGS:
+        try:
+            with open(source, "r", encoding=encoding) as f:
+                return f.read(), encoding
+        except UnicodeDecodeError:
+            continue
+
+
+@register_extractor(*TEXT_MIME_TYPES)
+class TextExtractor(Extractor):
+    name = "text"
+
+    def extract(self, file_path):
+        text, encoding = _read_text(file_path)
+        return ExtractionResult(text, encoding=encoding)
+
+
+@register_extractor("application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+class DocxExtractor(Extractor):
+    name = "docx"
+
+    def extract(self, file_path):
+        with open_source(file_path) as f:
             result = mammoth.convert_to_markdown(f)
-            return result.value
+            return ExtractionResult(result.value)
+
+
+ODT_TEXT_NS = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+ODT_META_NS = "urn:oasis:names:tc:opendocument:xmlns:meta:1.0"
+ODT_PARAGRAPHS = {f"{{{ODT_TEXT_NS}}}p", f"{{{ODT_TEXT_NS}}}h"}
+ODT_SPACE = f"{{{ODT_TEXT_NS}}}s"
+ODT_TAB = f"{{{ODT_TEXT_NS}}}tab"
+ODT_LINE_BREAK = f"{{{ODT_TEXT_NS}}}line-break"
+
+
+def _odt_inline_text(element):
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag == ODT_SPACE:
+            parts.append(" " * int(child.get(f"{{{ODT_TEXT_NS}}}c", 1)))
+        elif child.tag == ODT_TAB:
+            parts.append("\t")
+        elif child.tag == ODT_LINE_BREAK:
+            parts.append("\n")
+        else:
+            parts.append(_odt_inline_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def iter_odt_paragraphs(source):
+    """
+    Yield the non-empty paragraphs and headings of an ODT package, in document order.
+
+    ``content.xml`` is parsed incrementally straight from the archive, and
+    every element is detached once finished, so memory stays flat regardless
+    of document size.
+    """
+    with zipfile.ZipFile(source, "r") as z:
+        with z.open("content.xml") as f:
+            stack = []
+            paragraph_depth = 0
+            for event, element in ElementTree.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    stack.append(element)
+                    if element.tag in ODT_PARAGRAPHS:
+                        paragraph_depth += 1
+                    continue
+                stack.pop()
+                if element.tag in ODT_PARAGRAPHS:
+                    paragraph_depth -= 1
+                    if paragraph_depth == 0:
+                        text = _odt_inline_text(element).strip()
+                        if text:
+                            yield text
+                # Paragraph content is needed until its paragraph ends; anything else can go now
+                if paragraph_depth == 0 and stack:
+                    stack[-1].remove(element)
+
+
+def odt_page_count(source):
+    """Page count recorded by the authoring application in meta.xml, if any."""
+    with zipfile.ZipFile(source, "r") as z:
+        if "meta.xml" not in z.namelist():
+            return None
+        root = ElementTree.fromstring(z.read("meta.xml"))
+    statistic = root.find(f".//{{{ODT_META_NS}}}document-statistic")
+    count = statistic.get(f"{{{ODT_META_NS}}}page-count") if statistic is not None else None
+    return int(count) if count and count.isdigit() else None
+
+
+@register_extractor("application/vnd.oasis.opendocument.text")
+class OdtExtractor(Extractor):
+    """Paragraph text of ODT documents, one blank line between paragraphs."""
+    name = "odt"
+    version = 2
+
+    def extract(self, file_path):
+        text = "\n\n".join(iter_odt_paragraphs(file_path))
+        return ExtractionResult(text, page_count=odt_page_count(file_path), encoding="utf-8")
+
+
+def _extract_page_range(task):
+    """Process pool worker: text of pages ``start``..``stop`` of the PDF at ``file_path``."""
+    file_path, start, stop = task
+    with open(file_path, "rb") as f:
+        reader = pypdf.PdfReader(f)
+        return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+def page_ranges(page_count, workers, min_pages):
+    """Split pages into contiguous ranges, a few per worker so uneven pages balance out."""
+    size = max(min_pages, -(-page_count // (workers * 4)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+@register_extractor("application/pdf")
+class PdfExtractor(Extractor):
+    """
+    Extracts PDFs page by page. Documents of at least ``PDF_PARALLEL_MIN_PAGES``
+    pages are split into page ranges extracted by a process pool and
+    reassembled in page order.
+    """
+    name = "pdf"
+
+    def workers(self):
+        return settings.PDF_EXTRACTION_WORKERS or os.cpu_count() or 1
+
+    def extract(self, file_path):
+        with open_source(file_path) as f:
+            reader = pypdf.PdfReader(f)
+            pages = reader.pages
+            page_count = len(pages)
+            workers = min(self.workers(), page_count // max(settings.PDF_PAGES_PER_TASK, 1))
+            # Workers reopen the file by path, so packed blobs are extracted in-process
+            in_process = not isinstance(file_path, (str, os.PathLike))
+            if page_count < settings.PDF_PARALLEL_MIN_PAGES or workers < 2 or in_process:
+                texts = [page.extract_text() or "" for page in pages]
+                return ExtractionResult("\n".join(texts), page_count=page_count)
+
+        texts = self.extract_parallel(file_path, page_count, workers)
+        return ExtractionResult("\n".join(texts), page_count=page_count)
+
+    def extract_parallel(self, file_path, page_count, workers):
+        tasks = [
+            (file_path, start, stop)
+            for start, stop in page_ranges(page_count, workers, settings.PDF_PAGES_PER_TASK)
+        ]
+        context = multiprocessing.get_context(settings.EXTRACTION_MP_CONTEXT)
+        pool = context.Pool(processes=workers)
+        try:
+            chunks = pool.map_async(_extract_page_range, tasks, chunksize=1).get(timeout=self.get_timeout())
+        except multiprocessing.TimeoutError:
+            raise ExtractionTimeout(f"PDF extraction exceeded {self.get_timeout()}s")
+        finally:
+            # Kills workers still busy after a timeout; they would otherwise run to the end
+            pool.terminate()
+            pool.join()
+        return [text for chunk in chunks for text in chunk]
+
+
+def _run_with_timeout(extractor, file_path):
+    timeout = extractor.get_timeout()
+    if not timeout:
+        return extractor.extract(file_path)
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = extractor.extract(file_path)
+        except BaseException as e:
+            outcome["error"] = e
+
+    # A stuck extractor can't be interrupted; its daemon thread is abandoned instead
+    thread = threading.Thread(target=target, name=f"extract-{extractor.name}", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise ExtractionTimeout(f"{extractor.name} extraction exceeded {timeout}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def detect_mime_type(fv):
+    return fv.mime_type or mimetypes.guess_type(fv.file_path.name)[0]
+
+
+def extract_document(fv):
+    """Extract the text of a FileVersion with the extractor registered for its MIME type."""
+    mime = detect_mime_type(fv)
+    extractor = get_extractor(mime)
+    if extractor is None:
+        return ExtractionResult(f"Unsupported MIME type: {mime}", supported=False)
+
+    if fv.storage_tier == PACKED:
+        with open_blob(fv) as source:
+            result = _run_with_timeout(extractor, source)
+    else:
+        result = _run_with_timeout(extractor, blob_path(fv))
+    result.extractor = extractor.name
+    result.extractor_version = extractor.version
+    return result
+
+
+def extract_text(fv):
+    return extract_document(fv).text
+
+
+def stored_text(fv):
+    """Text saved by the extraction stage once it has finished, extracted on the fly otherwise."""
+    from ..file_versions.models import TextExtraction
+
+    try:
+        extraction = fv.extraction
+    except TextExtraction.DoesNotExist:
+        extraction = None
+    if extraction is not None and extraction.status == TextExtraction.DONE:
+        return extraction.text
+    return extract_text(fv)
+
+
+def store_extraction(file_version_id, force=False):
+    """
+    Post-upload pipeline stage: extract a version's text and save it with its stats.
+
+    Versions sharing a checksum with one already extracted by the current
+    extractor version reuse its result.
+    """
+    from ..file_versions.models import FileVersion, TextExtraction
+
+    file_version = FileVersion.objects.filter(pk=file_version_id).first()
+    if file_version is None:
+        return None
+    extraction, _ = TextExtraction.objects.get_or_create(file_version=file_version)
+    extractor = get_extractor(detect_mime_type(file_version))
+    current = (extractor.name, extractor.version) if extractor else ("", 0)
+    if (
+        extraction.status == TextExtraction.DONE
+        and (extraction.extractor, extraction.extractor_version) == current
+        and not force
+    ):
+        return extraction
+
+    previous = None
+    if file_version.checksum and not force:
+        previous = (
+            TextExtraction.objects
+            .filter(
+                file_version__checksum=file_version.checksum,
+                status=TextExtraction.DONE,
+                extractor=current[0],
+                extractor_version=current[1],
+            )
+            .exclude(pk=file_version.pk)
+            .first()
+        )
+    if previous is not None:
+        for field in (
+            "text", "page_count", "char_count", "word_count", "encoding", "duration_ms",
+            "extractor", "extractor_version",
+        ):
+            setattr(extraction, field, getattr(previous, field))
+        extraction.status = TextExtraction.DONE
+        extraction.error = ""
+        extraction.save()
+        return extraction
 
-    elif mime == "application/vnd.oasis.opendocument.text":
-        with zipfile.ZipFile(file_path, "r") as z:
-            with z.open("content.xml") as f:
-                return f.read().decode("utf-8")
+    extraction.extractor, extraction.extractor_version = current
+    started = time.perf_counter()
+    try:
+        result = extract_document(file_version)
+    except Exception as e:
+        extraction.status = TextExtraction.FAILED
+        extraction.error = str(e)[:1000] or type(e).__name__
+        extraction.duration_ms = int((time.perf_counter() - started) * 1000)
+        extraction.save()
+        raise
 
+    extraction.duration_ms = int((time.perf_counter() - started) * 1000)
+    extraction.error = ""
+    if result.supported:
+        extraction.status = TextExtraction.DONE
+        # NUL characters can't be stored in PostgreSQL text columns
+        extraction.text = result.text.replace("\x00", "")
+        extraction.page_count = result.page_count
+        extraction.char_count = len(extraction.text)
+        extraction.word_count = len(extraction.text.split())
+        extraction.encoding = result.encoding
     else:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
+        extraction.status = TextExtraction.UNSUPPORTED
+    extraction.save()
+    return extraction
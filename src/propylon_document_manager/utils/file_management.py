@@ -1,12 +1,51 @@
+import hashlib
 import os
+import shutil
+import tempfile
 import uuid
 from datetime import datetime
+from django.conf import settings
 from django.utils.text import slugify
 
+
+def shard_directory(name, levels=None):
+    """Fan-out directories for a blob name, e.g. ``3f/a2``, derived from a hash of the name."""
+    levels = settings.MEDIA_SHARD_LEVELS if levels is None else levels
+    digest = hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+    return "/".join(digest[2 * level:2 * level + 2] for level in range(levels))
+
+
+def sharded_name(name, levels=None):
+    """Storage name of a blob inside its fan-out directories; only the base name is kept."""
+    base = os.path.basename(name)
+    directory = shard_directory(base, levels)
+    return f"{directory}/{base}" if directory else base
+
+
 def unique_file_upload_path(instance, filename):
     base, ext = os.path.splitext(filename)
     ext = ext.lower()
     slug = slugify(base)
     date = datetime.now().strftime("%Y%m%d")
     unique = uuid.uuid4().hex[:10]
-    return f"{date}_{slug}_{unique}{ext}"
+    return sharded_name(f"{date}_{slug}_{unique}{ext}")
+
+
+def link_or_copy(source, destination):
+    """
+    Make ``destination`` a hard link to ``source``, copying when the file
+    system can't link. Copies are written to a temporary name and renamed into
+    place, so readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(destination), prefix=".relocate-")
+        os.close(fd)
+        try:
+            shutil.copy2(source, temporary)
+            os.replace(temporary, destination)
+        except BaseException:
+            os.unlink(temporary)
+            raise
@@ -0,0 +1,163 @@
+"""
+Near-duplicate detection with MinHash fingerprints of extracted text.
+
+Exact deduplication by checksum misses re-scanned or re-saved copies of a
+document. Each version's text is reduced to a MinHash signature over
+word shingles whose LSH band keys are stored in ``FingerprintBucket``;
+versions sharing any band key are candidates, found through the key index
+instead of by comparing against the whole corpus, and are then ranked by
+estimated similarity.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .events import publish_on_commit, user_channel
+from .minhash import MinHasher, band_keys, shingles, similarity
+
+# Bumped whenever signatures change, so older fingerprints are recomputed
+FINGERPRINT_VERSION = 1
+# Words per shingle; longer shingles make small edits count for more
+SHINGLE_SIZE = 5
+# 128 permutations in 32 bands of 4 rows: pairs at 0.8 similarity share a band
+# almost surely, pairs below 0.3 rarely do
+NUM_PERM = 128
+BANDS = 32
+
+_hasher = MinHasher(NUM_PERM, seed=40)
+
+
+def text_signature(text):
+    """``(signature, shingle count)`` of a text, or ``(None, 0)`` when it has no words."""
+    shingle_set = shingles(text, SHINGLE_SIZE)
+    if not shingle_set:
+        return None, 0
+    return list(_hasher.signature(shingle_set)), len(shingle_set)
+
+
+def store_fingerprint(file_version_id, force=False):
+    """
+    Post-upload pipeline stage: fingerprint a version's extracted text and index its band keys.
+
+    Versions without extracted text are skipped. Copies sharing a checksum
+    with an already fingerprinted version reuse its signature.
+    """
+    from ..file_versions.models import ContentFingerprint, FileVersion, FingerprintBucket, TextExtraction
+
+    file_version = FileVersion.objects.select_related("extraction").filter(pk=file_version_id).first()
+    if file_version is None:
+        return None
+    existing = ContentFingerprint.objects.filter(file_version=file_version).first()
+    if existing is not None and existing.algorithm_version == FINGERPRINT_VERSION and not force:
+        return existing
+
+    previous = None
+    if file_version.checksum and not force:
+        previous = (
+            ContentFingerprint.objects
+            .filter(file_version__checksum=file_version.checksum, algorithm_version=FINGERPRINT_VERSION)
+            .exclude(file_version=file_version)
+            .first()
+        )
+    if previous is not None:
+        signature, shingle_count = previous.signature, previous.shingle_count
+    else:
+        try:
+            extraction = file_version.extraction
+        except TextExtraction.DoesNotExist:
+            return None
+        if extraction.status != TextExtraction.DONE:
+            return None
+        signature, shingle_count = text_signature(extraction.text)
+        if signature is None:
+            return None
+
+    with transaction.atomic():
+        fingerprint, _ = ContentFingerprint.objects.update_or_create(
+            file_version=file_version,
+            defaults={
+                "signature": signature,
+                "shingle_count": shingle_count,
+                "algorithm_version": FINGERPRINT_VERSION,
+            },
+        )
+        FingerprintBucket.objects.filter(file_version=file_version).delete()
+        FingerprintBucket.objects.bulk_create(
+            FingerprintBucket(file_version=file_version, key=key) for key in band_keys(signature, BANDS)
+        )
+    return fingerprint
+
+
+def near_duplicates(file_version, user, threshold=None, limit=None):
+    """
+    Versions of other documents ``user`` can view whose text is at least
+    ``threshold`` similar to ``file_version``, most similar first and at most
+    one (the closest version) per document.
+    """
+    from ..file_versions.models import ContentFingerprint, FileVersion, FingerprintBucket
+
+    threshold = settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+    limit = limit or settings.NEAR_DUPLICATE_MAX_RESULTS
+    fingerprint = ContentFingerprint.objects.filter(
+        file_version=file_version, algorithm_version=FINGERPRINT_VERSION
+    ).first()
+    if fingerprint is None:
+        return []
+
+    root_id = file_version.root_file_id or file_version.pk
+    candidates = (
+        ContentFingerprint.objects
+        .filter(
+            file_version__in=FingerprintBucket.objects
+            .filter(key__in=band_keys(fingerprint.signature, BANDS))
+            .values("file_version_id"),
+            algorithm_version=FINGERPRINT_VERSION,
+        )
+        .exclude(file_version__root_file_id=root_id)
+        .exclude(file_version_id=root_id)
+        .select_related("file_version")
+    )
+    best = {}
+    for candidate in candidates:
+        score = similarity(fingerprint.signature, candidate.signature)
+        other_root = candidate.file_version.root_file_id or candidate.file_version_id
+        if score >= threshold and score > best.get(other_root, (-1,))[0]:
+            best[other_root] = (score, candidate.file_version)
+
+    readable = FileVersion.objects.readable_root_ids(user, best)
+    matches = sorted(
+        (match for other_root, match in best.items() if other_root in readable),
+        key=lambda match: (-match[0], match[1].pk),
+    )
+    return [
+        {
+            "id": match.pk,
+            "root_file_id": match.root_file_id or match.pk,
+            "file_name": match.file_name,
+            "virtual_path": match.virtual_path,
+            "version_number": match.version_number,
+            "similarity": round(score, 3),
+        }
+        for score, match in matches[:limit]
+    ]
+
+
+def warn_near_duplicates(file_version_id):
+    """
+    Post-upload pipeline stage: tell the document's owner, over their live
+    event channel, about near-identical documents at other paths.
+    """
+    from ..file_versions.models import FileVersion
+
+    file_version = FileVersion.objects.select_related("uploader").filter(pk=file_version_id).first()
+    if file_version is None:
+        return []
+    matches = near_duplicates(file_version, file_version.uploader)
+    if matches:
+        publish_on_commit([user_channel(file_version.uploader_id)], {
+            "type": "near_duplicate",
+            "id": file_version.pk,
+            "root_file_id": file_version.root_file_id or file_version.pk,
+            "virtual_path": file_version.virtual_path,
+            "similar": matches,
+        })
+    return matches
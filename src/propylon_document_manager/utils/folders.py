@@ -0,0 +1,118 @@
+"""
+Helpers for the materialized-path folder index.
+
+Folder paths always start and end with ``/``; the root folder is ``/``. The
+functions taking model classes are also used by migrations, so they must only
+rely on fields and default managers.
+"""
+from collections import defaultdict
+
+from django.db.models import PROTECT, RESTRICT, Count, Q, Sum
+from django.db.models.functions import Greatest
+
+
+# Folder fields recomputed by rebuild_folder_index
+REBUILT_FIELDS = ["name", "parent", "depth", "file_count", "total_size", "subtree_file_count", "subtree_size"]
+
+
+def folder_segments(path):
+    return [segment for segment in path.split("/") if segment]
+
+
+def normalize_folder_path(path):
+    segments = folder_segments(path or "")
+    return "/" + "".join(f"{segment}/" for segment in segments)
+
+
+def folder_path_for(virtual_path):
+    """Folder holding a document, e.g. ``/contracts/2026/`` for ``/contracts/2026/lease.pdf``."""
+    return normalize_folder_path("/".join(folder_segments(virtual_path)[:-1]))
+
+
+def ancestor_paths(folder_path):
+    """``folder_path`` and all of its ancestors, root first."""
+    segments = folder_segments(folder_path)
+    return [normalize_folder_path("/".join(segments[:depth])) for depth in range(len(segments) + 1)]
+
+
+def folder_name(folder_path):
+    segments = folder_segments(folder_path)
+    return segments[-1] if segments else ""
+
+
+def rebuild_folder_index(Folder, FileVersion):
+    """
+    Bring every folder and its counters in line with the FileVersion table.
+
+    Used by the migration introducing folders and by ``rebuild_folder_index``
+    to repair drift; the upload path maintains the index incrementally.
+    Existing folders are updated in place, so rows referring to them keep
+    working; folders without documents are deleted unless a protected or
+    restricted relation (a retention policy) refers to them.
+    """
+    direct = defaultdict(lambda: {"files": 0, "size": 0, "paths": []})
+    rows = (
+        FileVersion.objects.values("uploader_id", "virtual_path")
+        .annotate(
+            documents=Count("id", filter=Q(previous_version__isnull=True)),
+            size=Sum(Greatest("file_size", 0)),
+        )
+        .order_by()
+    )
+    for row in rows.iterator():
+        entry = direct[(row["uploader_id"], folder_path_for(row["virtual_path"]))]
+        entry["files"] += row["documents"]
+        entry["size"] += row["size"] or 0
+        entry["paths"].append(row["virtual_path"])
+
+    subtree = defaultdict(lambda: [0, 0])
+    for (owner_id, path), entry in direct.items():
+        for ancestor in ancestor_paths(path):
+            subtree[(owner_id, ancestor)][0] += entry["files"]
+            subtree[(owner_id, ancestor)][1] += entry["size"]
+
+    referenced = Q(pk__in=[])
+    for relation in Folder._meta.related_objects:
+        if relation.on_delete in (PROTECT, RESTRICT):
+            referenced |= Q(**{f"{relation.name}__isnull": False})
+    for owner_id, path in Folder.objects.filter(referenced).values_list("owner_id", "path").distinct():
+        for ancestor in ancestor_paths(path):
+            subtree.setdefault((owner_id, ancestor), [0, 0])
+
+    existing = {(folder.owner_id, folder.path): folder for folder in Folder.objects.all()}
+
+    # Parents are saved before children so every row can reference its parent's id
+    folders = {}
+    for depth in sorted({len(folder_segments(path)) for _, path in subtree}):
+        new, changed = [], []
+        for (owner_id, path), (files, size) in subtree.items():
+            if len(folder_segments(path)) != depth:
+                continue
+            values = {
+                "name": folder_name(path),
+                "parent": folders.get((owner_id, ancestor_paths(path)[-2])) if depth else None,
+                "depth": depth,
+                "file_count": direct[(owner_id, path)]["files"] if (owner_id, path) in direct else 0,
+                "total_size": direct[(owner_id, path)]["size"] if (owner_id, path) in direct else 0,
+                "subtree_file_count": files,
+                "subtree_size": size,
+            }
+            folder = existing.get((owner_id, path))
+            if folder is None:
+                new.append(Folder(owner_id=owner_id, path=path, **values))
+                continue
+            for field, value in values.items():
+                setattr(folder, field, value)
+            changed.append(folder)
+            folders[(owner_id, path)] = folder
+        Folder.objects.bulk_update(changed, REBUILT_FIELDS, batch_size=1000)
+        for folder in Folder.objects.bulk_create(new, batch_size=1000):
+            folders[(folder.owner_id, folder.path)] = folder
+
+    for (owner_id, path), entry in direct.items():
+        FileVersion.objects.filter(uploader_id=owner_id, virtual_path__in=entry["paths"]).update(
+            folder=folders[(owner_id, path)]
+        )
+    # Kept folders' ancestors are kept too, so no stale folder has a kept child
+    Folder.objects.filter(pk__in=[folder.pk for key, folder in existing.items() if key not in folders]).delete()
+    return len(folders)
@@ -0,0 +1,163 @@
+"""
+Garbage collection of storage and permission rows nothing refers to anymore.
+
+Deleting a FileVersion (directly or through its uploader) leaves its blob
+and its checksum's previews behind, and guardian's generic object permissions
+outlive their objects (FileVersion's own permission tables cascade).
+Each collector walks its candidates in batches, yields what it removed (or
+would remove, with ``dry_run``) and pauses ``sleep`` seconds between
+batches, so a pass can run next to live traffic.
+"""
+import os
+import shutil
+import time
+
+from .integrity import orphaned_names
+from .previews import CHECKSUM
+from .storage_tiers import delete_blob
+
+
+def _directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, files in os.walk(path) for name in files
+    )
+
+
+def collect_blobs(root, batch_size=500, min_age=3600, dry_run=False, sleep=0.0):
+    """
+    Remove blobs under ``root`` that no version refers to; yields ``(name, size)``.
+
+    Blobs modified less than ``min_age`` seconds ago are kept, as an upload
+    writes its blob before committing its row.
+    """
+    from ..file_versions.models import FileVersion
+
+    batch = []
+
+    def flush():
+        # Checked again right before unlinking, in case a row appeared since the walk
+        referenced = set(FileVersion.objects.filter(file_path__in=batch).values_list("file_path", flat=True))
+        for name in batch:
+            if name in referenced:
+                continue
+            path = os.path.join(root, name)
+            try:
+                size = os.path.getsize(path)
+                if not dry_run:
+                    os.unlink(path)
+            except FileNotFoundError:
+                continue
+            yield name, size
+        batch.clear()
+        if sleep:
+            time.sleep(sleep)
+
+    for name in orphaned_names(root, batch_size, min_age):
+        batch.append(name)
+        if len(batch) == batch_size:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def release_blobs(names):
+    """Delete the blobs among ``names`` that no version refers to anymore, e.g. after versions were pruned."""
+    from ..file_versions.models import FileVersion
+
+    names = {name for name in names if name}
+    referenced = set(FileVersion.objects.filter(file_path__in=names).values_list("file_path", flat=True))
+    for name in sorted(names - referenced):
+        delete_blob(name)
+
+
+def collect_previews(root, batch_size=500, dry_run=False, sleep=0.0):
+    """Remove preview directories of checksums no version has anymore; yields ``(checksum, size)``."""
+    from ..file_versions.models import FileVersion
+
+    previews = os.path.join(root, "previews")
+    if not os.path.isdir(previews):
+        return
+
+    def flush(batch):
+        present = set(FileVersion.objects.filter(checksum__in=batch).values_list("checksum", flat=True))
+        for checksum, path in batch.items():
+            if checksum in present:
+                continue
+            size = _directory_size(path)
+            if not dry_run:
+                shutil.rmtree(path, ignore_errors=True)
+            yield checksum, size
+        if sleep:
+            time.sleep(sleep)
+
+    batch = {}
+    for prefix in sorted(os.listdir(previews)):
+        directory = os.path.join(previews, prefix)
+        if not os.path.isdir(directory):
+            continue
+        for checksum in sorted(os.listdir(directory)):
+            if CHECKSUM.match(checksum):
+                batch[checksum] = os.path.join(directory, checksum)
+            if len(batch) == batch_size:
+                yield from flush(batch)
+                batch = {}
+    if batch:
+        yield from flush(batch)
+
+
+def collect_object_permissions(batch_size=500, dry_run=False, sleep=0.0):
+    """
+    Remove guardian's generic user and group object permissions whose object
+    no longer exists; yields the number of rows removed per batch.
+
+    Rows are walked in id order and their objects looked up per content type,
+    one query per model and batch.
+    """
+    from guardian.models import GroupObjectPermission, UserObjectPermission
+
+    for model in (UserObjectPermission, GroupObjectPermission):
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_id).order_by("id")
+                .values_list("id", "content_type_id", "object_pk")[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            by_type = {}
+            for pk, content_type_id, object_pk in rows:
+                by_type.setdefault(content_type_id, []).append((pk, object_pk))
+            dangling = []
+            for content_type_id, entries in by_type.items():
+                dangling.extend(_dangling(content_type_id, entries))
+
+            if dangling:
+                if not dry_run:
+                    model.objects.filter(pk__in=dangling).delete()
+                yield len(dangling)
+            if sleep:
+                time.sleep(sleep)
+
+
+def _dangling(content_type_id, entries):
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.exceptions import ValidationError
+
+    model = ContentType.objects.get_for_id(content_type_id).model_class()
+    if model is None:
+        # The model itself was removed
+        return [pk for pk, _ in entries]
+    keys = {}
+    for pk, object_pk in entries:
+        try:
+            keys[pk] = model._meta.pk.to_python(object_pk)
+        except ValidationError:
+            keys[pk] = None
+    existing = set(
+        model._default_manager.filter(pk__in={key for key in keys.values() if key is not None})
+        .values_list("pk", flat=True)
+    )
+    return [pk for pk, key in keys.items() if key not in existing]
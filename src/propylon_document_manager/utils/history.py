@@ -0,0 +1,136 @@
+"""
+Document histories assembled from stored consecutive-version diffs.
+
+Each version's line diff against its ``previous_version`` is computed once
+(after upload, or the first time a history needs it) and kept in
+``VersionDiff``. Walking the chain oldest first and applying the diffs
+rebuilds the text of any version together with the version that introduced
+each of its lines, without extracting anything.
+"""
+import difflib
+from dataclasses import dataclass
+
+from .file_extraction import stored_text
+
+# Bumped whenever the stored opcodes change, so older diffs are redone on demand
+DIFF_ALGORITHM_VERSION = 1
+
+
+def lines_of(file_version):
+    return stored_text(file_version).splitlines() if file_version is not None else []
+
+
+def line_opcodes(old_lines, new_lines):
+    """difflib opcodes between two line lists, with the removed and added lines of each change."""
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    opcodes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            opcodes.append([tag, i1, i2, j1, j2])
+        else:
+            opcodes.append([tag, i1, i2, j1, j2, old_lines[i1:i2], new_lines[j1:j2]])
+    return opcodes
+
+
+def store_version_diff(file_version_id, force=False):
+    """
+    Post-upload pipeline stage: compute and save the diff of a version against
+    its previous version, unless a current one is stored.
+    """
+    from ..file_versions.models import FileVersion, VersionDiff
+
+    file_version = FileVersion.objects.select_related("previous_version").filter(pk=file_version_id).first()
+    if file_version is None:
+        return None
+    existing = VersionDiff.objects.filter(file_version=file_version).first()
+    if existing is not None and not force and is_current(existing, file_version):
+        return existing
+
+    old_lines = lines_of(file_version.previous_version)
+    new_lines = lines_of(file_version)
+    opcodes = line_opcodes(old_lines, new_lines)
+    diff, _ = VersionDiff.objects.update_or_create(
+        file_version=file_version,
+        defaults={
+            "base_version_id": file_version.previous_version_id,
+            "base_line_count": len(old_lines),
+            "line_count": len(new_lines),
+            "lines_added": sum(j2 - j1 for tag, _, _, j1, j2, *_ in opcodes if tag != "equal"),
+            "lines_removed": sum(i2 - i1 for tag, i1, i2, *_ in opcodes if tag != "equal"),
+            "opcodes": opcodes,
+            "algorithm_version": DIFF_ALGORITHM_VERSION,
+        },
+    )
+    return diff
+
+
+def is_current(diff, file_version):
+    return (
+        diff.base_version_id == file_version.previous_version_id
+        and diff.algorithm_version == DIFF_ALGORITHM_VERSION
+    )
+
+
+def version_chain(root_file):
+    """Versions on the ``previous_version`` chain ending at the latest version of a document, oldest first."""
+    from ..file_versions.models import FileVersion
+
+    versions = {
+        fv.pk: fv
+        for fv in FileVersion.objects.filter(root_file=root_file).select_related("uploader").order_by("version_number")
+    }
+    versions.setdefault(root_file.pk, root_file)
+    chain = []
+    current = max(versions.values(), key=lambda fv: fv.version_number)
+    while current is not None and len(chain) < len(versions):
+        chain.append(current)
+        current = versions.get(current.previous_version_id)
+    chain.reverse()
+    return chain
+
+
+def chain_diffs(chain):
+    """
+    Stored diffs of every version in ``chain`` by version id, computing those
+    that are missing or stale. Only a version added since the last call needs
+    a new diff.
+    """
+    from ..file_versions.models import VersionDiff
+
+    diffs = VersionDiff.objects.in_bulk([fv.pk for fv in chain])
+    previous = None
+    for file_version in chain:
+        diff = diffs.get(file_version.pk)
+        consistent = diff is not None and is_current(diff, file_version) and (
+            diff.base_line_count == (previous.line_count if previous is not None else 0)
+        )
+        if not consistent:
+            # The chain was relinked or a version re-extracted since the diff was stored
+            diff = diffs[file_version.pk] = store_version_diff(file_version.pk, force=True)
+        previous = diff
+    return diffs
+
+
+@dataclass
+class BlameLine:
+    text: str
+    file_version: object
+
+
+def blame(chain, diffs, until=None):
+    """
+    Lines of a version (the last in ``chain`` unless ``until`` is given), each
+    attributed to the version that introduced it.
+    """
+    lines = []
+    for file_version in chain:
+        rebuilt = []
+        for tag, i1, i2, j1, j2, *changed in diffs[file_version.pk].opcodes:
+            if tag == "equal":
+                rebuilt.extend(lines[i1:i2])
+            else:
+                rebuilt.extend(BlameLine(text, file_version) for text in changed[1])
+        lines = rebuilt
+        if until is not None and file_version.pk == until.pk:
+            break
+    return lines
@@ -0,0 +1,97 @@
+"""
+Integrity checks of stored blobs against the checksums and sizes recorded at upload.
+
+``verify_blob`` re-hashes one blob and runs in worker processes, so it only
+takes plain values and never touches the database. ``orphaned_names`` walks
+the media directory for blobs no version refers to.
+"""
+import hashlib
+import os
+import time
+
+OK = "ok"
+MISSING = "missing"
+CORRUPT = "corrupt"
+
+CHUNK_SIZE = 1024 * 1024
+
+# Top-level media directories that hold derived files rather than uploaded blobs
+DERIVED_DIRECTORIES = ("previews", "packs")
+
+
+def verify_blob(task):
+    """
+    Re-hash one blob; ``task`` is ``(version id, path, checksum, size, bytes per
+    second[, offset, length])``, with a window for blobs read from inside a pack file.
+
+    Returns ``(version id, status, detail)``. Reading sleeps as needed to stay
+    under the byte rate (unlimited when it is 0). A blank checksum or a negative
+    size, as left by versions uploaded before they were recorded, isn't compared.
+    """
+    version_id, path, checksum, size, rate, *window = task
+    hasher = hashlib.sha256()
+    read = 0
+    started = time.monotonic()
+    try:
+        with open(path, "rb") as f:
+            offset, length = window or (0, -1)
+            f.seek(offset)
+            while chunk := f.read(CHUNK_SIZE if length < 0 else min(CHUNK_SIZE, length - read)):
+                hasher.update(chunk)
+                read += len(chunk)
+                if rate:
+                    ahead = read / rate - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+    except FileNotFoundError:
+        return version_id, MISSING, path
+    if size >= 0 and read != size:
+        return version_id, CORRUPT, f"size {read} != {size}"
+    if checksum and hasher.hexdigest() != checksum:
+        return version_id, CORRUPT, f"checksum {hasher.hexdigest()} != {checksum}"
+    return version_id, OK, ""
+
+
+def iter_media_names(root):
+    """Storage names of the blobs under ``root``, skipping derived files and temporary copies."""
+    for directory, subdirectories, files in os.walk(root):
+        relative = os.path.relpath(directory, root)
+        if relative == ".":
+            subdirectories[:] = [name for name in subdirectories if name not in DERIVED_DIRECTORIES]
+            relative = ""
+        subdirectories.sort()
+        for name in sorted(files):
+            if not name.startswith("."):
+                yield os.path.join(relative, name).replace(os.sep, "/")
+
+
+def orphaned_names(root, batch_size=500, min_age=0):
+    """
+    Blobs under ``root`` that no FileVersion refers to.
+
+    Names are looked up ``batch_size`` at a time. Files modified less than
+    ``min_age`` seconds ago are skipped, as an upload may not have committed
+    its row yet.
+    """
+    from ..file_versions.models import FileVersion
+
+    cutoff = time.time() - min_age
+
+    def unreferenced(batch):
+        referenced = set(FileVersion.objects.filter(file_path__in=batch).values_list("file_path", flat=True))
+        return [name for name in batch if name not in referenced]
+
+    batch = []
+    for name in iter_media_names(root):
+        if min_age:
+            try:
+                if os.path.getmtime(os.path.join(root, name)) > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+        batch.append(name)
+        if len(batch) == batch_size:
+            yield from unreferenced(batch)
+            batch = []
+    if batch:
+        yield from unreferenced(batch)
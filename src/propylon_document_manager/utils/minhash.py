@@ -0,0 +1,87 @@
+"""
+MinHash signatures and locality-sensitive hashing over word shingles.
+
+A signature is a tuple of ``num_perm`` minimum hash values; the fraction of
+positions two signatures agree on estimates the Jaccard similarity of their
+shingle sets. ``LSHIndex`` buckets signatures by bands so similar items are
+found without comparing every pair. Hashes are deterministic across processes
+so signatures and band keys can be stored.
+"""
+import random
+import re
+import struct
+import zlib
+from collections import defaultdict
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def shingles(text, size=3):
+    """Hashes of the overlapping ``size``-word runs of ``text``; short texts form a single shingle."""
+    words = tokenize(text)
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Computes signatures with ``num_perm`` seeded universal hash functions."""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return (MAX_HASH,) * self.num_perm
+        return tuple(
+            min((a * value + b) % MERSENNE_PRIME for value in shingle_set) & MAX_HASH
+            for a, b in self.permutations
+        )
+
+
+def similarity(left, right):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    if not left:
+        return 0.0
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+def band_keys(signature, bands):
+    """One key per band; signatures sharing any key are candidate matches."""
+    rows = len(signature) // bands
+    return [
+        zlib.crc32(struct.pack(f"<H{rows}I", band, *signature[band * rows:(band + 1) * rows]))
+        for band in range(bands)
+    ]
+
+
+class LSHIndex:
+    """
+    In-memory banded index. With ``bands`` bands of ``r`` rows, a pair with
+    similarity ``s`` becomes a candidate with probability ``1 - (1 - s**r) ** bands``.
+    """
+
+    def __init__(self, bands=32):
+        self.bands = bands
+        self.buckets = defaultdict(set)
+
+    def add(self, key, signature):
+        for band_key in band_keys(signature, self.bands):
+            self.buckets[band_key].add(key)
+
+    def candidates(self, signature):
+        found = set()
+        for band_key in band_keys(signature, self.bands):
+            found.update(self.buckets.get(band_key, ()))
+        return found
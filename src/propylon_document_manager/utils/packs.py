@@ -0,0 +1,139 @@
+"""
+Pack files: many small archived blobs stored back to back in one file.
+
+Small text and XML versions each cost an inode and a directory entry, which
+adds up to millions of tiny files in the archival tier. ``manage.py
+pack_media`` appends such blobs to a new pack under ``MEDIA_ROOT/packs/``
+and records each one's offset and length as a PackEntry; a sidecar ``.idx``
+file lists the same entries so a pack can be re-indexed without the
+database. Packs are never modified after they are written. A packed blob
+is read in place through a PackedBlob window with ``os.pread``, so readers
+share the pack without seeking each other's file position.
+"""
+import hashlib
+import io
+import json
+import os
+import uuid
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .storage_tiers import COLD, PACKED, cold_storage
+
+PACK_DIRECTORY = "packs"
+
+CHUNK_SIZE = 1024 * 1024
+# Rows written or updated per query
+BATCH_SIZE = 500
+
+
+class PackedBlob(io.RawIOBase):
+    """Read-only, seekable window of ``length`` bytes at ``offset`` into a pack file."""
+
+    def __init__(self, path, offset, length, name=""):
+        super().__init__()
+        self._fd = os.open(path, os.O_RDONLY)
+        self._offset = offset
+        self._length = length
+        self._position = 0
+        self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._length - self._position)
+        if size <= 0:
+            return 0
+        data = os.pread(self._fd, size, self._offset + self._position)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._length}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
+
+
+def open_packed(name):
+    """A buffered, seekable binary file with the packed blob stored under ``name``."""
+    from ..file_versions.models import PackEntry
+
+    entry = PackEntry.objects.select_related("pack").get(name=name)
+    return io.BufferedReader(PackedBlob(default_storage.path(entry.pack.name), entry.offset, entry.length, name))
+
+
+def write_pack(blobs):
+    """
+    Append the archived blobs ``[(name, checksum), ...]`` to a new pack and
+    switch their versions to the packed tier; returns ``(pack, skipped names)``.
+
+    Each blob is hashed while it is copied, and blobs that are missing or don't
+    match their checksum are left where they are. The archived copies are
+    deleted once the pack and its index are committed.
+    """
+    from ..file_versions.models import FileVersion, Pack, PackEntry
+
+    cold = cold_storage()
+    name = f"{PACK_DIRECTORY}/pack-{uuid.uuid4().hex}.pack"
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{os.path.dirname(path)}/.{os.path.basename(path)}.tmp"
+
+    entries, skipped = [], []
+    with open(temporary, "wb") as out:
+        for blob_name, checksum in blobs:
+            offset = out.tell()
+            hasher = hashlib.sha256()
+            try:
+                with cold.open(blob_name, "rb") as source:
+                    while chunk := source.read(CHUNK_SIZE):
+                        hasher.update(chunk)
+                        out.write(chunk)
+            except FileNotFoundError:
+                pass
+            else:
+                if not checksum or hasher.hexdigest() == checksum:
+                    entries.append(PackEntry(name=blob_name, offset=offset, length=out.tell() - offset))
+                    continue
+            skipped.append(blob_name)
+            out.seek(offset)
+            out.truncate()
+        out.flush()
+        os.fsync(out.fileno())
+        size = out.tell()
+
+    if not entries:
+        os.unlink(temporary)
+        return None, skipped
+    os.replace(temporary, path)
+    with open(f"{path[:-len('.pack')]}.idx", "w") as index:
+        for entry in entries:
+            index.write(json.dumps({"name": entry.name, "offset": entry.offset, "length": entry.length}) + "\n")
+
+    names = [entry.name for entry in entries]
+    with transaction.atomic():
+        pack = Pack.objects.create(name=name, size=size, blob_count=len(entries))
+        for entry in entries:
+            entry.pack = pack
+        PackEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+        for start in range(0, len(names), BATCH_SIZE):
+            FileVersion.objects.filter(
+                file_path__in=names[start:start + BATCH_SIZE], storage_tier=COLD
+            ).update(storage_tier=PACKED)
+    for blob_name in names:
+        cold.delete(blob_name)
+    return pack, skipped
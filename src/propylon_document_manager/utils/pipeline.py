@@ -0,0 +1,25 @@
+"""
+Post-upload processing of a version's text.
+
+Extraction runs first and the stages reading its result follow in the same
+background task, so they find the stored text instead of extracting it again.
+A failing stage, extraction included, is logged without stopping the ones
+after it; those then extract the text on the fly or give up on their own.
+"""
+import logging
+
+from .file_extraction import store_extraction
+from .fingerprints import store_fingerprint, warn_near_duplicates
+from .history import store_version_diff
+
+logger = logging.getLogger(__name__)
+
+TEXT_STAGES = (store_version_diff, store_fingerprint, warn_near_duplicates)
+
+
+def process_text(file_version_id):
+    for stage in (store_extraction, *TEXT_STAGES):
+        try:
+            stage(file_version_id)
+        except Exception:
+            logger.exception("%s failed for version %s", stage.__name__, file_version_id)
@@ -0,0 +1,165 @@
+"""
+Document previews: a first-page thumbnail and lightweight per-page HTML renders.
+
+Previews are stored content-addressed under ``previews/<aa>/<checksum>/`` so
+every upload of the same bytes shares them. ``manifest.json`` is written last
+and marks a preview set as complete.
+"""
+import io
+import json
+import re
+import textwrap
+from datetime import datetime, timezone
+
+import mammoth
+import pypdf
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.html import escape
+from PIL import Image, ImageDraw, ImageFont
+
+from ..file_versions.models import FileVersion
+from .file_extraction import iter_odt_paragraphs
+from .storage_tiers import open_blob
+
+# Bump when the rendering changes so stale previews can be regenerated
+PREVIEW_FORMAT_VERSION = 1
+
+PREVIEW_FILE_NAME = re.compile(r"^(thumbnail\.png|manifest\.json|page-\d{4}\.html)$")
+CHECKSUM = re.compile(r"^[0-9a-f]{64}$")
+
+PAGE_SIZE = (612, 792)
+
+
+def preview_directory(checksum):
+    return f"previews/{checksum[:2]}/{checksum}"
+
+
+def preview_path(checksum, name):
+    return f"{preview_directory(checksum)}/{name}"
+
+
+def has_previews(checksum):
+    return default_storage.exists(preview_path(checksum, "manifest.json"))
+
+
+def _paginate(paragraphs, page_chars):
+    """Group paragraphs into pages of roughly ``page_chars`` characters."""
+    pages, current, size = [], [], 0
+    for paragraph in paragraphs:
+        if current and size + len(paragraph) > page_chars:
+            pages.append(current)
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph)
+    if current:
+        pages.append(current)
+    return pages
+
+
+def _split_paragraphs(text):
+    return [block.strip() for block in re.split(r"\n\s*\n", text) if block.strip()]
+
+
+def _pdf_pages(handle, max_pages):
+    reader = pypdf.PdfReader(handle)
+    pages = []
+    for page in reader.pages[:max_pages]:
+        text = page.extract_text() or ""
+        pages.append([line for line in text.splitlines() if line.strip()])
+    return pages
+
+
+def document_pages(file_version):
+    """
+    Return the document's pages as lists of paragraphs.
+
+    PDFs keep their own pages; formats without fixed pages are split every
+    ``PREVIEW_PAGE_CHARS`` characters.
+    """
+    mime = file_version.mime_type
+    max_pages = settings.PREVIEW_MAX_PAGES
+    with open_blob(file_version) as handle:
+        if mime == "application/pdf":
+            return _pdf_pages(handle, max_pages)
+        if mime == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+            paragraphs = _split_paragraphs(mammoth.extract_raw_text(handle).value)
+        elif mime == "application/vnd.oasis.opendocument.text":
+            paragraphs = list(iter_odt_paragraphs(handle))
+        elif mime.startswith("text/") or mime in ("application/xml", "application/json"):
+            paragraphs = _split_paragraphs(handle.read().decode("utf-8", errors="replace"))
+        else:
+            return []
+    return _paginate(paragraphs, settings.PREVIEW_PAGE_CHARS)[:max_pages]
+
+
+def render_page_html(number, paragraphs):
+    body = "".join(f"<p>{escape(paragraph)}</p>" for paragraph in paragraphs)
+    return f'<div class="page" data-page="{number}">{body}</div>'
+
+
+def render_text_thumbnail(paragraphs):
+    """Draw the first page's text onto a blank page and shrink it to thumbnail size."""
+    page = Image.new("L", PAGE_SIZE, color=255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default()
+    y = 48
+    for paragraph in paragraphs:
+        for line in textwrap.wrap(paragraph, width=100) or [""]:
+            if y > PAGE_SIZE[1] - 48:
+                break
+            draw.text((48, y), line, fill=0, font=font)
+            y += 12
+        y += 6
+    page.thumbnail(settings.PREVIEW_THUMBNAIL_SIZE)
+    return page
+
+
+def render_image_thumbnail(file_version):
+    with open_blob(file_version) as handle:
+        image = Image.open(handle)
+        image.thumbnail(settings.PREVIEW_THUMBNAIL_SIZE)
+        return image.convert("RGB") if image.mode not in ("RGB", "L") else image.copy()
+
+
+def _store(name, content):
+    # Storage.save() renames on collision, which would break content addressing
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content))
+
+
+def generate_previews(file_version_id, force=False):
+    """Build and store the previews of a FileVersion unless its checksum already has them."""
+    file_version = FileVersion.objects.filter(pk=file_version_id).first()
+    if file_version is None or not CHECKSUM.match(file_version.checksum or ""):
+        return None
+    checksum = file_version.checksum
+    if not force and has_previews(checksum):
+        return checksum
+
+    if file_version.mime_type.startswith("image/"):
+        pages = []
+        thumbnail = render_image_thumbnail(file_version)
+    else:
+        pages = document_pages(file_version)
+        thumbnail = render_text_thumbnail(pages[0] if pages else [])
+
+    for number, paragraphs in enumerate(pages, 1):
+        _store(preview_path(checksum, f"page-{number:04d}.html"), render_page_html(number, paragraphs).encode())
+
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, format="PNG", optimize=True)
+    _store(preview_path(checksum, "thumbnail.png"), buffer.getvalue())
+
+    manifest = {
+        "checksum": checksum,
+        "mime_type": file_version.mime_type,
+        "pages": len(pages),
+        "thumbnail": "thumbnail.png",
+        "format_version": PREVIEW_FORMAT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    _store(preview_path(checksum, "manifest.json"), json.dumps(manifest).encode())
+    return checksum
@@ -0,0 +1,101 @@
+"""
+Version retention: thinning old versions of documents according to RetentionPolicy.
+
+Pruned versions are cut out of the ``previous_version`` chain (each kept
+version is relinked to the nearest earlier kept one before anything is
+deleted), taken out of the folder counters and deleted; their blobs are
+removed once the deletion commits and no other version refers to them.
+Stored diffs of relinked versions become stale and are recomputed the next
+time the history is read. A document's first version is never pruned, as it
+identifies the document and carries its shares.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .folders import ancestor_paths
+from .garbage import release_blobs
+
+
+def policy_for(root_file):
+    """The retention policy covering a document: its nearest folder's, else its owner's default, else None."""
+    from ..file_versions.models import RetentionPolicy
+
+    scope = Q(folder__isnull=True)
+    if root_file.folder_id:
+        scope |= Q(folder__path__in=ancestor_paths(root_file.folder.path))
+    policies = RetentionPolicy.objects.filter(scope, owner_id=root_file.uploader_id).select_related("folder")
+    return max(policies, key=lambda policy: policy.folder.depth if policy.folder_id else -1, default=None)
+
+
+def versions_to_keep(versions, policy, now=None):
+    """Ids of the ``versions`` of one document (oldest first) that ``policy`` keeps."""
+    if not versions:
+        return set()
+    now = timezone.localtime(now or timezone.now())
+    newest_first = versions[::-1]
+    keep = {versions[0].pk, versions[-1].pk}
+    keep.update(version.pk for version in newest_first[:policy.keep_last])
+
+    month = now.year * 12 + now.month
+    days, months = set(), set()
+    for version in newest_first:
+        created = timezone.localtime(version.created_at)
+        day = created.date()
+        if (now.date() - day).days < policy.keep_daily_days and day not in days:
+            days.add(day)
+            keep.add(version.pk)
+        version_month = created.year * 12 + created.month
+        if month - version_month < policy.keep_monthly_months and version_month not in months:
+            months.add(version_month)
+            keep.add(version.pk)
+    return keep
+
+
+def prune_document(root_file_id, dry_run=False, now=None):
+    """
+    Apply the retention policy covering a document; returns the versions
+    pruned (or that would be, with ``dry_run``). Documents without a policy
+    are left alone.
+    """
+    from ..file_versions.models import FileVersion, Folder
+
+    root_file = (
+        FileVersion.objects.select_related("folder")
+        .filter(pk=root_file_id, previous_version__isnull=True)
+        .first()
+    )
+    if root_file is None:
+        return []
+    policy = policy_for(root_file)
+    if policy is None:
+        return []
+
+    with transaction.atomic():
+        versions = list(
+            FileVersion.objects.select_for_update().select_related("folder")
+            .filter(Q(root_file=root_file) | Q(pk=root_file.pk))
+            .order_by("version_number")
+        )
+        keep = versions_to_keep(versions, policy, now)
+        pruned = [version for version in versions if version.pk not in keep]
+        if not pruned or dry_run:
+            return pruned
+
+        previous = None
+        for version in versions:
+            if version.pk not in keep:
+                continue
+            if previous is not None and version.previous_version_id != previous.pk:
+                FileVersion.objects.filter(pk=version.pk).update(previous_version=previous)
+            previous = version
+
+        Folder.objects.forget_versions(pruned)
+        pruned_ids = [version.pk for version in pruned]
+        # Deleting a version nulls its successors' previous_version, which would turn
+        # pruned successors into roots for a moment; point them at the kept root first
+        FileVersion.objects.filter(pk__in=pruned_ids).update(previous_version=root_file)
+        FileVersion.objects.filter(pk__in=pruned_ids).delete()
+        names = [version.file_path.name for version in pruned]
+        transaction.on_commit(lambda: release_blobs(names))
+    return pruned
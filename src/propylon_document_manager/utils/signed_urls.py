@@ -0,0 +1,41 @@
+"""
+Signed download URLs.
+
+``/api/download-urls/`` checks access once and mints a short-lived URL whose
+signature (an HMAC under ``SECRET_KEY``, see ``django.core.signing``) covers
+the version id, the user it was minted for, the expiry and what is needed to
+serve the blob. Downloading through it only verifies the signature, so
+download-manager retries make no queries and a CDN or proxy may cache the
+response until the URL expires. Access revoked after minting takes effect
+when the URL expires, which is why lifetimes are capped at
+``SIGNED_URL_MAX_AGE``.
+"""
+import time
+
+from django.conf import settings
+from django.core import signing
+
+SALT = "propylon_document_manager.signed_download"
+
+
+def sign_download(file_version, user, expires_in=None):
+    """A signature for downloading ``file_version`` as ``user``; returns ``(signature, expiry timestamp)``."""
+    max_age = settings.SIGNED_URL_MAX_AGE
+    expires = int(time.time()) + min(max_age if expires_in is None else expires_in, max_age)
+    payload = {
+        "v": file_version.pk,
+        "u": user.pk,
+        "e": expires,
+        "n": file_version.file_path.name,
+        "f": file_version.file_name,
+        "c": file_version.checksum,
+    }
+    return signing.dumps(payload, salt=SALT, compress=True), expires
+
+
+def verify_download(signature):
+    """The payload of a download signature; raises ``signing.BadSignature`` when it is forged or expired."""
+    payload = signing.loads(signature, salt=SALT)
+    if payload["e"] < time.time():
+        raise signing.SignatureExpired("Download URL expired")
+    return payload
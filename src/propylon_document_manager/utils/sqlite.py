@@ -0,0 +1,29 @@
+import re
+
+from django.conf import settings
+
+PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run ``PRAGMA name = value`` for each item, in order, on a DB-API cursor."""
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME.match(name) or not re.match(r"^-?\w+$", str(value)):
+            raise ValueError(f"Invalid SQLite pragma: {name}={value!r}")
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver applying ``settings.SQLITE_PRAGMAS`` to new SQLite connections.
+
+    Journal mode is persistent in the database file, but the remaining pragmas
+    are per connection, so they have to be set every time one is opened.
+    """
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
@@ -0,0 +1,171 @@
+"""
+Hot and cold storage tiers for version blobs.
+
+Blobs start in the hot tier (``default_storage`` under ``MEDIA_ROOT``).
+``manage.py tier_media`` moves blobs whose versions nobody downloaded for
+``COLD_STORAGE_AFTER_DAYS`` to the archival tier (``COLD_STORAGE_BACKEND``),
+keeping their storage name. Reading an archived blob goes through a local
+read-through cache, and a download promotes it back to the hot tier in the
+background. Small archived blobs may further be consolidated into pack
+files (``PACKED``) and are then read in place from the pack. Rows sharing a
+storage name always move together, as the tier belongs to the blob.
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .background import run_in_background
+
+HOT = "hot"
+COLD = "cold"
+# Small archived blobs consolidated into a pack file, see utils/packs.py
+PACKED = "packed"
+STORAGE_TIERS = [
+    (HOT, "Hot"),
+    (COLD, "Archived"),
+    (PACKED, "Packed"),
+]
+
+# Downloads within this interval of the recorded one don't write last_accessed_at again
+ACCESS_RESOLUTION = timedelta(hours=1)
+
+
+def cold_storage():
+    return import_string(settings.COLD_STORAGE_BACKEND)(location=settings.COLD_STORAGE_ROOT)
+
+
+def _copy_into(source, destination):
+    """Copy a file object to ``destination`` through a temporary name, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(destination), prefix=".fetch-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(source, out)
+        os.replace(temporary, destination)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def cached_path(name):
+    """Local path of an archived blob, fetched into the read-through cache unless it is there already."""
+    path = os.path.join(settings.COLD_CACHE_ROOT, name)
+    if os.path.exists(path):
+        # The cache is trimmed by modification time, so mark the entry as recently used
+        os.utime(path)
+        return path
+    with cold_storage().open(name, "rb") as source:
+        _copy_into(source, path)
+    trim_cache()
+    return path
+
+
+def trim_cache(max_bytes=None):
+    """Remove the least recently used cache entries until the cache fits in ``max_bytes``."""
+    max_bytes = settings.COLD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for directory, _, files in os.walk(settings.COLD_CACHE_ROOT):
+        for name in files:
+            if name.startswith("."):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def blob_path(file_version):
+    """Local path to read a version's blob from; packed blobs have none and are read with open_blob()."""
+    if file_version.storage_tier == PACKED:
+        raise ValueError(f"{file_version.file_path.name} is stored in a pack file")
+    if file_version.storage_tier == COLD:
+        return cached_path(file_version.file_path.name)
+    return default_storage.path(file_version.file_path.name)
+
+
+def open_blob(file_version):
+    """A seekable binary file with a version's blob, whichever tier it is in."""
+    if file_version.storage_tier == PACKED:
+        from .packs import open_packed
+
+        return open_packed(file_version.file_path.name)
+    return open(blob_path(file_version), "rb")
+
+
+def record_access(file_version):
+    """Note a download of a version; archived blobs are promoted back to the hot tier in the background."""
+    from ..file_versions.models import FileVersion
+
+    now = timezone.now()
+    if file_version.last_accessed_at is None or now - file_version.last_accessed_at > ACCESS_RESOLUTION:
+        FileVersion.objects.filter(pk=file_version.pk).update(last_accessed_at=now)
+        file_version.last_accessed_at = now
+    if file_version.storage_tier == COLD:
+        run_in_background(promote, file_version.file_path.name)
+
+
+def demote(name):
+    """Move a blob to the archival tier; returns its size, or None when there was nothing to move."""
+    from ..file_versions.models import FileVersion
+
+    if not default_storage.exists(name):
+        return None
+    cold = cold_storage()
+    size = default_storage.size(name)
+    if not cold.exists(name):
+        with default_storage.open(name, "rb") as source:
+            cold.save(name, File(source))
+    FileVersion.objects.filter(file_path=name).update(storage_tier=COLD)
+    default_storage.delete(name)
+    return size
+
+
+def promote(name):
+    """Move an archived blob back to the hot tier, from the cache when it is there."""
+    from ..file_versions.models import FileVersion
+
+    cold = cold_storage()
+    if not default_storage.exists(name):
+        cached = os.path.join(settings.COLD_CACHE_ROOT, name)
+        try:
+            source = open(cached, "rb")
+        except FileNotFoundError:
+            source = cold.open(name, "rb")
+        with source:
+            _copy_into(source, default_storage.path(name))
+    FileVersion.objects.filter(file_path=name).update(storage_tier=HOT)
+    if cold.exists(name):
+        cold.delete(name)
+
+
+def delete_blob(name):
+    """Delete a blob from every tier and the cache; a packed copy's space stays in its pack."""
+    from ..file_versions.models import PackEntry
+
+    PackEntry.objects.filter(name=name).delete()
+    default_storage.delete(name)
+    cold = cold_storage()
+    if cold.exists(name):
+        cold.delete(name)
+    try:
+        os.unlink(os.path.join(settings.COLD_CACHE_ROOT, name))
+    except FileNotFoundError:
+        pass
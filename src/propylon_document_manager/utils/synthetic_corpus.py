@@ -0,0 +1,485 @@
+"""
+Synthetic document corpora for benchmarks and load testing.
+
+Documents are generated deterministically from a seed so that two runs with
+the same parameters produce the same users, paths, payloads and checksums.
+"""
+import hashlib
+import io
+import os
+import random
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from django.utils.text import slugify
+
+from .file_management import unique_file_upload_path
+
+# Model imports are deferred to the functions that need them so that payload
+# rendering can run in worker processes that never set up Django.
+
+
+WORDS = (
+    "act amendment article authority bill chapter clause commencement committee consolidation council "
+    "court definition duty enactment exemption financial government hereby interpretation jurisdiction "
+    "legislation minister notice obligation order parliament penalty person provision public regulation "
+    "repeal report schedule section statute subsection tax tribunal under whereas"
+).split()
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ODT_MIME = "application/vnd.oasis.opendocument.text"
+
+# (mime type, extension, relative weight) of the generated payloads
+MIME_MIX = [
+    ("text/plain", ".txt", 4),
+    ("text/markdown", ".md", 1),
+    ("application/xml", ".xml", 1),
+    (PDF_MIME, ".pdf", 2),
+    (DOCX_MIME, ".docx", 2),
+    (ODT_MIME, ".odt", 1),
+]
+
+# Names of the successive levels of generated virtual folder trees
+FOLDER_LEVELS = ["division", "department", "matter", "year", "chapter", "part", "annex", "draft"]
+
+
+def random_sections(rng, sections=4, paragraphs=3, words=40):
+    """Return a list of ``(heading, [paragraph, ...])`` tuples of legal-ish prose."""
+    result = []
+    for number in range(1, sections + 1):
+        heading = f"Section {number}. {rng.choice(WORDS).capitalize()} {rng.choice(WORDS)}"
+        body = []
+        for _ in range(paragraphs):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(words))
+            body.append(sentence.capitalize() + ".")
+        result.append((heading, body))
+    return result
+
+
+def mutate_sections(rng, sections, rate=0.2):
+    """Return a copy of ``sections`` with roughly ``rate`` of the paragraphs reworded."""
+    mutated = []
+    for heading, body in sections:
+        new_body = []
+        for paragraph in body:
+            if rng.random() < rate:
+                words = paragraph.rstrip(".").split()
+                position = rng.randrange(len(words))
+                words[position] = rng.choice(WORDS)
+                paragraph = " ".join(words) + "."
+            new_body.append(paragraph)
+        mutated.append((heading, new_body))
+    return mutated
+
+
+def sections_to_text(sections):
+    return "\n\n".join(heading + "\n" + "\n".join(body) for heading, body in sections) + "\n"
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """Build a minimal PDF with one page per string in ``pages`` using the Helvetica base font."""
+    count = len(pages)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for index, text in enumerate(pages):
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 770 Td"]
+        ops.extend(f"({_pdf_escape(line)}) Tj T*" for line in text.splitlines())
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * index} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+def make_docx(paragraphs):
+    """Build a minimal WordprocessingML package containing ``paragraphs``."""
+    body = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(paragraph)}</w:t></w:r></w:p>' for paragraph in paragraphs
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            "</Types>",
+        )
+        archive.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/>'
+            "</Relationships>",
+        )
+        archive.writestr(
+            "word/document.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>",
+        )
+    return buffer.getvalue()
+
+
+def make_odt(sections):
+    """Build a minimal OpenDocument text package from ``(heading, [paragraph, ...])`` tuples."""
+    body = []
+    for heading, paragraphs in sections:
+        body.append(f'<text:h text:outline-level="1">{escape(heading)}</text:h>')
+        body.extend(f"<text:p>{escape(paragraph)}</text:p>" for paragraph in paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        # The mimetype entry must come first and be stored uncompressed
+        archive.writestr("mimetype", ODT_MIME, compress_type=zipfile.ZIP_STORED)
+        archive.writestr(
+            "META-INF/manifest.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0">'
+            f'<manifest:file-entry manifest:full-path="/" manifest:media-type="{ODT_MIME}"/>'
+            '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+            "</manifest:manifest>",
+        )
+        archive.writestr(
+            "content.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+            'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" office:version="1.2">'
+            f'<office:body><office:text>{"".join(body)}</office:text></office:body>'
+            "</office:document-content>",
+        )
+    return buffer.getvalue()
+
+
+def render_document(mime_type, sections):
+    """Serialise ``sections`` into the byte payload of the given MIME type."""
+    if mime_type == PDF_MIME:
+        return make_pdf([heading + "\n" + "\n".join(body) for heading, body in sections])
+    if mime_type == DOCX_MIME:
+        return make_docx([line for heading, body in sections for line in (heading, *body)])
+    if mime_type == ODT_MIME:
+        return make_odt(sections)
+    if mime_type == "application/xml":
+        parts = "".join(
+            f"<section><heading>{escape(heading)}</heading>"
+            + "".join(f"<p>{escape(paragraph)}</p>" for paragraph in body)
+            + "</section>"
+            for heading, body in sections
+        )
+        return f'<?xml version="1.0" encoding="UTF-8"?><document>{parts}</document>\n'.encode()
+    return sections_to_text(sections).encode()
+
+
+def choose_mime(rng):
+    mime_type, extension, _ = rng.choices(MIME_MIX, weights=[weight for _, _, weight in MIME_MIX])[0]
+    return mime_type, extension
+
+
+def folder_path(rng, depth, fanout):
+    """Random walk down a virtual folder tree ``depth`` levels deep with ``fanout`` children per folder."""
+    parts = []
+    for level in range(depth):
+        label = FOLDER_LEVELS[level] if level < len(FOLDER_LEVELS) else f"level{level}"
+        parts.append(f"{label}-{rng.randrange(fanout)}")
+    return "/" + "/".join(parts)
+
+
+def plan_document(seed, owner_index, doc_index, depth=2, fanout=4, min_versions=1, max_versions=3):
+    """Decide the name, path, MIME type and version count of one document."""
+    doc_seed = f"{seed}:{owner_index}:{doc_index}"
+    rng = random.Random(doc_seed)
+    mime_type, extension = choose_mime(rng)
+    file_name = f"{slugify(rng.choice(WORDS))}-{doc_index}{extension}"
+    return {
+        "seed": doc_seed,
+        "mime_type": mime_type,
+        "file_name": file_name,
+        "virtual_path": f"{folder_path(rng, depth, fanout)}/{file_name}",
+        "versions": rng.randint(min_versions, max_versions),
+    }
+
+
+def render_versions(doc_seed, mime_type, versions):
+    """Yield the payload of each version of a document; each one rewords part of the previous."""
+    rng = random.Random(f"{doc_seed}:content")
+    sections = random_sections(rng, sections=rng.randint(2, 6))
+    for number in range(versions):
+        if number:
+            sections = mutate_sections(rng, sections)
+        yield render_document(mime_type, sections)
+
+
+def write_document(task):
+    """
+    Render and write every version of one document below ``media_root``.
+
+    Runs in worker processes, so it only deals in plain values and returns a
+    ``(checksum, size)`` pair per version.
+    """
+    media_root, doc_seed, mime_type, names = task
+    results = []
+    for name, payload in zip(names, render_versions(doc_seed, mime_type, len(names))):
+        path = os.path.join(media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            handle.write(payload)
+        results.append((hashlib.sha256(payload).hexdigest(), len(payload)))
+    return results
+
+
+def _create_users(count, email_domain, batch_size):
+    from django.contrib.auth.models import Permission
+
+    from ..file_versions.models import User
+
+    new_users = []
+    for index in range(count):
+        user = User(email=f"user{index}@{email_domain}", name=f"Synthetic User {index}")
+        user.set_unusable_password()
+        new_users.append(user)
+    users = User.objects.bulk_create(new_users, batch_size=batch_size)
+
+    # Uploading through the API grants these model permissions, so mirror it here
+    permissions = Permission.objects.filter(
+        codename__in=["add_fileversion", "change_fileversion", "delete_fileversion", "view_fileversion"]
+    )
+    through = User.user_permissions.through
+    through.objects.bulk_create(
+        [through(user_id=user.pk, permission_id=permission.pk) for user in users for permission in permissions],
+        batch_size=batch_size,
+    )
+    return users
+
+
+def _create_versions(plans, checksums, batch_size, folders):
+    """Insert version chains level by level so every row can point at an already-saved parent."""
+    from django.db.models import F
+
+    from ..file_versions.models import FileVersion, Folder
+    from .folders import folder_path_for
+
+    for plan in plans:
+        key = (plan["owner_id"], folder_path_for(plan["virtual_path"]))
+        if key not in folders:
+            folders[key] = Folder.objects.ensure_path(plan["owner"], key[1])
+        plan["folder"] = folders[key]
+
+    roots, previous = [None] * len(plans), [None] * len(plans)
+    depth = max(len(plan["names"]) for plan in plans)
+    for level in range(depth):
+        indexes = [i for i, plan in enumerate(plans) if level < len(plan["names"])]
+        rows = []
+        for i in indexes:
+            plan = plans[i]
+            checksum, size = checksums[i][level]
+            rows.append(
+                FileVersion(
+                    file_name=plan["file_name"],
+                    version_number=level + 1,
+                    file_path=plan["names"][level],
+                    uploader_id=plan["owner_id"],
+                    folder=plan["folder"],
+                    virtual_path=plan["virtual_path"],
+                    mime_type=plan["mime_type"],
+                    file_size=size,
+                    checksum=checksum,
+                    previous_version_id=previous[i],
+                    root_file_id=roots[i],
+                )
+            )
+        created = FileVersion.objects.bulk_create(rows, batch_size=batch_size)
+        Folder.objects.record_versions(created)
+        for i, version in zip(indexes, created):
+            previous[i] = version.pk
+            if level == 0:
+                roots[i] = version.pk
+        if level == 0:
+            FileVersion.objects.filter(pk__in=roots).update(root_file_id=F("id"))
+    return roots
+
+
+def _create_shares(roots_by_owner, users, share_ratio, max_shares, seed, batch_size):
+    from django.contrib.auth.models import Permission
+    from guardian.utils import get_user_obj_perms_model
+
+    from ..file_versions.models import FileVersion
+
+    if len(users) < 2 or not share_ratio:
+        return 0
+    model = get_user_obj_perms_model(FileVersion)
+    view = Permission.objects.get(codename="view_fileversion")
+    change = Permission.objects.get(codename="change_fileversion")
+    rng = random.Random(f"{seed}:shares")
+
+    rows, total = [], 0
+    for owner_index, roots in roots_by_owner.items():
+        for root_id in roots:
+            if rng.random() >= share_ratio:
+                continue
+            count = min(len(users) - 1, rng.randint(1, max_shares))
+            # Sample among the other users by skipping over the owner's index
+            targets = [t + (t >= owner_index) for t in rng.sample(range(len(users) - 1), count)]
+            # Build the object reference without loading the FileVersion row
+            root = FileVersion(pk=root_id)
+            for target in targets:
+                rows.append(model(user_id=users[target].pk, permission=view, content_object=root))
+                if rng.random() < 0.5:
+                    rows.append(model(user_id=users[target].pk, permission=change, content_object=root))
+            if len(rows) >= batch_size:
+                model.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+                total += len(rows)
+                rows = []
+    model.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    return total + len(rows)
+
+
+def generate_corpus(
+    users=5,
+    files=20,
+    min_versions=1,
+    max_versions=3,
+    depth=2,
+    fanout=4,
+    share_ratio=0.25,
+    max_shares=3,
+    seed=0,
+    workers=0,
+    batch_size=1000,
+    email_domain="synthetic.local",
+    media_root=None,
+    progress=None,
+):
+    """
+    Create a synthetic corpus of ``users`` users owning ``files`` documents each.
+
+    Payloads are rendered and written by a pool of ``workers`` processes (inline
+    when ``workers`` is 0 or 1) while rows are inserted with ``bulk_create`` one
+    batch of ``batch_size`` documents at a time. ``progress`` is called with the
+    running stats after every batch.
+    """
+    from django.conf import settings
+    from django.db import transaction
+
+    media_root = media_root or settings.MEDIA_ROOT
+    stats = {"users": 0, "documents": 0, "versions": 0, "bytes": 0, "shares": 0}
+    started = time.monotonic()
+
+    with transaction.atomic():
+        created_users = _create_users(users, email_domain, batch_size)
+    stats["users"] = len(created_users)
+
+    def batches():
+        batch = []
+        for owner_index, owner in enumerate(created_users):
+            for doc_index in range(files):
+                plan = plan_document(seed, owner_index, doc_index, depth, fanout, min_versions, max_versions)
+                plan["owner_index"] = owner_index
+                plan["owner"] = owner
+                plan["owner_id"] = owner.pk
+                plan["names"] = [unique_file_upload_path(None, plan["file_name"]) for _ in range(plan["versions"])]
+                batch.append(plan)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    roots_by_owner = {}
+    folders = {}
+
+    def submit(plans):
+        tasks = [(media_root, plan["seed"], plan["mime_type"], plan["names"]) for plan in plans]
+        if executor:
+            # executor.map queues every task straight away and yields results in order
+            return executor.map(write_document, tasks, chunksize=max(1, len(tasks) // (4 * workers)))
+        return [write_document(task) for task in tasks]
+
+    def insert(plans, results):
+        checksums = list(results)
+        with transaction.atomic():
+            roots = _create_versions(plans, checksums, batch_size, folders)
+        for plan, root_id in zip(plans, roots):
+            roots_by_owner.setdefault(plan["owner_index"], []).append(root_id)
+        stats["documents"] += len(plans)
+        stats["versions"] += sum(len(result) for result in checksums)
+        stats["bytes"] += sum(size for result in checksums for _, size in result)
+        if progress:
+            progress(dict(stats, elapsed=time.monotonic() - started))
+
+    try:
+        # Workers render and write the next batch while this process inserts the current one
+        pending = None
+        for plans in batches():
+            submitted = (plans, submit(plans))
+            if pending:
+                insert(*pending)
+            pending = submitted
+        if pending:
+            insert(*pending)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    with transaction.atomic():
+        stats["shares"] = _create_shares(roots_by_owner, created_users, share_ratio, max_shares, seed, batch_size)
+    stats["elapsed"] = time.monotonic() - started
+    return stats
+
+
+def build_corpus(users=5, files=20, versions=3, share_ratio=0.25, seed=0, email_domain="bench.local"):
+    """
+    Create a small corpus of flat-ish paths with exactly ``versions`` versions per document.
+
+    Returns a dict with the created users and the root versions grouped by owner email,
+    which is what the benchmarks pick requests from.
+    """
+    from ..file_versions.models import FileVersion, User
+
+    generate_corpus(
+        users=users,
+        files=files,
+        min_versions=versions,
+        max_versions=versions,
+        share_ratio=share_ratio,
+        max_shares=1,
+        seed=seed,
+        email_domain=email_domain,
+    )
+    created_users = list(User.objects.filter(email__endswith=f"@{email_domain}").order_by("pk"))
+    roots = {user.email: [] for user in created_users}
+    root_versions = FileVersion.objects.filter(
+        uploader__in=created_users, previous_version__isnull=True
+    ).select_related("uploader").order_by("pk")
+    for root in root_versions:
+        roots[root.uploader.email].append(root)
+    return {"users": created_users, "roots": roots}
@@ -8,8 +8,17 @@ def enable_db_access_for_all_tests(db):
     pass
 
 @pytest.fixture(autouse=True)
-def media_storage(settings, tmpdir):
+def eager_background_tasks(settings):
+    # Post-upload work runs inline so tests can assert on its results; benchmarks
+    # share tests.settings and keep the real, deferred behaviour
+    settings.BACKGROUND_TASKS_EAGER = True
+
+
+@pytest.fixture(autouse=True)
+def media_storage(settings, tmpdir, tmp_path_factory):
     settings.MEDIA_ROOT = tmpdir.strpath
+    settings.COLD_STORAGE_ROOT = str(tmp_path_factory.mktemp("cold-media"))
+    settings.COLD_CACHE_ROOT = str(tmp_path_factory.mktemp("cold-cache"))
 
 
 @pytest.fixture
@@ -3,10 +3,20 @@
 Test cases for API views and endpoints
 """
 
+import hashlib
+import time
+from datetime import datetime
+from unittest import mock
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from guardian.shortcuts import assign_perm
 from rest_framework import status
 
 from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils.storage_tiers import demote
 from .base import BaseAPITestCase
 
 
@@ -466,4 +476,362 @@ class FileDownloadAPITest(BaseAPITestCase):
         url = reverse('file_download', kwargs={'path': encoded_path})
         response = self.client.get(url, {'token': self.token1.key})
         
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+
+class SignedDownloadAPITest(BaseAPITestCase):
+    """Test cases for minting and using signed download URLs"""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user1()
+        for content in (b"first signed content", b"second signed content"):
+            response = self.client.post(reverse('file_upload'), {
+                'file': self.create_test_file("signed.txt", content),
+                'name': "signed.txt",
+                'virtual_path': "/documents/signed.txt",
+            }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+
+    def mint(self, **data):
+        return self.client.post(reverse('signed_download_url'), {'virtual_path': "/documents/signed.txt", **data},
+                                format='json')
+
+    def test_signed_url_downloads_without_queries(self):
+        """Test that a minted URL serves the version while making no database queries"""
+        response = self.mint(revision=1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['version'], 1)
+        self.client.credentials()
+
+        with CaptureQueriesContext(connection) as queries:
+            download = self.client.get(response.data['url'])
+            content = b"".join(download.streaming_content)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(content, b"first signed content")
+        self.assertIn('signed.txt', download['Content-Disposition'])
+        self.assertTrue(download['Cache-Control'].startswith('public, max-age='))
+
+        etag = download['ETag']
+        cached = self.client.get(response.data['url'], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+    def test_tampered_or_expired_url_rejected(self):
+        """Test that a URL with a changed signature or past its expiry is refused"""
+        url = self.mint().data['url']
+        signature = url.split('/api/signed/')[1].split('/')[0]
+        forged = reverse('signed_download', kwargs={'signature': signature[:-2] + 'xx', 'file_name': 'signed.txt'})
+        self.assertEqual(self.client.get(forged).status_code, 403)
+
+        with mock.patch('propylon_document_manager.utils.signed_urls.time.time', return_value=time.time() + 301):
+            self.assertEqual(self.client.get(url).status_code, 403)
+
+    @override_settings(SIGNED_URL_MAX_AGE=60)
+    def test_lifetime_capped(self):
+        """Test that a requested lifetime longer than SIGNED_URL_MAX_AGE is shortened"""
+        response = self.mint(expires_in=3600)
+        self.assertEqual(response.status_code, 201)
+        expires_at = datetime.fromisoformat(response.data['expires_at'])
+        self.assertLessEqual(expires_at.timestamp(), time.time() + 60)
+        self.assertEqual(self.mint(expires_in='soon').status_code, 400)
+
+    def test_minting_checks_access(self):
+        """Test that only users who can view the document get a URL"""
+        self.authenticate_user2()
+        self.assertEqual(self.mint().status_code, 403)
+        self.client.credentials()
+        self.assertIn(self.mint().status_code, (401, 403))
+
+    def test_archived_blob_served_after_minting(self):
+        """Test that a blob moved out of the hot tier after minting is found through its version"""
+        url = self.mint().data['url']
+        version = FileVersion.objects.get(virtual_path="/documents/signed.txt", version_number=2)
+        demote(version.file_path.name)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"second signed content")
+
+
+class FileUploadPreflightAPITest(BaseAPITestCase):
+    """Test cases for upload preflight and linking stored blobs"""
+
+    content = b"contents already on the server"
+
+    def setUp(self):
+        super().setUp()
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+        self.authenticate_user1()
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("stored.txt", self.content),
+            'name': "stored.txt",
+            'virtual_path': "/documents/stored.txt",
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.stored = FileVersion.objects.get(virtual_path="/documents/stored.txt")
+
+    def preflight(self, virtual_path, sha256=None, size=None):
+        return self.client.post(reverse('file_upload_preflight'), {
+            'virtual_path': virtual_path,
+            'sha256': sha256 or self.sha256,
+            'size': len(self.content) if size is None else size,
+        }, format='json')
+
+    def link(self, virtual_path, **data):
+        return self.client.post(reverse('file_upload_link'), {
+            'virtual_path': virtual_path, 'name': "copy.txt", 'sha256': self.sha256, 'size': len(self.content), **data
+        }, format='json')
+
+    def test_preflight_answers(self):
+        """Test the present, link and send answers"""
+        present = self.preflight("/documents/stored.txt", self.sha256.upper())
+        self.assertEqual(present.data, {'action': 'present', 'version': 1})
+        self.assertEqual(self.preflight("/documents/copy.txt").data, {'action': 'link'})
+        self.assertEqual(self.preflight("/documents/copy.txt", size=1).data, {'action': 'send'})
+        self.assertEqual(self.preflight("/documents/copy.txt", "0" * 64).data, {'action': 'send'})
+        self.assertEqual(self.preflight("/documents/copy.txt", "not-a-checksum").status_code, 400)
+
+    def test_link_creates_version_sharing_blob(self):
+        """Test that linking adds a version that reuses the stored blob"""
+        response = self.link("/documents/copy.txt", notes="synced")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['message'], response.data['version']), ("File linked", 1))
+
+        linked = FileVersion.objects.get(virtual_path="/documents/copy.txt")
+        self.assertEqual(linked.file_path.name, self.stored.file_path.name)
+        self.assertEqual((linked.checksum, linked.file_size, linked.notes), (self.sha256, len(self.content), "synced"))
+        self.assertEqual(linked.file_name, "copy.txt")
+        self.assertEqual(linked.root_file_id, linked.pk)
+
+        again = self.link("/documents/copy.txt")
+        self.assertEqual(again.status_code, 400)
+        self.assertIn('Identical file already uploaded', str(again.data))
+
+    def test_blobs_of_other_users_not_linkable(self):
+        """Test that knowing another user's checksum doesn't let a user claim the file"""
+        self.authenticate_user2()
+        self.assertEqual(self.preflight("/mine/copy.txt").data, {'action': 'send'})
+        self.assertEqual(self.link("/mine/copy.txt").status_code, 400)
+
+        assign_perm('view_fileversion', self.user2, self.stored)
+        self.assertEqual(self.preflight("/mine/copy.txt").data, {'action': 'link'})
+        self.assertEqual(self.link("/mine/copy.txt").status_code, 201)
+
+    def test_preflight_checks_path_permission(self):
+        """Test that preflight refuses paths the user can't add versions to"""
+        self.authenticate_user2()
+        self.assertEqual(self.preflight("/documents/stored.txt").status_code, 400)
+        self.client.credentials()
+        self.assertIn(self.preflight("/documents/stored.txt").status_code, (401, 403))
+
+
+class FileBatchUploadAPITest(BaseAPITestCase):
+    """Test cases for uploading many files in one request"""
+
+    def batch(self, *items, **data):
+        return self.client.post(reverse('file_upload_batch'), {
+            'files': [self.create_test_file(path.rsplit('/', 1)[1], content) for path, content in items],
+            'virtual_paths': [path for path, _ in items],
+            **data,
+        }, format='multipart')
+
+    def test_batch_creates_documents_and_versions(self):
+        """Test that new paths become documents and existing ones get a next version"""
+        self.authenticate_user1()
+        self.assertEqual(self.batch(("/import/a.txt", b"a1")).status_code, 201)
+
+        response = self.batch(
+            ("/import/a.txt", b"a2"), ("/import/b.txt", b"b1"), ("/import/sub/c.txt", b"c1"), notes="imported"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 0))
+        self.assertEqual([r['version'] for r in response.data['results']], [2, 1, 1])
+
+        first, second = FileVersion.objects.filter(virtual_path="/import/a.txt").order_by('version_number')
+        self.assertEqual((second.previous_version_id, second.root_file_id), (first.pk, first.pk))
+        self.assertEqual(second.notes, "imported")
+        new_root = FileVersion.objects.get(virtual_path="/import/sub/c.txt")
+        self.assertEqual(new_root.root_file_id, new_root.pk)
+        self.assertEqual(new_root.file_path.read(), b"c1")
+        self.assertEqual(new_root.folder.path, "/import/sub/")
+
+        listing = self.client.get('/api/file_versions/')
+        self.assertEqual(len(listing.data), 3)
+        changes = self.client.get(reverse('change_feed'), {'since': 0})
+        self.assertEqual(len(changes.data['events']), 4)
+
+    def test_failures_reported_per_file(self):
+        """Test that rejected files don't stop the rest of the batch"""
+        self.authenticate_user1()
+        self.batch(("/shared/owned.txt", b"owned"))
+        self.authenticate_user2()
+        self.batch(("/mine/dup.txt", b"same"))
+
+        response = self.batch(
+            ("/shared/owned.txt", b"not allowed"),
+            ("/mine/dup.txt", b"same"),
+            ("/mine/new.txt", b"new"),
+            ("/mine/new.txt", b"newer"),
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 3))
+        self.assertEqual(
+            [r['status'] for r in response.data['results']], ['failed', 'failed', 'created', 'failed']
+        )
+        self.assertIn("permission", response.data['results'][0]['error'])
+        self.assertEqual(response.data['results'][1]['error'], "Identical file already uploaded")
+
+        nothing = self.batch(("/mine/dup.txt", b"same"))
+        self.assertEqual(nothing.status_code, 400)
+
+    def test_shared_document_accepts_batch_versions(self):
+        """Test that users with change permission add versions to shared documents"""
+        self.authenticate_user1()
+        self.batch(("/shared/team.txt", b"v1"))
+        root = FileVersion.objects.get(virtual_path="/shared/team.txt")
+        assign_perm('change_fileversion', self.user2, root)
+
+        self.authenticate_user2()
+        response = self.batch(("/shared/team.txt", b"v2"))
+        self.assertEqual(response.status_code, 201)
+        latest = FileVersion.objects.get(virtual_path="/shared/team.txt", version_number=2)
+        self.assertEqual(latest.uploader, self.user1)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=False)
+    def test_queries_do_not_grow_with_batch_size(self):
+        """Test that a batch makes as many queries for six files as for two, text processing aside"""
+        self.authenticate_user1()
+        # The first upload also grants the uploader's model permissions
+        self.batch(("/warm-up.txt", b"warm"))
+        counts = []
+        for size in (2, 6):
+            items = [(f"/flat{size}/f{i}.txt", f"{size}-{i}".encode()) for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.batch(*items).status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    @override_settings(UPLOAD_BATCH_MAX_FILES=2)
+    def test_invalid_batches_rejected(self):
+        """Test that mismatched lists and oversized batches are refused"""
+        self.authenticate_user1()
+        response = self.client.post(reverse('file_upload_batch'), {
+            'files': [self.create_test_file("a.txt", b"a")],
+            'virtual_paths': ["/a.txt", "/b.txt"],
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.batch(("/a.txt", b"a"), ("/b.txt", b"b"), ("/c.txt", b"c")).status_code, 400)
+        self.client.credentials()
+        self.assertIn(self.batch(("/a.txt", b"a")).status_code, (401, 403))
+
+
+class FileVersionBatchAPITest(BaseAPITestCase):
+    """Test cases for the batch metadata lookup endpoint"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('api:fileversion-batch')
+        self.documents = []
+        for index in range(3):
+            root = FileVersion.objects.create(
+                file_name=f"doc{index}.txt",
+                version_number=1,
+                file_path=self.create_test_file(f"doc{index}.txt", b"v1"),
+                uploader=self.user1,
+                virtual_path=f"/batch/doc{index}.txt",
+                checksum=f"doc{index}-v1",
+                mime_type="text/plain",
+            )
+            root.root_file = root
+            root.save()
+            FileVersion.objects.create(
+                file_name=f"doc{index}.txt",
+                version_number=2,
+                file_path=self.create_test_file(f"doc{index}.txt", b"v2"),
+                uploader=self.user1,
+                virtual_path=f"/batch/doc{index}.txt",
+                checksum=f"doc{index}-v2",
+                mime_type="text/plain",
+                previous_version=root,
+                root_file=root,
+            )
+            self.documents.append(root)
+        self.other = FileVersion.objects.create(
+            file_name="private.txt",
+            version_number=1,
+            file_path=self.create_test_file("private.txt", b"private"),
+            uploader=self.user2,
+            virtual_path="/batch/private.txt",
+            checksum="private",
+            mime_type="text/plain",
+        )
+        self.other.root_file = self.other
+        self.other.save()
+
+    def test_lookup_by_ids_and_paths(self):
+        """Test that ids and paths resolve to keyed maps including version lists"""
+        self.authenticate_user1()
+        response = self.client.post(self.url, {
+            'ids': [self.documents[0].id, self.documents[1].id],
+            'paths': ['/batch/doc2.txt'],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['ids']), {str(self.documents[0].id), str(self.documents[1].id)})
+        document = response.data['paths']['/batch/doc2.txt']
+        self.assertEqual(document['id'], self.documents[2].id)
+        self.assertEqual([v['version_number'] for v in document['versions']], [2, 1])
+        self.assertEqual(response.data['not_found'], {'ids': [], 'paths': []})
+
+    def test_inaccessible_and_missing_entries_not_found(self):
+        """Test that other users' files and unknown entries are reported as not found"""
+        self.authenticate_user1()
+        response = self.client.post(self.url, {
+            'ids': [self.other.id, 999999],
+            'paths': ['/batch/private.txt', '/batch/missing.txt'],
+        }, format='json')
+
+        self.assertEqual(response.data['ids'], {})
+        self.assertEqual(response.data['paths'], {})
+        self.assertEqual(response.data['not_found']['ids'], [self.other.id, 999999])
+        self.assertEqual(response.data['not_found']['paths'], ['/batch/private.txt', '/batch/missing.txt'])
+
+    def test_shared_files_included(self):
+        """Test that object-level view permission grants batch access"""
+        assign_perm('view_fileversion', self.user2, self.documents[0])
+        self.authenticate_user2()
+        response = self.client.post(self.url, {'ids': [self.documents[0].id, self.documents[1].id]}, format='json')
+
+        self.assertEqual(list(response.data['ids']), [str(self.documents[0].id)])
+        self.assertEqual(response.data['not_found']['ids'], [self.documents[1].id])
+
+    def test_query_count_is_constant(self):
+        """Test that the lookup doesn't issue queries per requested item"""
+        self.authenticate_user1()
+        all_ids = list(FileVersion.objects.filter(uploader=self.user1).values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as one:
+            self.client.post(self.url, {'ids': all_ids[:1], 'paths': ['/batch/doc0.txt']}, format='json')
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(self.url, {
+                'ids': all_ids,
+                'paths': [fv.virtual_path for fv in self.documents],
+            }, format='json')
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+
+    @override_settings(BATCH_LOOKUP_MAX_ITEMS=2)
+    def test_rejects_oversized_batches(self):
+        """Test that batches above the configured maximum are rejected"""
+        self.authenticate_user1()
+        response = self.client.post(self.url, {'ids': [1, 2], 'paths': ['/a']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_invalid_ids(self):
+        """Test that non-integer ids are rejected"""
+        self.authenticate_user1()
+        response = self.client.post(self.url, {'ids': ['abc']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_authentication(self):
+        """Test that batch lookups require authentication"""
+        response = self.client.post(self.url, {'ids': [self.documents[0].id]}, format='json')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
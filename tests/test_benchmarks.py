@@ -0,0 +1,112 @@
+# src/tests/test_benchmarks.py
+"""
+Test cases for the synthetic corpus builder and benchmark helpers
+"""
+
+import io
+import time
+import zipfile
+
+import mammoth
+import pypdf
+from django.test import TestCase, override_settings
+
+from benchmarks import harness
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils import synthetic_corpus
+from propylon_document_manager.utils.background import run_in_background
+from .base import BaseTestCase
+
+
+class SampleDocumentTest(TestCase):
+    """Test cases for the generated document payloads"""
+
+    def test_pdf_pages_are_extractable(self):
+        """Test that generated PDFs parse and keep one page per input string"""
+        payload = synthetic_corpus.make_pdf(["First page (one)", "Second page"])
+        reader = pypdf.PdfReader(io.BytesIO(payload))
+
+        self.assertEqual(len(reader.pages), 2)
+        self.assertIn("First page (one)", reader.pages[0].extract_text())
+        self.assertIn("Second page", reader.pages[1].extract_text())
+
+    def test_docx_converts_with_mammoth(self):
+        """Test that generated DOCX packages are readable by mammoth"""
+        payload = synthetic_corpus.make_docx(["Heading", "Body & more"])
+        result = mammoth.convert_to_markdown(io.BytesIO(payload))
+
+        self.assertIn("Heading", result.value)
+        self.assertIn("Body & more", result.value)
+
+    def test_odt_package_layout(self):
+        """Test that generated ODT packages store the mimetype entry first"""
+        payload = synthetic_corpus.make_odt([("Section 1. Scope", ["Applies to all"])])
+        with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+            self.assertEqual(archive.namelist()[0], "mimetype")
+            self.assertIn(b"Applies to all", archive.read("content.xml"))
+
+
+class BuildCorpusTest(BaseTestCase):
+    """Test cases for build_corpus"""
+
+    def test_builds_version_chains(self):
+        """Test that every document gets a linked chain of versions"""
+        corpus = synthetic_corpus.build_corpus(users=2, files=3, versions=2, seed=1)
+
+        self.assertEqual(len(corpus["users"]), 2)
+        self.assertEqual(FileVersion.objects.filter(virtual_path__startswith="/").count(), 12)
+        for roots in corpus["roots"].values():
+            for root in roots:
+                chain = FileVersion.objects.filter(root_file=root).order_by("version_number")
+                self.assertEqual([fv.version_number for fv in chain], [1, 2])
+                self.assertEqual(chain[1].previous_version, root)
+
+    def test_corpus_is_deterministic(self):
+        """Test that the same seed produces the same checksums"""
+        synthetic_corpus.build_corpus(users=1, files=2, versions=1, seed=7, email_domain="a.local")
+        first = list(FileVersion.objects.order_by("id").values_list("checksum", flat=True))
+        FileVersion.objects.all().delete()
+
+        synthetic_corpus.build_corpus(users=1, files=2, versions=1, seed=7, email_domain="b.local")
+        second = list(FileVersion.objects.order_by("id").values_list("checksum", flat=True))
+
+        self.assertEqual(first, second)
+
+
+class HarnessTest(TestCase):
+    """Test cases for benchmark result helpers"""
+
+    def test_percentile_nearest_rank(self):
+        """Test nearest-rank percentiles"""
+        samples = list(range(1, 101))
+        self.assertEqual(harness.percentile(samples, 50), 50)
+        self.assertEqual(harness.percentile(samples, 95), 95)
+        self.assertEqual(harness.percentile(samples, 99), 99)
+        self.assertEqual(harness.percentile([3.0], 99), 3.0)
+
+    def test_measure_drains_background_work(self):
+        """Test that work queued by a timed call finishes before the next call starts"""
+        finished = []
+
+        def task(index):
+            time.sleep(0.01)
+            finished.append(index)
+
+        def call(index):
+            with self.captureOnCommitCallbacks(execute=True):
+                run_in_background(task, index)
+            self.assertEqual(finished, list(range(index)))
+
+        with override_settings(BACKGROUND_TASKS_EAGER=False):
+            harness.measure(call, iterations=3, warmup=0, count_queries=False)
+        self.assertEqual(finished, [0, 1, 2])
+
+    def test_compare_results_flags_regressions(self):
+        """Test that slowdowns beyond the threshold are reported"""
+        baseline = {"scenarios": {"list": {"p95_ms": 10.0}, "upload": {"p95_ms": 10.0}}}
+        current = {"scenarios": {"list": {"p95_ms": 10.5}, "upload": {"p95_ms": 15.0}}}
+
+        rows, regressions = harness.compare_results(baseline, current, threshold=0.2)
+
+        self.assertEqual(regressions, ["upload"])
+        self.assertEqual(len(rows), 2)
@@ -0,0 +1,209 @@
+# src/tests/test_changes.py
+"""
+Test cases for the change feed
+"""
+
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from guardian.shortcuts import assign_perm
+
+from propylon_document_manager.file_versions.models import ChangeEvent, FileVersion, User
+from .base import BaseAPITestCase
+
+
+@override_settings(CHANGES_POLL_INTERVAL=0.01, CHANGES_STREAM_SECONDS=0, CHANGES_KEEPALIVE_SECONDS=0)
+class ChangeFeedTest(BaseAPITestCase):
+    """Test cases for recording and reading change events"""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('change_feed')
+
+    def upload(self, virtual_path, content):
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("doc.txt", content),
+            'name': "doc.txt",
+            'virtual_path': virtual_path,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return FileVersion.objects.filter(virtual_path=virtual_path).order_by('-version_number').first()
+
+    def share(self, file_version, **extra):
+        return self.client.post(reverse('file_share'), {
+            'file_id': file_version.id, 'user_email': self.user2.email, **extra
+        }, format='json')
+
+    def feed(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_feed_lists_created_versions_incrementally(self):
+        """Test that the cursor only returns events after the previous poll"""
+        self.authenticate_user1()
+        first = self.upload("/sync/a.txt", b"one")
+        data = self.feed()
+        self.assertEqual([(e['type'], e['file_version_id']) for e in data['events']], [('created', first.id)])
+        self.assertEqual(data['events'][0]['virtual_path'], "/sync/a.txt")
+        self.assertEqual(data['events'][0]['actor'], self.user1.email)
+
+        second = self.upload("/sync/a.txt", b"two")
+        data = self.feed(since=data['cursor'])
+        self.assertEqual([e['file_version_id'] for e in data['events']], [second.id])
+        self.assertEqual(data['events'][0]['version_number'], 2)
+        self.assertEqual(data['events'][0]['root_file_id'], first.id)
+
+        self.assertEqual(self.feed(since=data['cursor'])['events'], [])
+
+    def test_share_and_unshare_events(self):
+        """Test that sharing reaches the target user, who then sees new versions until unshared"""
+        self.authenticate_user1()
+        root = self.upload("/sync/shared.txt", b"one")
+        self.share(root, can_edit=True)
+        self.upload("/sync/shared.txt", b"two")
+        response = self.client.delete(reverse('file_share'), {
+            'file_id': root.id, 'user_email': self.user2.email
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.upload("/sync/shared.txt", b"three")
+
+        self.authenticate_user2()
+        events = self.feed()['events']
+        self.assertEqual([e['type'] for e in events], ['shared', 'created', 'unshared'])
+        self.assertEqual(events[0]['permissions'], ['view', 'edit'])
+        self.assertFalse(self.user2.has_perm('file_versions.view_fileversion', root))
+
+    def test_unshare_requires_ownership(self):
+        """Test that only the owner can unshare a file"""
+        self.authenticate_user1()
+        root = self.upload("/sync/owned.txt", b"one")
+        self.share(root)
+
+        self.authenticate_user2()
+        response = self.client.delete(reverse('file_share'), {
+            'file_id': root.id, 'user_email': self.user2.email
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_deleted_versions_are_reported_to_the_audience(self):
+        """Test that deleting a version records an event for the owner and shared users"""
+        self.authenticate_user1()
+        root = self.upload("/sync/gone.txt", b"one")
+        assign_perm('view_fileversion', self.user2, root)
+        version = self.upload("/sync/gone.txt", b"two")
+        version_id = version.id
+        with self.captureOnCommitCallbacks(execute=True):
+            version.delete()
+
+        deleted = ChangeEvent.objects.filter(event_type=ChangeEvent.DELETED, file_version_id=version_id)
+        self.assertEqual(set(deleted.values_list('user_id', flat=True)), {self.user1.id, self.user2.id})
+
+    def test_feeds_are_per_user(self):
+        """Test that users don't see events for documents they can't access"""
+        self.authenticate_user1()
+        self.upload("/sync/private.txt", b"secret")
+        self.authenticate_user2()
+        self.assertEqual(self.feed()['events'], [])
+
+    def test_pagination_with_has_more(self):
+        """Test that large backlogs are paged through the cursor"""
+        self.authenticate_user1()
+        for index in range(3):
+            self.upload(f"/sync/{index}.txt", f"content {index}".encode())
+        data = self.feed(limit=2)
+        self.assertEqual(len(data['events']), 2)
+        self.assertTrue(data['has_more'])
+        data = self.feed(since=data['cursor'], limit=2)
+        self.assertEqual(len(data['events']), 1)
+        self.assertFalse(data['has_more'])
+
+    @override_settings(CHANGES_SETTLE_SECONDS=60)
+    def test_cursor_held_back_behind_recent_events(self):
+        """Test that events younger than the settle window, and any after them, are not listed yet"""
+        self.authenticate_user1()
+        self.upload("/sync/settle-1.txt", b"one")
+        self.upload("/sync/settle-2.txt", b"two")
+        first, second = ChangeEvent.objects.filter(user=self.user1).order_by('id')
+        # A lower id committing late looks like a recent event ahead of a settled one
+        ChangeEvent.objects.filter(pk=second.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.feed(since=0), {'events': [], 'cursor': 0, 'has_more': False})
+
+        ChangeEvent.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        data = self.feed(since=0)
+        self.assertEqual([event['id'] for event in data['events']], [first.id, second.id])
+        self.assertEqual(data['cursor'], second.id)
+
+    def test_long_poll_returns_empty_after_wait(self):
+        """Test that a long-poll without new events returns the unchanged cursor"""
+        self.authenticate_user1()
+        data = self.feed(since=5, wait=0.05)
+        self.assertEqual(data, {'events': [], 'cursor': 5, 'has_more': False})
+
+    def test_event_stream(self):
+        """Test that text/event-stream clients receive events with ids"""
+        self.authenticate_user1()
+        first = self.upload("/sync/stream.txt", b"one")
+        with self.settings(CHANGES_STREAM_SECONDS=0.05):
+            response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream')
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: created', body)
+        self.assertIn(f'"file_version_id": {first.id}', body)
+        event_id = ChangeEvent.objects.get(user=self.user1).id
+        self.assertIn(f'id: {event_id}', body)
+
+    def test_event_stream_resumes_from_last_event_id(self):
+        """Test that reconnecting streams skip events already delivered"""
+        self.authenticate_user1()
+        self.upload("/sync/resume.txt", b"one")
+        last_id = ChangeEvent.objects.get(user=self.user1).id
+        with self.settings(CHANGES_STREAM_SECONDS=0.05):
+            response = self.client.get(self.url, {'format': 'sse'}, HTTP_LAST_EVENT_ID=str(last_id))
+            body = b"".join(response.streaming_content).decode()
+        self.assertNotIn('event: created', body)
+
+    def test_last_event_id_takes_precedence_over_since(self):
+        """Test that reconnecting streams resume from Last-Event-ID rather than the URL's stale since"""
+        self.authenticate_user1()
+        self.upload("/sync/first.txt", b"one")
+        last_id = ChangeEvent.objects.get(user=self.user1).id
+        second = self.upload("/sync/second.txt", b"two")
+        with self.settings(CHANGES_STREAM_SECONDS=0.05):
+            response = self.client.get(self.url, {'format': 'sse', 'since': 0}, HTTP_LAST_EVENT_ID=str(last_id))
+            body = b"".join(response.streaming_content).decode()
+        self.assertEqual(body.count('event: created'), 1)
+        self.assertIn(f'"file_version_id": {second.id}', body)
+
+    def test_invalid_cursor_rejected(self):
+        """Test that malformed cursors are rejected"""
+        self.authenticate_user1()
+        self.assertEqual(self.client.get(self.url, {'since': 'abc'}).status_code, 400)
+
+
+class DeletedUserChangeTest(TransactionTestCase):
+    """Test cases for deletion events written while a user is deleted"""
+
+    def test_deleting_owner_of_shared_files(self):
+        """Test that deleting a user who owns shared files commits and only notifies the remaining users"""
+        owner = User.objects.create_user(email='owner@test.com', password='testpass123')
+        reader = User.objects.create_user(email='reader@test.com', password='testpass123')
+        self.client.force_login(owner)
+        response = self.client.post(reverse('file_upload'), {
+            'file': SimpleUploadedFile("shared.txt", b"shared", content_type="text/plain"),
+            'name': "shared.txt",
+            'virtual_path': "/sync/shared.txt",
+        })
+        self.assertEqual(response.status_code, 201)
+        file_version = FileVersion.objects.get(uploader=owner)
+        assign_perm('view_fileversion', reader, file_version)
+
+        owner.delete()
+
+        self.assertFalse(User.objects.filter(pk=owner.pk).exists())
+        deleted = ChangeEvent.objects.filter(event_type=ChangeEvent.DELETED, file_version_id=file_version.pk)
+        self.assertEqual(list(deleted.values_list('user_id', flat=True)), [reader.pk])
@@ -0,0 +1,69 @@
+# src/tests/test_commands.py
+"""
+Test cases for management commands
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from guardian.shortcuts import get_objects_for_user
+
+from propylon_document_manager.file_versions.models import FileVersion, User
+from .base import BaseTestCase
+
+
+class LoadFileFixturesCommandTest(BaseTestCase):
+    """Test cases for the load_file_fixtures corpus generator"""
+
+    def run_command(self, **options):
+        out = StringIO()
+        call_command("load_file_fixtures", stdout=out, **options)
+        return out.getvalue()
+
+    def test_generates_linked_version_chains(self):
+        """Test that every document is a chain of versions rooted at its first version"""
+        output = self.run_command(users=2, files=4, versions=3, min_versions=3, depth=4, share_ratio=0)
+
+        self.assertIn("Successfully created 2 users, 8 documents, 24 file versions", output)
+        roots = FileVersion.objects.filter(previous_version__isnull=True, uploader__email__endswith="@fixtures.local")
+        self.assertEqual(roots.count(), 8)
+        for root in roots:
+            self.assertEqual(root.root_file_id, root.pk)
+            self.assertEqual(root.virtual_path.count("/"), 5)
+            chain = list(FileVersion.objects.filter(root_file=root).order_by("version_number"))
+            self.assertEqual([fv.version_number for fv in chain], [1, 2, 3])
+            self.assertEqual(chain[2].previous_version_id, chain[1].pk)
+
+    def test_payloads_are_written_with_matching_checksums(self):
+        """Test that the stored files exist and match the recorded size"""
+        self.run_command(users=1, files=3, versions=2, share_ratio=0)
+
+        for file_version in FileVersion.objects.all():
+            with file_version.file_path.open("rb") as handle:
+                self.assertEqual(len(handle.read()), file_version.file_size)
+            self.assertEqual(len(file_version.checksum), 64)
+
+    def test_share_graph_grants_object_permissions(self):
+        """Test that shared documents become visible to other users"""
+        self.run_command(users=3, files=5, versions=1, share_ratio=1.0, max_shares=2)
+
+        shared = 0
+        for user in User.objects.filter(email__endswith="@fixtures.local"):
+            visible = get_objects_for_user(
+                user, "file_versions.view_fileversion", klass=FileVersion, accept_global_perms=False
+            )
+            self.assertFalse(visible.filter(uploader=user).exists())
+            shared += visible.count()
+        self.assertGreaterEqual(shared, 15)
+
+    def test_refuses_to_reuse_email_domain(self):
+        """Test that a second run needs a fresh email domain"""
+        self.run_command(users=1, files=1, versions=1)
+        with self.assertRaises(CommandError):
+            self.run_command(users=1, files=1, versions=1)
+
+    def test_invalid_version_range(self):
+        """Test that --versions below --min-versions is rejected"""
+        with self.assertRaises(CommandError):
+            self.run_command(versions=1, min_versions=2)
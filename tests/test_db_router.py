@@ -0,0 +1,112 @@
+# src/tests/test_db_router.py
+"""
+Test cases for read-replica routing
+"""
+
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from propylon_document_manager.file_versions.models import FileVersion, User
+from propylon_document_manager.site import db_router
+
+
+@override_settings(READ_REPLICAS=["replica1", "replica2"], REPLICA_STICKY_SECONDS=30)
+class ReplicaRouterTest(TestCase):
+    """Test cases for ReplicaRouter and ReplicaRoutingMiddleware"""
+
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(email="reader@test.com", password="testpass123")
+        db_router._lag_cache.clear()
+        cache.clear()
+        # TestCase wraps every test in a transaction; routing only happens outside one
+        patcher = patch.object(db_router.connections["default"], "in_atomic_block", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, method="get", user=None, model=FileVersion, write_first=False):
+        """Run a request through the middleware and return where a read would go"""
+        decisions = {}
+
+        def view(request):
+            if user is not None:
+                request.user = user
+            if write_first:
+                self.router.db_for_write(model)
+            decisions["read"] = self.router.db_for_read(model)
+            return HttpResponse()
+
+        request = getattr(self.factory, method)("/api/file_versions/")
+        db_router.ReplicaRoutingMiddleware(view)(request)
+        return decisions["read"]
+
+    @patch.object(db_router, "replica_lag", return_value=0)
+    def test_safe_request_reads_from_replica(self, _):
+        """Test that reads during GET requests go to a replica"""
+        self.assertIn(self.route(user=self.user), ["replica1", "replica2"])
+
+    @patch.object(db_router, "replica_lag", return_value=0)
+    def test_unsafe_request_reads_from_primary(self, _):
+        """Test that reads during POST requests stay on the primary"""
+        self.assertIsNone(self.route(method="post", user=self.user))
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test that management commands and shells use the primary"""
+        self.assertIsNone(self.router.db_for_read(FileVersion))
+
+    @patch.object(db_router, "replica_lag", return_value=0)
+    def test_writer_is_pinned_to_primary(self, _):
+        """Test read-your-writes: a user's GETs stay on the primary after a write"""
+        self.route(method="post", user=self.user)
+        self.assertIsNone(self.route(user=self.user))
+
+        other = User.objects.create_user(email="other@test.com", password="testpass123")
+        self.assertIsNotNone(self.route(user=other))
+
+    @patch.object(db_router, "replica_lag", return_value=0)
+    def test_write_during_safe_request_pins_rest_of_request(self, _):
+        """Test that reads after a write in the same request use the primary"""
+        self.assertIsNone(self.route(user=self.user, write_first=True))
+
+    @patch.object(db_router, "replica_lag", return_value=0)
+    def test_credentials_read_from_primary(self, _):
+        """Test that freshly minted tokens are always found"""
+        self.assertIsNone(self.route(user=self.user, model=Token))
+
+    @patch.object(db_router, "replica_lag", side_effect=lambda alias: 60 if alias == "replica1" else 0)
+    def test_lagging_replica_skipped(self, _):
+        """Test that replicas beyond REPLICA_MAX_LAG_SECONDS are not used"""
+        for _ in range(5):
+            self.assertEqual(self.route(user=self.user), "replica2")
+
+    @patch.object(db_router, "replica_lag", return_value=None)
+    def test_falls_back_to_primary_when_no_replica_healthy(self, _):
+        """Test fallback to the primary when every replica lags or is down"""
+        self.assertIsNone(self.route(user=self.user))
+
+    def test_replicas_never_migrated(self):
+        """Test that migrations only run against the primary"""
+        self.assertFalse(self.router.allow_migrate("replica1", "file_versions"))
+        self.assertIsNone(self.router.allow_migrate("default", "file_versions"))
+
+
+class ReplicaRouterDisabledTest(TestCase):
+    """Test cases for the router without configured replicas"""
+
+    def test_no_replicas_means_primary(self):
+        """Test that the router is a no-op without READ_REPLICAS"""
+        router = db_router.ReplicaRouter()
+        request = RequestFactory().get("/")
+        decisions = {}
+
+        def view(request):
+            decisions["read"] = router.db_for_read(FileVersion)
+            return HttpResponse()
+
+        db_router.ReplicaRoutingMiddleware(view)(request)
+        self.assertIsNone(decisions["read"])
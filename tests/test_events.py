@@ -0,0 +1,185 @@
+# src/tests/test_events.py
+"""
+Test cases for the event broker and live event streams
+"""
+
+import json
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from guardian.shortcuts import assign_perm
+
+from propylon_document_manager.file_versions.models import ChangeEvent, FileVersion
+from propylon_document_manager.utils import background
+from propylon_document_manager.utils.events import (
+    LocalBroker, changes_channel, file_channel, get_broker, user_channel
+)
+from .base import BaseAPITestCase
+
+
+class LocalBrokerTest(TestCase):
+    """Test cases for the in-process broker"""
+
+    def test_publish_reaches_channel_subscribers_only(self):
+        """Test that messages are delivered to subscribers of their channel"""
+        broker = LocalBroker()
+        with broker.subscribe(["file:1"]) as first, broker.subscribe(["file:2", "user:1"]) as second:
+            self.assertEqual(broker.publish("file:1", {"n": 1}), 1)
+            broker.publish("user:1", {"n": 2})
+
+            self.assertEqual(first.get(timeout=0), ("file:1", {"n": 1}))
+            self.assertIsNone(first.get(timeout=0))
+            self.assertEqual(second.get(timeout=0), ("user:1", {"n": 2}))
+
+    def test_closed_subscriptions_stop_receiving(self):
+        """Test that unsubscribing removes the subscriber from every channel"""
+        broker = LocalBroker()
+        subscription = broker.subscribe(["file:1"])
+        subscription.close()
+        self.assertEqual(broker.publish("file:1", {}), 0)
+
+    def test_slow_subscribers_drop_messages(self):
+        """Test that a full queue drops messages instead of blocking publishers"""
+        broker = LocalBroker(queue_size=1)
+        with broker.subscribe(["file:1"]) as subscription:
+            broker.publish("file:1", {"n": 1})
+            broker.publish("file:1", {"n": 2})
+            self.assertTrue(subscription.overflowed)
+            self.assertEqual(subscription.get(timeout=0), ("file:1", {"n": 1}))
+
+
+class VersionEventTest(BaseAPITestCase):
+    """Test cases for publishing new versions"""
+
+    def setUp(self):
+        super().setUp()
+        self.root = FileVersion.objects.create(
+            file_name="live.txt",
+            version_number=1,
+            file_path=self.create_test_file("live.txt", b"v1"),
+            uploader=self.user1,
+            virtual_path="/live/live.txt",
+            checksum="live-v1",
+        )
+        self.root.root_file = self.root
+        self.root.save()
+        assign_perm('view_fileversion', self.user2, self.root)
+
+    def create_version(self):
+        return FileVersion.objects.create(
+            file_name="live.txt",
+            version_number=2,
+            file_path=self.create_test_file("live.txt", b"v2"),
+            uploader=self.user1,
+            virtual_path="/live/live.txt",
+            checksum="live-v2",
+            previous_version=self.root,
+            root_file=self.root,
+        )
+
+    def test_new_versions_published_after_commit(self):
+        """Test that creating a version notifies its document and audience channels once committed"""
+        channels = [file_channel(self.root.pk), user_channel(self.user1.pk), user_channel(self.user2.pk)]
+        with get_broker().subscribe(channels) as subscription:
+            with self.captureOnCommitCallbacks() as callbacks:
+                version = self.create_version()
+                self.assertIsNone(subscription.get(timeout=0))
+            for callback in callbacks:
+                callback()
+
+            received = [subscription.get(timeout=0) for _ in channels]
+        self.assertEqual(sorted(channel for channel, _ in received), sorted(channels))
+        message = received[0][1]
+        self.assertEqual((message['type'], message['id']), ('version_created', version.id))
+        self.assertEqual(message['root_file_id'], self.root.pk)
+        self.assertEqual(message['version_number'], 2)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=False)
+    def test_audience_looked_up_in_background(self):
+        """Test that committing a new version queues its publishing without querying on the request thread"""
+        with get_broker().subscribe([user_channel(self.user2.pk)]) as subscription:
+            with patch.object(background, "_submit") as submit:
+                with self.captureOnCommitCallbacks() as callbacks:
+                    version = self.create_version()
+                # Still inside the test's transaction, so the queue's own on_commit needs running too
+                with self.assertNumQueries(0), self.captureOnCommitCallbacks(execute=True):
+                    for callback in callbacks:
+                        callback()
+            self.assertIsNone(subscription.get(timeout=0))
+
+            func, args, kwargs = submit.call_args.args
+            func(*args, **kwargs)
+            channel, message = subscription.get(timeout=0)
+        self.assertEqual(message['id'], version.id)
+
+    def test_batch_uploads_published(self):
+        """Test that versions added by a batch upload reach the live streams like single uploads"""
+        self.authenticate_user1()
+        channels = [file_channel(self.root.pk), user_channel(self.user1.pk), user_channel(self.user2.pk)]
+        with get_broker().subscribe(channels) as subscription:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('file_upload_batch'), {
+                    'files': [
+                        self.create_test_file("live.txt", b"batch v2"), self.create_test_file("new.txt", b"new")
+                    ],
+                    'virtual_paths': ["/live/live.txt", "/live/new.txt"],
+                }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            received = []
+            while (item := subscription.get(timeout=0)) is not None:
+                received.append(item)
+
+        new_id = response.data['results'][1]['id']
+        self.assertEqual(sorted((channel, message['id']) for channel, message in received), sorted([
+            (file_channel(self.root.pk), response.data['results'][0]['id']),
+            (user_channel(self.user1.pk), response.data['results'][0]['id']),
+            (user_channel(self.user2.pk), response.data['results'][0]['id']),
+            (user_channel(self.user1.pk), new_id),
+        ]))
+        self.assertTrue(all(message['type'] == 'version_created' for _, message in received))
+
+    def test_change_events_wake_feed_waiters(self):
+        """Test that recording change events notifies the users' change channels"""
+        with get_broker().subscribe([changes_channel(self.user2.pk)]) as subscription:
+            with self.captureOnCommitCallbacks(execute=True):
+                ChangeEvent.objects.record(ChangeEvent.SHARED, self.root, [self.user2.pk])
+            self.assertEqual(subscription.get(timeout=0), (changes_channel(self.user2.pk), {'type': 'shared'}))
+
+    @override_settings(CHANGES_STREAM_SECONDS=0.2, CHANGES_KEEPALIVE_SECONDS=0.05)
+    def test_file_event_stream(self):
+        """Test that an open file stream receives new versions as server-sent events"""
+        self.authenticate_user2()
+        response = self.client.get(reverse('file_events', kwargs={'file_id': self.root.pk}))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b'retry:'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            version = self.create_version()
+        event = next(chunks).decode()
+        response.close()
+
+        self.assertTrue(event.startswith('event: version_created\n'))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['id'], version.id)
+
+    @override_settings(CHANGES_STREAM_SECONDS=0.05, CHANGES_KEEPALIVE_SECONDS=0.01)
+    def test_user_event_stream_sends_keepalives(self):
+        """Test that idle streams send comment lines and then close"""
+        self.authenticate_user1()
+        response = self.client.get(reverse('user_events'))
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn(': keepalive', body)
+
+    def test_file_stream_requires_access(self):
+        """Test that users can't subscribe to documents they can't view"""
+        other = FileVersion.objects.create(
+            file_name="other.txt",
+            version_number=1,
+            file_path=self.create_test_file("other.txt", b"other"),
+            uploader=self.user2,
+            virtual_path="/live/other.txt",
+        )
+        self.authenticate_user1()
+        response = self.client.get(reverse('file_events', kwargs={'file_id': other.pk}))
+        self.assertEqual(response.status_code, 403)
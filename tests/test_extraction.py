@@ -0,0 +1,349 @@
+# src/tests/test_extraction.py
+"""
+Test cases for upload-time text extraction
+"""
+
+import io
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from propylon_document_manager.file_versions.models import FileVersion, TextExtraction
+from propylon_document_manager.utils import synthetic_corpus
+from propylon_document_manager.utils import file_extraction, pipeline
+from propylon_document_manager.utils.file_extraction import (
+    ExtractionResult, ExtractionTimeout, Extractor, OdtExtractor, PdfExtractor, extract_document,
+    iter_odt_paragraphs, page_ranges, register_extractor, store_extraction
+)
+from .base import BaseAPITestCase
+
+
+class ExtractionPipelineTest(BaseAPITestCase):
+    """Test cases for storing extracted text and stats"""
+
+    def upload(self, name, content, content_type, virtual_path=None):
+        virtual_path = virtual_path or f'/extract/{name}'
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file(name, content, content_type),
+            'name': name,
+            'virtual_path': virtual_path,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return FileVersion.objects.get(checksum=response.data['checksum'], virtual_path=virtual_path)
+
+    def test_upload_stores_text_and_stats(self):
+        """Test that uploading a PDF stores its text, page count and counters"""
+        self.authenticate_user1()
+        pdf = synthetic_corpus.make_pdf(["Section 1. Scope of the act", "Section 2. Penalties"])
+        file_version = self.upload("act.pdf", pdf, "application/pdf")
+
+        extraction = file_version.extraction
+        self.assertEqual(extraction.status, TextExtraction.DONE)
+        self.assertEqual(extraction.page_count, 2)
+        self.assertIn("Penalties", extraction.text)
+        self.assertEqual(extraction.char_count, len(extraction.text))
+        self.assertEqual(extraction.word_count, len(extraction.text.split()))
+
+    def test_text_encoding_detected(self):
+        """Test that legacy-encoded text files are decoded and their encoding recorded"""
+        self.authenticate_user1()
+        utf8 = self.upload("utf8.txt", "Café".encode("utf-8"), "text/plain")
+        legacy = self.upload("legacy.txt", "Café – €5".encode("cp1252"), "text/plain")
+
+        self.assertEqual(utf8.extraction.encoding, "utf-8-sig")
+        self.assertEqual(legacy.extraction.encoding, "cp1252")
+        self.assertEqual(legacy.extraction.text, "Café – €5")
+
+    def test_unsupported_types_marked(self):
+        """Test that unsupported types are recorded without storing the placeholder text"""
+        self.authenticate_user1()
+        file_version = self.upload("blob.bin", b"\x00\x01", "application/octet-stream")
+        self.assertEqual(file_version.extraction.status, TextExtraction.UNSUPPORTED)
+        self.assertEqual(file_version.extraction.text, "")
+
+    def test_failures_recorded(self):
+        """Test that extraction errors are stored on the record and logged"""
+        self.authenticate_user1()
+        with self.assertLogs('propylon_document_manager.utils.pipeline', level='ERROR'):
+            file_version = self.upload("broken.pdf", b"not a pdf", "application/pdf")
+        self.assertEqual(file_version.extraction.status, TextExtraction.FAILED)
+        self.assertTrue(file_version.extraction.error)
+
+    def test_identical_content_reuses_extraction(self):
+        """Test that versions with an already extracted checksum copy its result"""
+        self.authenticate_user1()
+        first = self.upload("a.txt", b"shared words here", "text/plain", "/extract/a.txt")
+        with patch('propylon_document_manager.utils.file_extraction.extract_document') as extract:
+            second = self.upload("b.txt", b"shared words here", "text/plain", "/extract/b.txt")
+        extract.assert_not_called()
+        self.assertEqual(second.extraction.text, first.extraction.text)
+        self.assertEqual(second.extraction.word_count, 3)
+
+    def test_compare_reads_stored_text(self):
+        """Test that compare serves stored text without re-extracting"""
+        self.authenticate_user1()
+        left = self.upload("v.txt", b"first version", "text/plain", "/extract/v.txt")
+        right = self.upload("v.txt", b"second version", "text/plain", "/extract/v.txt")
+
+        with patch('propylon_document_manager.utils.file_extraction.extract_text') as extract:
+            response = self.client.get(reverse('file_compare'), {'left_id': left.id, 'right_id': right.id})
+        extract.assert_not_called()
+        self.assertEqual(response.data['left_file']['text'], "first version")
+        self.assertEqual(response.data['right_file']['text'], "second version")
+
+    def test_listing_includes_stats(self):
+        """Test that file listings expose the stored stats"""
+        self.authenticate_user1()
+        self.upload("listed.txt", b"three short words", "text/plain")
+        response = self.client.get(reverse('api:fileversion-list'))
+        self.assertEqual(response.data[0]['stats']['word_count'], 3)
+        self.assertEqual(response.data[0]['stats']['status'], TextExtraction.DONE)
+
+    def test_extract_documents_command_backfills(self):
+        """Test that the command extracts versions created without the pipeline"""
+        file_version = FileVersion.objects.create(
+            file_name="old.txt",
+            version_number=1,
+            file_path=self.create_test_file("old.txt", b"legacy upload"),
+            uploader=self.user1,
+            virtual_path="/extract/old.txt",
+            mime_type="text/plain",
+        )
+        out = StringIO()
+        call_command("extract_documents", stdout=out)
+        self.assertIn("Extracted 1 file versions", out.getvalue())
+        self.assertEqual(TextExtraction.objects.get(file_version=file_version).text, "legacy upload")
+
+        # Already extracted versions are skipped unless forced
+        out = StringIO()
+        call_command("extract_documents", stdout=out)
+        self.assertIn("Extracted 0 file versions", out.getvalue())
+
+    def test_extract_document_result(self):
+        """Test that extract_document returns page counts alongside the text"""
+        file_version = FileVersion.objects.create(
+            file_name="pages.pdf",
+            version_number=1,
+            file_path=self.create_test_file("pages.pdf", synthetic_corpus.make_pdf(["one", "two", "three"])),
+            uploader=self.user1,
+            virtual_path="/extract/pages.pdf",
+            mime_type="application/pdf",
+        )
+        result = extract_document(file_version)
+        self.assertEqual(result.page_count, 3)
+        self.assertTrue(result.supported)
+        self.assertEqual(store_extraction(file_version.id).page_count, 3)
+
+
+class SlowExtractor(Extractor):
+    name = "slow"
+    timeout = 0.05
+
+    def extract(self, file_path):
+        time.sleep(0.5)
+        return ExtractionResult("too late")
+
+
+class BrokenExtractor(Extractor):
+    name = "broken"
+
+    def extract(self, file_path):
+        raise ValueError("corrupt document")
+
+
+class UpperExtractor(Extractor):
+    name = "upper"
+    version = 3
+
+    def extract(self, file_path):
+        with open(file_path, encoding="utf-8") as f:
+            return ExtractionResult(f.read().upper())
+
+
+class ExtractorRegistryTest(BaseAPITestCase):
+    """Test cases for the extractor registry"""
+
+    def setUp(self):
+        super().setUp()
+        registry = dict(file_extraction._registry)
+        supported = set(file_extraction.SUPPORTED_MIME_TYPES)
+
+        def restore():
+            file_extraction._registry.clear()
+            file_extraction._registry.update(registry)
+            file_extraction.SUPPORTED_MIME_TYPES.clear()
+            file_extraction.SUPPORTED_MIME_TYPES.update(supported)
+        self.addCleanup(restore)
+
+    def create_version(self, name, content, mime_type):
+        return FileVersion.objects.create(
+            file_name=name,
+            version_number=1,
+            file_path=self.create_test_file(name, content),
+            uploader=self.user1,
+            virtual_path=f"/registry/{name}",
+            mime_type=mime_type,
+            checksum=name,
+        )
+
+    def test_registered_extractor_handles_its_type(self):
+        """Test that plugins add MIME types and record their name and version"""
+        register_extractor("text/x-shout")(UpperExtractor)
+        file_version = self.create_version("a.shout", b"quiet words", "text/x-shout")
+
+        result = extract_document(file_version)
+        self.assertEqual(result.text, "QUIET WORDS")
+        self.assertEqual((result.extractor, result.extractor_version), ("upper", 3))
+        self.assertIn("text/x-shout", file_extraction.SUPPORTED_MIME_TYPES)
+
+    def test_extractors_configured_in_settings(self):
+        """Test that TEXT_EXTRACTORS registers extractors by dotted path"""
+        self.addCleanup(setattr, file_extraction, "_configured", file_extraction._configured)
+        file_extraction._configured = False
+        with self.settings(TEXT_EXTRACTORS={"text/plain": "tests.test_extraction.UpperExtractor"}):
+            file_version = self.create_version("b.txt", b"plain", "text/plain")
+            self.assertEqual(extract_document(file_version).text, "PLAIN")
+
+    def test_timeouts_fail_the_extraction(self):
+        """Test that extractors running past their timeout are abandoned and recorded as failed"""
+        register_extractor("text/x-slow")(SlowExtractor)
+        file_version = self.create_version("c.slow", b"slow", "text/x-slow")
+
+        with self.assertRaises(ExtractionTimeout):
+            store_extraction(file_version.id)
+        extraction = TextExtraction.objects.get(file_version=file_version)
+        self.assertEqual(extraction.status, TextExtraction.FAILED)
+        self.assertIn("exceeded", extraction.error)
+
+    def test_failing_extractor_keeps_later_stages_running(self):
+        """Test that a raising extractor is logged and the stages after extraction still run"""
+        register_extractor("text/x-broken")(BrokenExtractor)
+        file_version = self.create_version("e.broken", b"broken", "text/x-broken")
+        stage = Mock(__name__="stage")
+
+        with patch.object(pipeline, "TEXT_STAGES", (stage,)):
+            with self.assertLogs("propylon_document_manager.utils.pipeline", level="ERROR") as logs:
+                pipeline.process_text(file_version.id)
+        self.assertIn("store_extraction failed", logs.output[0])
+        stage.assert_called_once_with(file_version.id)
+        self.assertEqual(TextExtraction.objects.get(file_version=file_version).status, TextExtraction.FAILED)
+
+    def test_new_extractor_versions_redo_extractions(self):
+        """Test that text from an older extractor version is re-extracted"""
+        file_version = self.create_version("d.txt", b"lower", "text/plain")
+        store_extraction(file_version.id)
+        self.assertEqual(file_version.extraction.extractor, "text")
+
+        register_extractor("text/plain")(UpperExtractor)
+        out = StringIO()
+        call_command("extract_documents", "--outdated", stdout=out)
+        self.assertIn("Extracted 1 file versions", out.getvalue())
+        self.assertEqual(TextExtraction.objects.get(file_version=file_version).text, "LOWER")
+
+
+class ParallelPdfExtractionTest(TestCase):
+    """Test cases for process pool PDF extraction"""
+
+    def test_page_ranges_cover_every_page_in_order(self):
+        """Test that page ranges are contiguous and respect the minimum size"""
+        ranges = page_ranges(100, workers=4, min_pages=5)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 100)
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(ranges, ranges[1:])))
+        self.assertTrue(all(stop - start >= 5 for start, stop in ranges[:-1]))
+        self.assertEqual(page_ranges(3, workers=8, min_pages=16), [(0, 3)])
+
+    @override_settings(PDF_PARALLEL_MIN_PAGES=4, PDF_PAGES_PER_TASK=2, PDF_EXTRACTION_WORKERS=2)
+    def test_parallel_extraction_matches_serial(self):
+        """Test that large PDFs are split across processes and reassembled in page order"""
+        pages = [f"Page {number} body text" for number in range(1, 9)]
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as handle:
+            handle.write(synthetic_corpus.make_pdf(pages))
+            handle.flush()
+            extractor = PdfExtractor()
+            with patch.object(PdfExtractor, 'extract_parallel', wraps=extractor.extract_parallel) as parallel:
+                result = extractor.extract(handle.name)
+            parallel.assert_called_once()
+
+            with self.settings(PDF_PARALLEL_MIN_PAGES=1000):
+                serial = extractor.extract(handle.name)
+        self.assertEqual(result.page_count, 8)
+        self.assertEqual(result.text, serial.text)
+        self.assertLess(result.text.index("Page 2"), result.text.index("Page 8"))
+
+
+def odt_package(body, meta=None):
+    """ODT archive with the given office:text body and optional meta.xml"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            "content.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+            'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+            f'<office:body><office:text>{body}</office:text></office:body></office:document-content>'
+        )
+        if meta:
+            archive.writestr("meta.xml", meta)
+    buffer.seek(0)
+    return buffer
+
+
+class OdtExtractionTest(TestCase):
+    """Test cases for streaming ODT extraction"""
+
+    def test_paragraph_structure(self):
+        """Test that paragraphs, headings, lists and inline markup become plain paragraphs"""
+        package = odt_package(
+            '<text:h text:outline-level="1">Section 1. Scope</text:h>'
+            '<text:p>First<text:tab/>line<text:line-break/>second line</text:p>'
+            '<text:list><text:list-item>'
+            '<text:p>Listed <text:span>item</text:span></text:p>'
+            '</text:list-item></text:list>'
+            '<text:p>   </text:p>'
+        )
+        self.assertEqual(
+            list(iter_odt_paragraphs(package)),
+            ["Section 1. Scope", "First\tline\nsecond line", "Listed item"]
+        )
+
+    def test_page_count_from_metadata(self):
+        """Test that the page count recorded in meta.xml is reported"""
+        meta = (
+            '<office:document-meta xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+            'xmlns:meta="urn:oasis:names:tc:opendocument:xmlns:meta:1.0"><office:meta>'
+            '<meta:document-statistic meta:page-count="7"/></office:meta></office:document-meta>'
+        )
+        with tempfile.NamedTemporaryFile(suffix=".odt") as handle:
+            handle.write(odt_package("<text:p>Body</text:p>", meta).getvalue())
+            handle.flush()
+            result = OdtExtractor().extract(handle.name)
+        self.assertEqual((result.text, result.page_count), ("Body", 7))
+
+    def test_synthetic_documents(self):
+        """Test extraction of the corpus generator's ODT documents"""
+        content = synthetic_corpus.make_odt([("Section 1. Title", ["Alpha", "Beta"])])
+        self.assertEqual(list(iter_odt_paragraphs(io.BytesIO(content))), ["Section 1. Title", "Alpha", "Beta"])
+
+    def test_memory_stays_flat_for_large_documents(self):
+        """Test that parsing doesn't hold the document tree in memory"""
+        paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 2
+        package = odt_package("".join(f"<text:p>{index} {paragraph}</text:p>" for index in range(20000)))
+        content_size = 20000 * len(paragraph)
+
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in iter_odt_paragraphs(package))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, 20000)
+        self.assertLess(peak, content_size / 4)
+
@@ -0,0 +1,138 @@
+# src/tests/test_fingerprints.py
+"""
+Test cases for near-duplicate detection
+"""
+
+import io
+
+from django.core.management import call_command
+from django.urls import reverse
+from guardian.shortcuts import assign_perm
+
+from propylon_document_manager.file_versions.models import ContentFingerprint, FileVersion, FingerprintBucket
+from propylon_document_manager.utils.events import get_broker, user_channel
+from propylon_document_manager.utils.fingerprints import BANDS, near_duplicates
+from .base import BaseAPITestCase
+
+LEASE = (
+    "This lease is made between the landlord and the tenant. The tenant shall pay the rent monthly in advance "
+    "on the first day of each month. The tenant shall keep the premises in good repair and shall not sublet "
+    "the premises without the written consent of the landlord. Either party may end this lease by giving "
+    "three months notice in writing to the other party at the address stated above."
+)
+# A re-scanned copy: same words, different spacing, line breaks and one OCR slip
+RESCANNED_LEASE = LEASE.replace(". ", ".\n").replace("premises in", "prernises in")
+INVOICE = (
+    "Invoice number 4411 for consulting services rendered during March, payable within thirty days of "
+    "receipt by bank transfer to the account listed below. Late payments incur interest at two percent."
+)
+
+
+class NearDuplicateTest(BaseAPITestCase):
+    """Test cases for fingerprints, the similar endpoint and upload warnings"""
+
+    def upload(self, virtual_path, content):
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("doc.txt", content.encode(), "text/plain"),
+            'name': "doc.txt",
+            'virtual_path': virtual_path,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        version = FileVersion.objects.filter(virtual_path=virtual_path).order_by('-version_number').first()
+        return version, response.data
+
+    def similar(self, file_version, **params):
+        return self.client.get(reverse('file_similar', kwargs={'file_id': file_version.id}), params)
+
+    def test_fingerprint_indexed_after_upload(self):
+        """Test that uploads store a signature and one bucket per band"""
+        self.authenticate_user1()
+        version, _ = self.upload("/intake/lease.txt", LEASE)
+        self.assertEqual(len(version.fingerprint.signature), 128)
+        self.assertEqual(FingerprintBucket.objects.filter(file_version=version).count(), BANDS)
+
+    def test_rescanned_copy_found_at_other_path(self):
+        """Test that a copy with a different checksum is reported as a near-duplicate"""
+        self.authenticate_user1()
+        original, _ = self.upload("/intake/lease.txt", LEASE)
+        self.upload("/intake/invoice.txt", INVOICE)
+        copy, data = self.upload("/scans/lease-scan.txt", RESCANNED_LEASE)
+        self.assertNotEqual(copy.checksum, original.checksum)
+
+        self.assertEqual([match['id'] for match in data['near_duplicates']], [original.id])
+        self.assertEqual(data['near_duplicates'][0]['virtual_path'], "/intake/lease.txt")
+
+        response = self.similar(original)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['indexed'])
+        self.assertEqual([match['id'] for match in response.data['similar']], [copy.id])
+        self.assertGreaterEqual(response.data['similar'][0]['similarity'], 0.8)
+
+    def test_versions_of_the_same_document_excluded(self):
+        """Test that a document's own versions aren't reported as duplicates"""
+        self.authenticate_user1()
+        first, _ = self.upload("/intake/lease.txt", LEASE)
+        _, data = self.upload("/intake/lease.txt", RESCANNED_LEASE)
+        self.assertEqual(data['near_duplicates'], [])
+        self.assertEqual(self.similar(first).data['similar'], [])
+
+    def test_only_visible_documents_reported(self):
+        """Test that other users' documents are only reported once they are shared"""
+        self.authenticate_user2()
+        theirs, _ = self.upload("/private/lease.txt", LEASE)
+        self.authenticate_user1()
+        mine, data = self.upload("/intake/lease.txt", RESCANNED_LEASE)
+        self.assertEqual(data['near_duplicates'], [])
+
+        assign_perm('view_fileversion', self.user1, theirs)
+        self.assertEqual([match['id'] for match in near_duplicates(mine, self.user1)], [theirs.id])
+
+    def test_owner_warned_over_live_events(self):
+        """Test that near-duplicates found by the pipeline are announced on the owner's channel"""
+        self.authenticate_user1()
+        original, _ = self.upload("/intake/lease.txt", LEASE)
+        with get_broker().subscribe([user_channel(self.user1.pk)]) as subscription:
+            with self.captureOnCommitCallbacks(execute=True):
+                copy, _ = self.upload("/scans/lease.txt", RESCANNED_LEASE)
+            messages = []
+            while (item := subscription.get(timeout=0)) is not None:
+                messages.append(item[1])
+        warning = next(message for message in messages if message['type'] == 'near_duplicate')
+        self.assertEqual(warning['id'], copy.id)
+        self.assertEqual([match['id'] for match in warning['similar']], [original.id])
+
+    def test_identical_checksums_share_signature(self):
+        """Test that copies with a fingerprinted checksum reuse its signature"""
+        self.authenticate_user1()
+        first, _ = self.upload("/intake/a.txt", LEASE)
+        second, _ = self.upload("/intake/b.txt", LEASE)
+        self.assertEqual(second.fingerprint.signature, first.fingerprint.signature)
+
+    def test_similar_requires_access_and_valid_threshold(self):
+        """Test permission and parameter checks of the similar endpoint"""
+        self.authenticate_user1()
+        version, _ = self.upload("/intake/lease.txt", LEASE)
+        self.assertEqual(self.similar(version, threshold='2').status_code, 400)
+        self.assertEqual(self.similar(version, threshold='x').status_code, 400)
+        self.authenticate_user2()
+        self.assertEqual(self.similar(version).status_code, 403)
+
+    def test_versions_without_text_not_indexed(self):
+        """Test that versions without extracted words get no fingerprint"""
+        self.authenticate_user1()
+        version, data = self.upload("/intake/empty.txt", "   ")
+        self.assertFalse(ContentFingerprint.objects.filter(file_version=version).exists())
+        self.assertEqual(data['near_duplicates'], [])
+        self.assertFalse(self.similar(version).data['indexed'])
+
+    def test_fingerprint_documents_command_backfills(self):
+        """Test that the command indexes versions uploaded before fingerprinting existed"""
+        self.authenticate_user1()
+        version, _ = self.upload("/intake/lease.txt", LEASE)
+        ContentFingerprint.objects.all().delete()
+        FingerprintBucket.objects.all().delete()
+
+        out = io.StringIO()
+        call_command('fingerprint_documents', stdout=out)
+        self.assertIn('Fingerprinted 1 file versions', out.getvalue())
+        self.assertEqual(FingerprintBucket.objects.filter(file_version=version).count(), BANDS)
@@ -0,0 +1,148 @@
+# src/tests/test_folders.py
+"""
+Test cases for the virtual folder index and folder API
+"""
+
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from propylon_document_manager.file_versions.models import FileVersion, Folder
+from propylon_document_manager.utils.folders import (
+    ancestor_paths, folder_path_for, normalize_folder_path, rebuild_folder_index
+)
+from .base import BaseAPITestCase
+
+
+class FolderPathTest(TestCase):
+    """Test cases for folder path helpers"""
+
+    def test_folder_path_for(self):
+        """Test that documents map to the folder containing them"""
+        self.assertEqual(folder_path_for("/contracts/2026/lease.pdf"), "/contracts/2026/")
+        self.assertEqual(folder_path_for("contracts//lease.pdf"), "/contracts/")
+        self.assertEqual(folder_path_for("lease.pdf"), "/")
+
+    def test_ancestor_paths(self):
+        """Test that ancestors are listed root first"""
+        self.assertEqual(ancestor_paths("/a/b/"), ["/", "/a/", "/a/b/"])
+        self.assertEqual(ancestor_paths("/"), ["/"])
+
+    def test_normalize_folder_path(self):
+        """Test that folder paths always begin and end with a slash"""
+        self.assertEqual(normalize_folder_path("a/b"), "/a/b/")
+        self.assertEqual(normalize_folder_path(""), "/")
+
+
+class FolderIndexTest(BaseAPITestCase):
+    """Test cases for incremental folder maintenance on upload"""
+
+    def upload(self, virtual_path, content):
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("doc.txt", content),
+            'name': virtual_path.rsplit('/', 1)[-1],
+            'virtual_path': virtual_path,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+    def test_upload_maintains_counters_and_rollups(self):
+        """Test that uploads update direct counters and every ancestor's rollup"""
+        self.authenticate_user1()
+        self.upload("/contracts/2026/a.txt", b"12345")
+        self.upload("/contracts/2026/a.txt", b"1234567")  # second version, same document
+        self.upload("/contracts/b.txt", b"123")
+
+        leaf = Folder.objects.get(owner=self.user1, path="/contracts/2026/")
+        self.assertEqual((leaf.file_count, leaf.total_size), (1, 12))
+        self.assertEqual(leaf.depth, 2)
+        self.assertEqual(leaf.parent.path, "/contracts/")
+
+        parent = Folder.objects.get(owner=self.user1, path="/contracts/")
+        self.assertEqual((parent.file_count, parent.total_size), (1, 3))
+        self.assertEqual((parent.subtree_file_count, parent.subtree_size), (2, 15))
+
+        root = Folder.objects.get(owner=self.user1, path="/")
+        self.assertEqual((root.subtree_file_count, root.subtree_size), (2, 15))
+        self.assertTrue(all(fv.folder_id for fv in FileVersion.objects.all()))
+
+    def test_rebuild_matches_incremental_index(self):
+        """Test that a full rebuild reproduces the incrementally maintained counters"""
+        self.authenticate_user1()
+        self.upload("/x/y/z/a.txt", b"aaaa")
+        self.upload("/x/y/b.txt", b"bb")
+        self.upload("/x/y/b.txt", b"bbb")
+        before = sorted(Folder.objects.values_list("path", "file_count", "total_size", "subtree_size"))
+
+        rebuild_folder_index(Folder, FileVersion)
+
+        after = sorted(Folder.objects.values_list("path", "file_count", "total_size", "subtree_size"))
+        self.assertEqual(before, after)
+        self.assertEqual(FileVersion.objects.filter(folder__isnull=True).count(), 0)
+
+
+class FolderAPITest(BaseAPITestCase):
+    """Test cases for the folder listing endpoint"""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate_user1()
+        for path, content in [
+            ("/contracts/2026/lease.txt", b"lease"),
+            ("/contracts/2026/nda.txt", b"nda"),
+            ("/contracts/2025/old.txt", b"old"),
+            ("/contracts/index.txt", b"index"),
+        ]:
+            self.client.post(reverse('file_upload'), {
+                'file': self.create_test_file("f.txt", content),
+                'name': path.rsplit('/', 1)[-1],
+                'virtual_path': path,
+            }, format='multipart')
+
+    def test_lists_children_and_files(self):
+        """Test that a folder lists its subfolders and its own documents"""
+        response = self.client.get(reverse('folder_detail', kwargs={'path': 'contracts'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['path'], '/contracts/')
+        self.assertEqual(response.data['subtree_file_count'], 4)
+        self.assertEqual([f['name'] for f in response.data['folders']], ['2025', '2026'])
+        self.assertEqual(response.data['folders'][1]['file_count'], 2)
+        self.assertEqual([f['file_name'] for f in response.data['files']], ['index.txt'])
+        self.assertEqual(response.data['files'][0]['latest_version'], 1)
+
+    def test_root_listing(self):
+        """Test the root folder listing"""
+        response = self.client.get(reverse('folder_root'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([f['path'] for f in response.data['folders']], ['/contracts/'])
+
+    def test_listing_uses_constant_queries(self):
+        """Test that listing cost doesn't grow with the number of children"""
+        url = reverse('folder_detail', kwargs={'path': 'contracts/2026'})
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for index in range(5):
+            self.client.post(reverse('file_upload'), {
+                'file': self.create_test_file("f.txt", f"more {index}".encode()),
+                'name': f"more-{index}.txt",
+                'virtual_path': f"/contracts/2026/more-{index}.txt",
+            }, format='multipart')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['files']), 7)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_pagination(self):
+        """Test limit and offset on the file list"""
+        url = reverse('folder_detail', kwargs={'path': 'contracts/2026'})
+        response = self.client.get(url, {'limit': 1, 'offset': 1})
+        self.assertEqual([f['file_name'] for f in response.data['files']], ['nda.txt'])
+
+    def test_folders_are_private(self):
+        """Test that users only see their own folder tree"""
+        self.authenticate_user2()
+        response = self.client.get(reverse('folder_detail', kwargs={'path': 'contracts'}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('folder_root'))
+        self.assertEqual(response.data['folders'], [])
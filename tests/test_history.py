@@ -0,0 +1,105 @@
+# src/tests/test_history.py
+"""
+Test cases for document histories built from stored version diffs
+"""
+
+from unittest import mock
+
+from django.urls import reverse
+from guardian.shortcuts import assign_perm
+
+from propylon_document_manager.file_versions.models import FileVersion, VersionDiff
+from propylon_document_manager.utils.history import chain_diffs, store_version_diff, version_chain
+from .base import BaseAPITestCase
+
+
+class FileHistoryTest(BaseAPITestCase):
+    """Test cases for stored diffs and the history endpoint"""
+
+    def upload(self, content, virtual_path="/history/policy.txt"):
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("policy.txt", content, "text/plain"),
+            'name': "policy.txt",
+            'virtual_path': virtual_path,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return FileVersion.objects.filter(virtual_path=virtual_path).order_by('-version_number').first()
+
+    def history(self, file_version, **params):
+        return self.client.get(reverse('file_history', kwargs={'file_id': file_version.id}), params)
+
+    def test_diffs_stored_after_upload(self):
+        """Test that each upload stores its diff against the previous version"""
+        self.authenticate_user1()
+        first = self.upload(b"alpha\nbeta\ngamma")
+        second = self.upload(b"alpha\nBETA\ngamma\ndelta")
+
+        self.assertEqual(first.diff.opcodes, [["insert", 0, 0, 0, 3, [], ["alpha", "beta", "gamma"]]])
+        self.assertEqual(second.diff.base_version_id, first.id)
+        self.assertEqual((second.diff.lines_added, second.diff.lines_removed), (2, 1))
+
+    def test_blame_attributes_lines_to_versions(self):
+        """Test that blame names the version that introduced each line"""
+        self.authenticate_user1()
+        first = self.upload(b"alpha\nbeta\ngamma")
+        self.upload(b"alpha\nBETA\ngamma")
+        self.upload(b"alpha\nBETA\ngamma\ndelta")
+
+        response = self.history(first)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(line['text'], line['version_number']) for line in response.data['blame']['lines']],
+            [("alpha", 1), ("BETA", 2), ("gamma", 1), ("delta", 3)],
+        )
+        self.assertEqual([v['version_number'] for v in response.data['versions']], [1, 2, 3])
+        self.assertEqual(
+            response.data['versions'][1]['changes'],
+            [{'op': 'replace', 'old_start': 2, 'new_start': 2, 'removed': ["beta"], 'added': ["BETA"]}],
+        )
+
+        earlier = self.history(first, version=2).data['blame']
+        self.assertEqual([line['text'] for line in earlier['lines']], ["alpha", "BETA", "gamma"])
+
+    def test_history_reuses_stored_diffs(self):
+        """Test that serving a history neither re-extracts text nor recomputes diffs"""
+        self.authenticate_user1()
+        first = self.upload(b"one")
+        self.upload(b"one\ntwo")
+        with mock.patch('propylon_document_manager.utils.file_extraction.extract_document') as extract, \
+                mock.patch('propylon_document_manager.utils.history.line_opcodes') as opcodes:
+            response = self.history(first)
+        self.assertEqual(response.status_code, 200)
+        extract.assert_not_called()
+        opcodes.assert_not_called()
+
+    def test_missing_and_stale_diffs_are_computed_once(self):
+        """Test that only versions without a current diff are diffed when a history is requested"""
+        self.authenticate_user1()
+        first = self.upload(b"one")
+        second = self.upload(b"one\ntwo")
+        third = self.upload(b"one\ntwo\nthree")
+        VersionDiff.objects.filter(file_version=third).delete()
+        # Relinking the chain makes the stored diff of the second version stale
+        VersionDiff.objects.filter(file_version=second).update(base_version_id=None)
+
+        target = 'propylon_document_manager.utils.history.store_version_diff'
+        with mock.patch(target, wraps=store_version_diff) as store:
+            diffs = chain_diffs(version_chain(first))
+        self.assertEqual(sorted(call.args[0] for call in store.call_args_list), [second.id, third.id])
+        self.assertEqual(diffs[third.id].lines_added, 1)
+
+    def test_shared_users_can_read_history(self):
+        """Test that users with view permission can read the history and others can't"""
+        self.authenticate_user1()
+        first = self.upload(b"shared text")
+        self.authenticate_user2()
+        self.assertEqual(self.history(first).status_code, 403)
+        assign_perm('view_fileversion', self.user2, first)
+        self.assertEqual(self.history(first).status_code, 200)
+
+    def test_unknown_version_rejected(self):
+        """Test that blame of a missing or malformed version number fails"""
+        self.authenticate_user1()
+        first = self.upload(b"text")
+        self.assertEqual(self.history(first, version=9).status_code, 404)
+        self.assertEqual(self.history(first, version='x').status_code, 400)
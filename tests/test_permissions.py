@@ -6,9 +6,12 @@ Test cases for file sharing and permissions functionality
 from django.urls import reverse
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from guardian.shortcuts import assign_perm
 from rest_framework import status
 
-from propylon_document_manager.file_versions.models import FileVersion, User
+from propylon_document_manager.file_versions.models import FileVersion, FileVersionUserObjectPermission, User
 from .base import BaseAPITestCase
 
 
@@ -410,3 +413,47 @@ class PermissionInheritanceTest(BaseAPITestCase):
         self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_403_FORBIDDEN])
 
 
+
+
+class DirectObjectPermissionTest(BaseAPITestCase):
+    """Test cases for the foreign-key object permission tables of FileVersion"""
+
+    def setUp(self):
+        super().setUp()
+        self.file_version = FileVersion.objects.create(
+            file_name="direct.txt",
+            version_number=1,
+            file_path=self.create_test_file("direct.txt", b"Direct content"),
+            uploader=self.user1,
+            virtual_path="/documents/direct.txt",
+        )
+
+    def test_shares_stored_with_foreign_key(self):
+        """Test that sharing writes a direct row instead of a generic one"""
+        from guardian.models import UserObjectPermission
+
+        assign_perm('view_fileversion', self.user2, self.file_version)
+        self.assertTrue(
+            FileVersionUserObjectPermission.objects.filter(
+                user=self.user2, content_object=self.file_version
+            ).exists()
+        )
+        self.assertFalse(UserObjectPermission.objects.exists())
+        self.assertTrue(self.user2.has_perm('file_versions.view_fileversion', self.file_version))
+
+    def test_shared_with_me_joins_without_casts(self):
+        """Test that shared-with-me queries the direct table"""
+        assign_perm('view_fileversion', self.user2, self.file_version)
+        self.authenticate_user2()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:fileversion-shared-with-me'))
+        self.assertEqual([item['id'] for item in response.data], [self.file_version.id])
+        sql = " ".join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('fileversionuserobjectpermission', sql)
+        self.assertNotIn('guardian_userobjectpermission', sql)
+
+    def test_shares_removed_with_version(self):
+        """Test that deleting a version deletes its permission rows"""
+        assign_perm('view_fileversion', self.user2, self.file_version)
+        self.file_version.delete()
+        self.assertFalse(FileVersionUserObjectPermission.objects.exists())
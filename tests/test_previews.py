@@ -0,0 +1,144 @@
+# src/tests/test_previews.py
+"""
+Test cases for document previews
+"""
+
+import hashlib
+import json
+
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from guardian.shortcuts import assign_perm
+from PIL import Image
+
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils import synthetic_corpus
+from propylon_document_manager.utils.previews import generate_previews, has_previews, preview_path
+from .base import BaseAPITestCase
+
+
+class PreviewGenerationTest(BaseAPITestCase):
+    """Test cases for preview generation at upload time"""
+
+    def upload(self, name, content, content_type, virtual_path=None):
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file(name, content, content_type),
+            'name': name,
+            'virtual_path': virtual_path or f'/previews/{name}',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response.data['checksum']
+
+    def read_manifest(self, checksum):
+        with default_storage.open(preview_path(checksum, 'manifest.json')) as handle:
+            return json.load(handle)
+
+    def test_pdf_upload_generates_page_renders(self):
+        """Test that each PDF page gets its own HTML render and a thumbnail"""
+        self.authenticate_user1()
+        pdf = synthetic_corpus.make_pdf(["Section 1. Scope", "Section 2. Penalties"])
+        checksum = self.upload("bill.pdf", pdf, "application/pdf")
+
+        manifest = self.read_manifest(checksum)
+        self.assertEqual(manifest['pages'], 2)
+        with default_storage.open(preview_path(checksum, 'page-0002.html')) as handle:
+            self.assertIn('Section 2. Penalties', handle.read().decode())
+        with default_storage.open(preview_path(checksum, 'thumbnail.png')) as handle:
+            thumbnail = Image.open(handle)
+            self.assertLessEqual(thumbnail.size[0], 240)
+            self.assertLessEqual(thumbnail.size[1], 320)
+
+    def test_docx_and_odt_previews(self):
+        """Test that DOCX and ODT uploads are rendered as text pages"""
+        self.authenticate_user1()
+        docx = synthetic_corpus.make_docx(["Heading", "Body of the act"])
+        odt = synthetic_corpus.make_odt([("Section 1. Title", ["Odt paragraph"])])
+
+        docx_checksum = self.upload(
+            "act.docx", docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+        odt_checksum = self.upload("act.odt", odt, "application/vnd.oasis.opendocument.text")
+
+        with default_storage.open(preview_path(docx_checksum, 'page-0001.html')) as handle:
+            self.assertIn('Body of the act', handle.read().decode())
+        with default_storage.open(preview_path(odt_checksum, 'page-0001.html')) as handle:
+            html = handle.read().decode()
+        self.assertIn('<p>Odt paragraph</p>', html)
+        self.assertNotIn('office:', html)
+
+    def test_identical_content_shares_previews(self):
+        """Test that previews are keyed by checksum and generated once"""
+        self.authenticate_user1()
+        checksum = self.upload("a.txt", b"same bytes", "text/plain", "/a/a.txt")
+        generated_at = self.read_manifest(checksum)['generated_at']
+
+        self.authenticate_user2()
+        self.assertEqual(self.upload("b.txt", b"same bytes", "text/plain", "/b/b.txt"), checksum)
+        self.assertEqual(self.read_manifest(checksum)['generated_at'], generated_at)
+
+    def test_unreadable_documents_do_not_break_upload(self):
+        """Test that preview failures are logged rather than failing the upload"""
+        self.authenticate_user1()
+        with self.assertLogs('propylon_document_manager.utils.background', level='ERROR'):
+            checksum = self.upload("broken.pdf", b"not really a pdf", "application/pdf")
+        self.assertFalse(has_previews(checksum))
+
+
+class PreviewViewTest(BaseAPITestCase):
+    """Test cases for serving previews"""
+
+    def setUp(self):
+        super().setUp()
+        content = b"Preview me\n\nSecond paragraph"
+        self.checksum = hashlib.sha256(content).hexdigest()
+        self.file_version = FileVersion.objects.create(
+            file_name="preview.txt",
+            version_number=1,
+            file_path=self.create_test_file("preview.txt", content),
+            uploader=self.user1,
+            virtual_path="/documents/preview.txt",
+            checksum=self.checksum,
+            mime_type="text/plain",
+        )
+        self.file_version.root_file = self.file_version
+        self.file_version.save()
+        generate_previews(self.file_version.pk)
+        self.url = reverse('file_preview', kwargs={'checksum': self.checksum, 'name': 'thumbnail.png'})
+
+    def test_owner_gets_immutable_thumbnail(self):
+        """Test that previews are served with long-lived cache headers"""
+        self.authenticate_user1()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{self.checksum}-thumbnail.png"')
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"\x89PNG"))
+
+    def test_conditional_request_returns_not_modified(self):
+        """Test that a matching If-None-Match skips the body"""
+        self.authenticate_user1()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.checksum}-thumbnail.png"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_users_cannot_see_previews(self):
+        """Test that previews are hidden from users without access"""
+        self.authenticate_user2()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_shared_users_can_see_previews(self):
+        """Test that view permission on the root file grants preview access"""
+        assign_perm('view_fileversion', self.user2, self.file_version)
+        self.authenticate_user2()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_unknown_preview_names_rejected(self):
+        """Test that only preview file names can be requested"""
+        self.authenticate_user1()
+        url = reverse('file_preview', kwargs={'checksum': self.checksum, 'name': 'secret.txt'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_requires_authentication(self):
+        """Test that previews require authentication"""
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
@@ -0,0 +1,211 @@
+# src/tests/test_retention.py
+"""
+Test cases for version retention policies and the pruner
+"""
+
+import io
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from django.core.management import call_command
+from django.db.models import RestrictedError
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from propylon_document_manager.file_versions.models import FileVersion, Folder, RetentionPolicy
+from propylon_document_manager.utils.retention import versions_to_keep
+from .base import BaseAPITestCase
+
+
+class VersionsToKeepTest(SimpleTestCase):
+    """Test cases for selecting the versions a policy keeps"""
+
+    now = timezone.make_aware(datetime(2026, 6, 15, 12, 0))
+
+    def versions(self, *ages):
+        """Versions created ``ages`` days before ``now``, oldest first, with ids 1, 2, ..."""
+        return [
+            SimpleNamespace(pk=index, created_at=self.now - timedelta(days=age))
+            for index, age in enumerate(ages, start=1)
+        ]
+
+    def test_first_and_latest_always_kept(self):
+        """Test that a policy with every rule off keeps only the first and latest versions"""
+        policy = RetentionPolicy(keep_last=0)
+        self.assertEqual(versions_to_keep(self.versions(9, 8, 7, 6), policy, self.now), {1, 4})
+
+    def test_keep_last(self):
+        """Test that keep_last keeps the newest versions"""
+        policy = RetentionPolicy(keep_last=2)
+        self.assertEqual(versions_to_keep(self.versions(9, 8, 7, 6, 5), policy, self.now), {1, 4, 5})
+
+    def test_daily_then_monthly(self):
+        """Test that the newest version of each day is kept in the daily window and of each month after it"""
+        policy = RetentionPolicy(keep_daily_days=3, keep_monthly_months=3)
+        versions = self.versions(200, 70, 69, 40, 2.1, 2, 0.2, 0.1)
+        # 70 and 69 days ago fall in the same month; 2.1 and 2 on the same day
+        self.assertEqual(versions_to_keep(versions, policy, self.now), {1, 3, 4, 6, 8})
+
+
+class RetentionPruningTest(BaseAPITestCase):
+    """Test cases for pruning documents by their retention policy"""
+
+    def upload(self, content, virtual_path="/retention/notes.txt"):
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("notes.txt", content, "text/plain"),
+            'name': "notes.txt",
+            'virtual_path': virtual_path,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return FileVersion.objects.filter(virtual_path=virtual_path).order_by('-version_number').first()
+
+    def version_numbers(self, virtual_path="/retention/notes.txt"):
+        return list(
+            FileVersion.objects.filter(virtual_path=virtual_path).order_by('version_number')
+            .values_list('version_number', flat=True)
+        )
+
+    def test_upload_prunes_and_relinks_chain(self):
+        """Test that uploads thin their document and relink previous_version over the gap"""
+        RetentionPolicy.objects.create(owner=self.user1, keep_last=2)
+        self.authenticate_user1()
+        first = self.upload(b"one")
+        second = self.upload(b"two")
+        blob = second.file_path.path
+        with self.captureOnCommitCallbacks(execute=True):
+            for content in (b"three", b"four", b"five"):
+                latest = self.upload(content)
+
+        self.assertEqual(self.version_numbers(), [1, 4, 5])
+        self.assertFalse(os.path.exists(blob))
+        fourth = FileVersion.objects.get(root_file=first, version_number=4)
+        self.assertEqual(fourth.previous_version_id, first.id)
+        self.assertEqual(latest.previous_version_id, fourth.id)
+
+        history = self.client.get(reverse('file_history', kwargs={'file_id': first.id}))
+        self.assertEqual([v['version_number'] for v in history.data['versions']], [1, 4, 5])
+
+    def test_folder_counters_updated(self):
+        """Test that pruned versions are taken out of the folder sizes"""
+        RetentionPolicy.objects.create(owner=self.user1, keep_last=1)
+        self.authenticate_user1()
+        for content in (b"1", b"22", b"333"):
+            self.upload(content)
+        folder = Folder.objects.get(owner=self.user1, path="/retention/")
+        self.assertEqual((folder.file_count, folder.total_size), (1, 4))
+        self.assertEqual(Folder.objects.get(owner=self.user1, path="/").subtree_size, 4)
+
+    def test_nearest_folder_policy_applies(self):
+        """Test that a folder's policy takes precedence over the owner's default"""
+        RetentionPolicy.objects.create(owner=self.user1, keep_last=1)
+        self.authenticate_user1()
+        self.upload(b"kept-1", "/archive/2026/deed.txt")
+        RetentionPolicy.objects.create(
+            owner=self.user1, folder=Folder.objects.get(owner=self.user1, path="/archive/"), keep_last=10
+        )
+        for content in (b"kept-2", b"kept-3"):
+            self.upload(content, "/archive/2026/deed.txt")
+            self.upload(content)
+        self.assertEqual(self.version_numbers("/archive/2026/deed.txt"), [1, 2, 3])
+        self.assertEqual(self.version_numbers(), [1, 2])
+
+    def test_documents_without_policy_untouched(self):
+        """Test that nothing is pruned unless the owner has a policy"""
+        self.authenticate_user1()
+        for content in (b"a", b"b", b"c"):
+            self.upload(content)
+        self.assertEqual(self.version_numbers(), [1, 2, 3])
+
+    def test_prune_versions_command_applies_time_rules(self):
+        """Test that the command prunes versions that aged out of a daily window"""
+        self.authenticate_user1()
+        for content in (b"a", b"b", b"c", b"d"):
+            self.upload(content)
+        FileVersion.objects.filter(version_number__lt=4).update(created_at=timezone.now() - timedelta(days=40))
+        RetentionPolicy.objects.create(owner=self.user1, keep_daily_days=30)
+
+        out = io.StringIO()
+        call_command('prune_versions', '--dry-run', stdout=out)
+        self.assertIn('Would prune 2 versions of 1 documents', out.getvalue())
+        self.assertEqual(self.version_numbers(), [1, 2, 3, 4])
+
+        call_command('prune_versions', stdout=out)
+        self.assertIn('Pruned 2 versions of 1 documents', out.getvalue())
+        self.assertEqual(self.version_numbers(), [1, 4])
+
+
+class RetentionPolicyFolderTest(BaseAPITestCase):
+    """Test cases for folder-scoped policies and the folder index"""
+
+    def test_rebuild_keeps_folder_policies(self):
+        """Test that rebuilding the folder index keeps policies, including ones on empty folders"""
+        self.authenticate_user1()
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("deed.txt", b"deed", "text/plain"),
+            'name': "deed.txt",
+            'virtual_path': "/archive/2026/deed.txt",
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        archive = Folder.objects.get(owner=self.user1, path="/archive/")
+        empty = Folder.objects.ensure_path(self.user1, "/empty/reserved/")
+        RetentionPolicy.objects.create(owner=self.user1, folder=archive, keep_last=3)
+        RetentionPolicy.objects.create(owner=self.user1, folder=empty, keep_last=1)
+        Folder.objects.ensure_path(self.user1, "/unused/")
+
+        call_command('rebuild_folder_index', stdout=io.StringIO())
+
+        self.assertEqual(RetentionPolicy.objects.count(), 2)
+        self.assertEqual(Folder.objects.get(owner=self.user1, path="/archive/").pk, archive.pk)
+        self.assertTrue(Folder.objects.filter(owner=self.user1, path="/empty/reserved/").exists())
+        self.assertFalse(Folder.objects.filter(owner=self.user1, path="/unused/").exists())
+        self.assertEqual(Folder.objects.get(owner=self.user1, path="/archive/").subtree_file_count, 1)
+
+    def test_policy_folder_protected(self):
+        """Test that deleting a folder with a policy fails instead of dropping the policy"""
+        folder = Folder.objects.ensure_path(self.user1, "/contracts/")
+        RetentionPolicy.objects.create(owner=self.user1, folder=folder, keep_last=1)
+        with self.assertRaises(RestrictedError):
+            folder.delete()
+        self.assertEqual(RetentionPolicy.objects.count(), 1)
+
+        self.user1.delete()
+        self.assertEqual(RetentionPolicy.objects.count(), 0)
+
+
+class RetentionPolicyAPITest(BaseAPITestCase):
+    """Test cases for managing retention policies over the API"""
+
+    def test_create_and_list_policies(self):
+        """Test that users manage their own default and folder policies"""
+        self.authenticate_user1()
+        url = reverse('api:retentionpolicy-list')
+        response = self.client.post(url, {'keep_last': 20}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['folder'])
+
+        response = self.client.post(url, {'folder': 'contracts', 'keep_daily_days': 30}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['folder'], '/contracts/')
+
+        duplicate = self.client.post(url, {'folder': '/contracts/', 'keep_last': 1}, format='json')
+        self.assertEqual(duplicate.status_code, 400)
+
+        self.authenticate_user2()
+        self.assertEqual(self.client.get(url).data, [])
+
+    def test_partial_update_keeps_folder(self):
+        """Test that patching a rule leaves the policy's folder alone"""
+        self.authenticate_user1()
+        created = self.client.post(
+            reverse('api:retentionpolicy-list'), {'folder': '/contracts/', 'keep_last': 5}, format='json'
+        )
+        url = reverse('api:retentionpolicy-detail', kwargs={'pk': created.data['id']})
+        response = self.client.patch(url, {'keep_last': 10}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['folder'], response.data['keep_last']), ('/contracts/', 10))
+
+    def test_requires_authentication(self):
+        """Test that anonymous users can't list policies"""
+        self.assertIn(self.client.get(reverse('api:retentionpolicy-list')).status_code, (401, 403))
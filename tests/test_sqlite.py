@@ -0,0 +1,59 @@
+# src/tests/test_sqlite.py
+"""
+Test cases for SQLite connection tuning
+"""
+
+import os
+import sqlite3
+import tempfile
+from unittest.mock import Mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from propylon_document_manager.utils.sqlite import apply_pragmas, configure_sqlite_connection
+
+
+class SQLitePragmaTest(TestCase):
+    """Test cases for the connection_created pragma hook"""
+
+    def test_pragmas_applied_to_django_connection(self):
+        """Test that per-connection pragmas are active on the default connection"""
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.DATABASES["default"]["OPTIONS"]["timeout"] * 1000)
+
+    def test_file_database_switches_to_wal(self):
+        """Test that a file-backed database ends up in WAL mode"""
+        with tempfile.TemporaryDirectory() as directory:
+            raw = sqlite3.connect(os.path.join(directory, "wal.sqlite"))
+            apply_pragmas(raw.cursor(), {"journal_mode": "wal", "synchronous": "normal"})
+            self.assertEqual(raw.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            raw.close()
+
+    def test_rejects_unsafe_pragmas(self):
+        """Test that pragma names and values are validated before interpolation"""
+        cursor = Mock()
+        with self.assertRaises(ValueError):
+            apply_pragmas(cursor, {"journal_mode": "wal; DROP TABLE x"})
+        with self.assertRaises(ValueError):
+            apply_pragmas(cursor, {"bad name": 1})
+        cursor.execute.assert_not_called()
+
+    def test_other_vendors_ignored(self):
+        """Test that non-SQLite connections are left alone"""
+        other = Mock(vendor="postgresql")
+        configure_sqlite_connection(sender=None, connection=other)
+        other.cursor.assert_not_called()
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_empty_settings_disable_tuning(self):
+        """Test that an empty SQLITE_PRAGMAS turns the hook off"""
+        sqlite_connection = Mock(vendor="sqlite")
+        configure_sqlite_connection(sender=None, connection=sqlite_connection)
+        sqlite_connection.cursor.assert_not_called()
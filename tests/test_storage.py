@@ -0,0 +1,487 @@
+# src/tests/test_storage.py
+"""
+Test cases for the blob storage layout and its maintenance commands
+"""
+
+import hashlib
+import io
+import json
+import os
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from propylon_document_manager.file_versions.models import FileVersion, Pack
+from propylon_document_manager.utils.file_extraction import extract_text
+from propylon_document_manager.utils.file_management import shard_directory, sharded_name
+from propylon_document_manager.utils.packs import open_packed
+from propylon_document_manager.utils.storage_tiers import COLD, HOT, PACKED, blob_path, cold_storage
+from .base import BaseAPITestCase, BaseTestCase
+
+
+class ShardedLayoutTest(SimpleTestCase):
+    """Test cases for fan-out directory names"""
+
+    def test_shard_directories_are_stable(self):
+        """Test that a name always maps to the same directories"""
+        self.assertEqual(shard_directory("a.txt"), shard_directory("a.txt"))
+        self.assertRegex(shard_directory("a.txt"), r'^[0-9a-f]{2}/[0-9a-f]{2}$')
+
+    def test_sharded_name_keeps_only_the_base_name(self):
+        """Test that re-sharding an already sharded name gives the same result"""
+        name = sharded_name("20260101_lease_0123456789.pdf")
+        self.assertEqual(sharded_name(name), name)
+        self.assertTrue(name.endswith("/20260101_lease_0123456789.pdf"))
+
+    @override_settings(MEDIA_SHARD_LEVELS=0)
+    def test_zero_levels_is_flat(self):
+        """Test that MEDIA_SHARD_LEVELS=0 keeps the flat layout"""
+        self.assertEqual(sharded_name("x/flat.txt"), "flat.txt")
+
+
+class ShardMediaCommandTest(BaseTestCase):
+    """Test cases for relocating blobs into the sharded layout"""
+
+    def create_flat_version(self, name, content):
+        with open(default_storage.path(name), "wb") as f:
+            f.write(content)
+        return FileVersion.objects.create(
+            file_name=name,
+            version_number=1,
+            file_path=name,
+            uploader=self.user1,
+            virtual_path=f"/legacy/{name}",
+        )
+
+    def shard(self, *args):
+        out = io.StringIO()
+        call_command('shard_media', '--grace=0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_uploads_are_stored_sharded(self):
+        """Test that new uploads land in fan-out directories"""
+        version = FileVersion.objects.create(
+            file_name="new.txt",
+            version_number=1,
+            file_path=self.create_test_file("new.txt", b"new"),
+            uploader=self.user1,
+            virtual_path="/new.txt",
+        )
+        self.assertEqual(version.file_path.name, sharded_name(version.file_path.name))
+        self.assertTrue(os.path.exists(version.file_path.path))
+
+    def test_flat_blobs_relocated(self):
+        """Test that existing blobs are moved and their rows repointed in batches"""
+        first = self.create_flat_version("legacy-a.txt", b"first")
+        second = self.create_flat_version("legacy-b.txt", b"second")
+
+        output = self.shard('--batch-size=1')
+        self.assertIn('Moved 2 blobs', output)
+        for version, name, content in ((first, "legacy-a.txt", b"first"), (second, "legacy-b.txt", b"second")):
+            version.refresh_from_db()
+            self.assertEqual(version.file_path.name, sharded_name(name))
+            with version.file_path.open("rb") as f:
+                self.assertEqual(f.read(), content)
+        self.assertFalse(os.path.exists(default_storage.path("legacy-a.txt")))
+        self.assertIn('Moved 0 blobs', self.shard())
+
+    def test_dry_run_changes_nothing(self):
+        """Test that a dry run only reports"""
+        version = self.create_flat_version("legacy-dry.txt", b"dry")
+        self.assertIn('Would move 1 blobs', self.shard('--dry-run'))
+        version.refresh_from_db()
+        self.assertEqual(version.file_path.name, "legacy-dry.txt")
+        self.assertTrue(os.path.exists(default_storage.path("legacy-dry.txt")))
+
+    def test_old_names_kept_during_grace_period(self):
+        """Test that readers holding the old name can still open it until the grace period ends"""
+        version = self.create_flat_version("legacy-grace.txt", b"grace")
+        old_path = default_storage.path("legacy-grace.txt")
+        with open(old_path, "rb") as reader:
+            call_command('shard_media', '--grace=0.05', stdout=io.StringIO())
+            self.assertEqual(reader.read(), b"grace")
+        version.refresh_from_db()
+        self.assertTrue(os.path.exists(version.file_path.path))
+
+    def test_missing_blobs_reported(self):
+        """Test that rows whose blob is gone are reported and left alone"""
+        version = FileVersion.objects.create(
+            file_name="gone.txt",
+            version_number=1,
+            file_path="gone.txt",
+            uploader=self.user1,
+            virtual_path="/legacy/gone.txt",
+        )
+        self.assertIn('Missing blob: gone.txt', self.shard())
+        version.refresh_from_db()
+        self.assertEqual(version.file_path.name, "gone.txt")
+
+
+class ScrubMediaCommandTest(BaseTestCase):
+    """Test cases for re-hashing blobs against their recorded checksums"""
+
+    def create_version(self, name, content, **fields):
+        path = self.create_test_file(name, content)
+        fields.setdefault("checksum", hashlib.sha256(content).hexdigest())
+        return FileVersion.objects.create(
+            file_name=name,
+            version_number=1,
+            file_path=path,
+            uploader=self.user1,
+            virtual_path=f"/scrub/{name}",
+            file_size=len(content),
+            **fields,
+        )
+
+    def scrub(self, *args):
+        out = io.StringIO()
+        call_command('scrub_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_intact_blobs_marked_verified(self):
+        """Test that blobs matching their checksum get a verification time"""
+        version = self.create_version("intact.txt", b"intact")
+        self.assertIn('Checked 1 blobs: 0 missing, 0 corrupt', self.scrub())
+        version.refresh_from_db()
+        self.assertIsNotNone(version.verified_at)
+
+    def test_missing_and_corrupt_blobs_reported(self):
+        """Test that missing files and changed contents are reported in the output and the JSON report"""
+        missing = self.create_version("missing.txt", b"missing")
+        corrupt = self.create_version("corrupt.txt", b"original")
+        os.unlink(missing.file_path.path)
+        with open(corrupt.file_path.path, "wb") as f:
+            f.write(b"tampered")
+
+        report = os.path.join(default_storage.location, "report.json")
+        output = self.scrub('--batch-size=1', f'--report={report}')
+        self.assertIn(f'Version {missing.id}: Missing blob', output)
+        self.assertIn(f'Version {corrupt.id}: Corrupt blob (checksum', output)
+        with open(report) as f:
+            self.assertEqual(json.load(f), {"missing": [missing.id], "corrupt": [corrupt.id], "orphaned": []})
+        corrupt.refresh_from_db()
+        self.assertIsNone(corrupt.verified_at)
+
+    def test_orphaned_blobs_reported(self):
+        """Test that blobs without a version are reported, but derived previews are not"""
+        self.create_version("kept.txt", b"kept")
+        orphan = default_storage.save(sharded_name("orphan.txt"), ContentFile(b"orphan"))
+        default_storage.save("previews/ab/abc/thumbnail.png", ContentFile(b"png"))
+
+        output = self.scrub('--orphans', '--orphan-age=0')
+        self.assertIn(f'Orphaned blob: {orphan}', output)
+        self.assertIn('1 orphaned', output)
+        self.assertNotIn('thumbnail.png', output)
+        self.assertIn('0 orphaned', self.scrub('--orphans'))
+
+    def test_incremental_mode_skips_recently_verified(self):
+        """Test that --since-days only checks blobs not verified within the window"""
+        recent = self.create_version("recent.txt", b"recent", verified_at=timezone.now() - timedelta(days=1))
+        self.create_version("stale.txt", b"stale", verified_at=timezone.now() - timedelta(days=30))
+        self.create_version("never.txt", b"never")
+        os.unlink(recent.file_path.path)
+
+        self.assertIn('Checked 2 blobs: 0 missing', self.scrub('--since-days=7'))
+        self.assertIn('Checked 3 blobs: 1 missing', self.scrub())
+
+    def test_resumes_from_checkpoint(self):
+        """Test that a run resumes after the last version recorded in the checkpoint"""
+        first = self.create_version("first.txt", b"first")
+        second = self.create_version("second.txt", b"second")
+        checkpoint = os.path.join(default_storage.location, "scrub.json")
+        with open(checkpoint, "w") as f:
+            json.dump({"last_id": first.id, "checked": 1, "missing": [first.id], "corrupt": []}, f)
+
+        output = self.scrub(f'--checkpoint={checkpoint}')
+        self.assertIn(f'Resuming after version {first.id}', output)
+        self.assertIn('Checked 2 blobs: 1 missing', output)
+        self.assertFalse(os.path.exists(checkpoint))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNone(first.verified_at)
+        self.assertIsNotNone(second.verified_at)
+
+    def test_worker_pool_and_rate_limit(self):
+        """Test that hashing in worker processes under a rate limit gives the same result"""
+        for index in range(3):
+            self.create_version(f"pooled-{index}.txt", b"pooled" * 100)
+        self.assertIn('Checked 3 blobs: 0 missing, 0 corrupt', self.scrub('--workers=2', '--max-rate=1'))
+        self.assertEqual(FileVersion.objects.filter(verified_at__isnull=False).count(), 3)
+
+
+class CollectGarbageCommandTest(BaseTestCase):
+    """Test cases for removing unreferenced blobs, previews and permissions"""
+
+    def create_version(self, name, content):
+        return FileVersion.objects.create(
+            file_name=name,
+            version_number=1,
+            file_path=self.create_test_file(name, content),
+            uploader=self.user1,
+            virtual_path=f"/gc/{name}",
+            checksum=hashlib.sha256(content).hexdigest(),
+            file_size=len(content),
+        )
+
+    def collect(self, *args):
+        out = io.StringIO()
+        call_command('collect_garbage', '--min-age=0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_unreferenced_blobs_removed(self):
+        """Test that blobs of deleted versions are removed and referenced ones kept"""
+        kept = self.create_version("kept.txt", b"kept")
+        deleted = self.create_version("deleted.txt", b"deleted!")
+        path = deleted.file_path.path
+        deleted.delete()
+
+        self.assertIn('Removed 1 blobs (8\xa0bytes)', self.collect())
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(kept.file_path.path))
+
+    def test_dry_run_reports_space(self):
+        """Test that a dry run reports the space it would reclaim without removing anything"""
+        deleted = self.create_version("dry.txt", b"dry run")
+        path = deleted.file_path.path
+        deleted.delete()
+
+        self.assertIn('Would remove 1 blobs (7\xa0bytes)', self.collect('--dry-run'))
+        self.assertTrue(os.path.exists(path))
+
+    def test_recent_blobs_kept(self):
+        """Test that blobs younger than --min-age are left for uploads still in progress"""
+        deleted = self.create_version("young.txt", b"young")
+        deleted.delete()
+        out = io.StringIO()
+        call_command('collect_garbage', stdout=out)
+        self.assertIn('Removed 0 blobs', out.getvalue())
+
+    def test_previews_of_removed_checksums_removed(self):
+        """Test that preview sets are removed once no version has their checksum"""
+        kept = self.create_version("kept.txt", b"kept")
+        gone = hashlib.sha256(b"gone").hexdigest()
+        for checksum in (kept.checksum, gone):
+            default_storage.save(f"previews/{checksum[:2]}/{checksum}/manifest.json", ContentFile(b"{}"))
+
+        self.assertIn('1 preview sets (2\xa0bytes)', self.collect())
+        self.assertFalse(os.path.exists(default_storage.path(f"previews/{gone[:2]}/{gone}")))
+        self.assertTrue(default_storage.exists(f"previews/{kept.checksum[:2]}/{kept.checksum}/manifest.json"))
+
+    def test_dangling_object_permissions_removed(self):
+        """Test that generic object permissions of deleted versions are removed in batches"""
+        from guardian.models import UserObjectPermission
+
+        kept = self.create_version("kept.txt", b"kept")
+        deleted = [self.create_version(f"shared-{index}.txt", b"shared") for index in range(3)]
+        for version in [kept, *deleted]:
+            UserObjectPermission.objects.assign_perm('view_fileversion', self.user2, version)
+        for version in deleted:
+            version.delete()
+
+        self.assertIn('and 3 object permissions', self.collect('--batch-size=2', '--dry-run'))
+        self.assertEqual(UserObjectPermission.objects.count(), 4)
+        self.assertIn('and 3 object permissions', self.collect('--batch-size=2'))
+        self.assertEqual(
+            list(UserObjectPermission.objects.values_list('object_pk', flat=True)), [str(kept.pk)]
+        )
+
+
+class TieredStorageTest(BaseAPITestCase):
+    """Test cases for archiving blobs to the cold tier and reading them back"""
+
+    def upload(self, content, virtual_path="/tiers/report.txt"):
+        response = self.client.post(reverse('file_upload'), {
+            'file': self.create_test_file("report.txt", content, "text/plain"),
+            'name': "report.txt",
+            'virtual_path': virtual_path,
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return FileVersion.objects.filter(virtual_path=virtual_path).order_by('-version_number').first()
+
+    def age(self, version, days):
+        FileVersion.objects.filter(pk=version.pk).update(created_at=timezone.now() - timedelta(days=days))
+
+    def tier(self, *args):
+        out = io.StringIO()
+        call_command('tier_media', *args, stdout=out)
+        return out.getvalue()
+
+    def download(self, version):
+        token = Token.objects.get_or_create(user=self.user1)[0].key
+        url = reverse('file_download', kwargs={'path': version.virtual_path})
+        return self.client.get(url, {'token': token, 'revision': version.version_number})
+
+    def test_old_versions_archived(self):
+        """Test that versions unused for the configured days move to the cold tier"""
+        self.authenticate_user1()
+        old = self.upload(b"quarterly figures")
+        recent = self.upload(b"quarterly figures, revised")
+        self.age(old, 120)
+        name = old.file_path.name
+
+        self.assertIn('Would archive 1 blobs', self.tier('--dry-run'))
+        self.assertIn('Archived 1 blobs (17\xa0bytes)', self.tier('--days=90'))
+        old.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((old.storage_tier, recent.storage_tier), (COLD, HOT))
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(cold_storage().exists(name))
+
+    def test_recent_download_keeps_blob_hot(self):
+        """Test that a download within the window counts as use"""
+        self.authenticate_user1()
+        version = self.upload(b"still read")
+        self.age(version, 120)
+        FileVersion.objects.filter(pk=version.pk).update(last_accessed_at=timezone.now())
+        self.assertIn('Archived 0 blobs', self.tier())
+
+    def test_download_reads_through_cache_and_promotes(self):
+        """Test that downloading an archived version serves it and moves it back to the hot tier"""
+        self.authenticate_user1()
+        version = self.upload(b"archived contents")
+        self.age(version, 120)
+        self.tier()
+
+        response = self.download(version)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"archived contents")
+        version.refresh_from_db()
+        self.assertEqual(version.storage_tier, HOT)
+        self.assertIsNotNone(version.last_accessed_at)
+        self.assertTrue(default_storage.exists(version.file_path.name))
+        self.assertFalse(cold_storage().exists(version.file_path.name))
+
+    def test_archived_text_still_extracted(self):
+        """Test that extraction reads archived blobs through the cache without promoting them"""
+        self.authenticate_user1()
+        version = self.upload(b"cold text")
+        self.age(version, 120)
+        self.tier()
+        version.refresh_from_db()
+        self.assertEqual(extract_text(version), "cold text")
+        version.refresh_from_db()
+        self.assertEqual(version.storage_tier, COLD)
+
+    @override_settings(COLD_CACHE_MAX_BYTES=10)
+    def test_cache_trimmed_to_size(self):
+        """Test that the least recently used cache entries are removed beyond the size limit"""
+        self.authenticate_user1()
+        first = self.upload(b"0123456789", "/tiers/a.txt")
+        second = self.upload(b"abcdefghij", "/tiers/b.txt")
+        for version in (first, second):
+            self.age(version, 120)
+        self.tier()
+        first.refresh_from_db()
+        second.refresh_from_db()
+
+        first_path = blob_path(first)
+        os.utime(first_path, (0, 0))
+        blob_path(second)
+        self.assertFalse(os.path.exists(first_path))
+        self.assertTrue(os.path.exists(blob_path(second)))
+
+
+class PackFilesTest(BaseAPITestCase):
+    """Test cases for consolidating archived blobs into pack files"""
+
+    def archive(self, *contents):
+        """Upload each content as its own document and move them all to the cold tier"""
+        self.authenticate_user1()
+        for index, content in enumerate(contents):
+            response = self.client.post(reverse('file_upload'), {
+                'file': self.create_test_file("note.txt", content, "text/plain"),
+                'name': "note.txt",
+                'virtual_path': f"/packs/note-{index}.txt",
+            }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+        FileVersion.objects.update(created_at=timezone.now() - timedelta(days=120))
+        call_command('tier_media', stdout=io.StringIO())
+        return list(FileVersion.objects.order_by('id'))
+
+    def pack(self, *args):
+        out = io.StringIO()
+        call_command('pack_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_small_archived_blobs_packed(self):
+        """Test that small archived blobs move into packs with an offset index"""
+        versions = self.archive(b"alpha", b"bravo", b"x" * 64)
+        self.assertIn('Would pack 2 blobs', self.pack('--dry-run', '--max-blob-bytes=10'))
+        self.assertIn('Packed 2 blobs (10\xa0bytes) into 1 packs; 2 versions are packed',
+                      self.pack('--max-blob-bytes=10'))
+
+        pack = Pack.objects.get()
+        self.assertEqual((pack.size, pack.blob_count), (10, 2))
+        entries = list(pack.entries.order_by('offset').values_list('name', 'offset', 'length'))
+        self.assertEqual(entries, [(versions[0].file_path.name, 0, 5), (versions[1].file_path.name, 5, 5)])
+        self.assertFalse(cold_storage().exists(versions[0].file_path.name))
+        with open(default_storage.path(pack.name[:-len('.pack')] + '.idx')) as index:
+            self.assertEqual([json.loads(line)['offset'] for line in index], [0, 5])
+
+        versions[2].refresh_from_db()
+        self.assertEqual(versions[2].storage_tier, COLD)
+
+    def test_pack_target_size_starts_new_packs(self):
+        """Test that a pack is closed once it reaches the target size"""
+        self.archive(b"aaaa", b"bbbb", b"cccc")
+        self.assertIn('into 2 packs', self.pack('--pack-bytes=8'))
+        self.assertEqual(sorted(Pack.objects.values_list('blob_count', flat=True)), [1, 2])
+
+    def test_packed_blob_downloaded_and_extracted(self):
+        """Test that downloads and text extraction read packed blobs in place"""
+        first, second = self.archive(b"first note", b"second note")
+        self.pack()
+        second.refresh_from_db()
+        self.assertEqual(second.storage_tier, PACKED)
+
+        token = Token.objects.get_or_create(user=self.user1)[0].key
+        url = reverse('file_download', kwargs={'path': second.virtual_path})
+        response = self.client.get(url, {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"second note")
+        self.assertEqual(extract_text(second), "second note")
+        second.refresh_from_db()
+        self.assertEqual(second.storage_tier, PACKED)
+
+    def test_packed_blob_is_seekable(self):
+        """Test that a packed blob reads only its own window of the pack"""
+        first, second = self.archive(b"0123456789", b"abcdefghij")
+        self.pack()
+        with open_packed(second.file_path.name) as blob:
+            self.assertEqual(blob.read(), b"abcdefghij")
+            blob.seek(-4, io.SEEK_END)
+            self.assertEqual(blob.read(2), b"gh")
+            blob.seek(0)
+            self.assertEqual(blob.read(3), b"abc")
+
+    def test_corrupt_blob_skipped(self):
+        """Test that a blob not matching its checksum stays in the archival tier"""
+        first, second = self.archive(b"intact", b"damaged")
+        with open(cold_storage().path(second.file_path.name), "wb") as f:
+            f.write(b"tampered")
+        output = self.pack()
+        self.assertIn(f'Skipped missing or corrupt blob: {second.file_path.name}', output)
+        self.assertIn('Packed 1 blobs', output)
+        second.refresh_from_db()
+        self.assertEqual(second.storage_tier, COLD)
+
+    def test_scrub_checks_packed_blobs(self):
+        """Test that the scrubber hashes packed blobs within their pack"""
+        self.archive(b"one", b"two")
+        self.pack()
+        out = io.StringIO()
+        call_command('scrub_media', stdout=out)
+        self.assertIn('Checked 2 blobs: 0 missing, 0 corrupt', out.getvalue())
+
+        pack = Pack.objects.get()
+        with open(default_storage.path(pack.name), "r+b") as f:
+            f.seek(3)
+            f.write(b"TWO")
+        call_command('scrub_media', stdout=out)
+        self.assertIn('Checked 2 blobs: 0 missing, 1 corrupt', out.getvalue())
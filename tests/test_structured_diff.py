@@ -0,0 +1,207 @@
+# src/tests/test_structured_diff.py
+"""
+Test cases for the structure-aware comparison
+"""
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from propylon_document_manager.file_versions.models import FileVersion
+from propylon_document_manager.utils.minhash import LSHIndex, MinHasher, shingles, similarity
+from propylon_document_manager.utils.structured_diff import segment, structured_diff
+from .base import BaseAPITestCase
+
+ACT = """An Act to regulate widgets.
+
+Section 1. Short title
+This Act may be cited as the Widgets Act 2026.
+
+Section 2. Definitions
+In this Act "widget" means any small mechanical device used in manufacturing.
+
+Section 3. Licensing
+A person shall not sell widgets without a licence issued by the Minister under this section.
+
+Section 4. Penalties
+A person who contravenes section 3 is liable to a fine not exceeding 5000 euro.
+"""
+
+AMENDED_ACT = """An Act to regulate widgets.
+
+Section 1. Short title
+This Act may be cited as the Widgets Act 2026.
+
+Section 2. Definitions
+In this Act "widget" means any small mechanical device used in manufacturing.
+
+Section 3. Registration
+Every seller of widgets shall register with the Minister before trading begins.
+
+Section 4. Licensing
+A person shall not sell widgets without a licence issued by the Minister under this section.
+
+Section 5. Penalties
+A person who contravenes section 4 is liable to a fine not exceeding 10000 euro.
+"""
+
+
+class MinHashTest(SimpleTestCase):
+    """Test cases for MinHash signatures and the LSH index"""
+
+    def test_similarity_estimates_jaccard(self):
+        """Test that similar texts agree on more signature positions than unrelated ones"""
+        hasher = MinHasher(128)
+        base = hasher.signature(shingles("the tenant shall pay the rent on the first day of each month"))
+        close = hasher.signature(shingles("the tenant shall pay the rent on the first day of every month"))
+        other = hasher.signature(shingles("notices must be delivered by registered post to the landlord"))
+        self.assertGreater(similarity(base, close), 0.4)
+        self.assertLess(similarity(base, other), 0.1)
+        self.assertEqual(similarity(base, base), 1.0)
+
+    def test_lsh_finds_near_duplicates(self):
+        """Test that the index returns similar signatures and skips unrelated ones"""
+        hasher = MinHasher(64)
+        index = LSHIndex(32)
+        index.add("lease", hasher.signature(shingles("the tenant shall pay the rent on the first day of each month")))
+        index.add("notice", hasher.signature(shingles("notices must be delivered by registered post")))
+        query = hasher.signature(shingles("the tenant shall pay the rent on the first day of every month"))
+        self.assertEqual(index.candidates(query), {"lease"})
+
+
+class StructuredDiffTest(SimpleTestCase):
+    """Test cases for segmenting and aligning legal texts"""
+
+    def test_segment_headings(self):
+        """Test that section, article and numbered clause headings start blocks"""
+        blocks = segment(
+            "Preamble text\n\nArticle IV - Scope\nApplies widely.\n\n§ 12 Fees\nFees apply.\n\n"
+            "3.1 Notices\nIn writing.\n\n## 2. Term\nOne year.\nThe rate rises by\n1.5 per cent yearly."
+        )
+        self.assertEqual(
+            [(block.label, block.title) for block in blocks],
+            [("", ""), ("Article IV", "Scope"), ("§ 12", "Fees"), ("3.1", "Notices"), ("2", "Term")],
+        )
+        self.assertEqual(blocks[-1].paragraphs, ["One year. The rate rises by 1.5 per cent yearly."])
+
+    def test_inserted_section_renumbers_instead_of_shifting(self):
+        """Test that a section inserted mid-document leaves the later sections paired"""
+        result = structured_diff(ACT, AMENDED_ACT)
+        self.assertEqual(
+            [(block['status'], block['right'] and block['right']['label']) for block in result['blocks']],
+            [
+                ("equal", ""), ("equal", "Section 1"), ("equal", "Section 2"), ("added", "Section 3"),
+                ("equal", "Section 4"), ("modified", "Section 5"),
+            ],
+        )
+        self.assertEqual(result['summary']['renumbered'], 2)
+        penalties = result['blocks'][-1]
+        self.assertEqual(penalties['left']['label'], "Section 4")
+        words = penalties['changes'][0]['words']
+        self.assertEqual(
+            [(change['left'], change['right']) for change in words if change['op'] != 'equal'],
+            [("3", "4"), ("5000", "10000")],
+        )
+
+    def test_moved_and_removed_sections(self):
+        """Test that reordered sections are flagged as moved and deleted ones are kept in place"""
+        left = "Section 1. Alpha\nFirst clause body text here.\n\nSection 2. Beta\nSecond clause body text here.\n\n" \
+               "Section 3. Gamma\nThird clause body text here."
+        right = "Section 1. Gamma\nThird clause body text here.\n\n" \
+                "Section 2. Alpha\nFirst clause body text here."
+        result = structured_diff(left, right)
+        self.assertEqual(
+            [(block['status'], block.get('moved'), (block['left'] or {}).get('title')) for block in result['blocks']],
+            [("equal", True, "Gamma"), ("equal", False, "Alpha"), ("removed", None, "Beta")],
+        )
+
+    def test_rewritten_section_paired_by_number(self):
+        """Test that a section rewritten beyond recognition is still compared with its old text"""
+        left = "Section 1. Scope\nThis Act applies to widgets.\n\nSection 2\nOld text about licensing fees.\n\n" \
+               "Section 3. Commencement\nThis Act commences on enactment."
+        right = "Section 1. Scope\nThis Act applies to widgets.\n\n" \
+                "Section 2\nEntirely new provisions on exports.\n\n" \
+                "Section 3. Commencement\nThis Act commences on enactment."
+        statuses = [block['status'] for block in structured_diff(left, right)['blocks']]
+        self.assertEqual(statuses, ["equal", "modified", "equal"])
+
+    def test_empty_headings_paired_by_number_only(self):
+        """Test that headings without a title or body aren't paired with each other as identical content"""
+        def labels(left, right):
+            return [
+                (block['status'], (block['left'] or {}).get('label'), (block['right'] or {}).get('label'))
+                for block in structured_diff(left, right)['blocks']
+            ]
+
+        self.assertEqual(
+            labels(
+                "Section 1. Scope\nApplies to widgets.\n\nSection 2.",
+                "Section 1.\n\nSection 2. Scope\nApplies to widgets.",
+            ),
+            [("added", None, "Section 1"), ("equal", "Section 1", "Section 2"), ("removed", "Section 2", None)],
+        )
+        self.assertEqual(
+            labels("Section 1.\n\nSection 2.", "Section 1.\n\nSection 2."),
+            [("equal", "Section 1", "Section 1"), ("equal", "Section 2", "Section 2")],
+        )
+
+
+class StructuredCompareAPITest(BaseAPITestCase):
+    """Test cases for /api/compare/?mode=structure"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.left = self.create_version("act.txt", ACT.encode(), "act-v1")
+        self.right = self.create_version("act.txt", AMENDED_ACT.encode(), "act-v2")
+        self.url = reverse('file_compare')
+
+    def create_version(self, name, content, checksum):
+        return FileVersion.objects.create(
+            file_name=name,
+            version_number=1,
+            file_path=self.create_test_file(name, content),
+            uploader=self.user1,
+            virtual_path=f"/acts/{checksum}/{name}",
+            mime_type="text/plain",
+            checksum=checksum,
+        )
+
+    def compare(self, **params):
+        return self.client.get(self.url, {'left_id': self.left.id, 'right_id': self.right.id, **params})
+
+    def test_structure_mode(self):
+        """Test that the structure mode returns aligned blocks with a summary"""
+        self.authenticate_user1()
+        response = self.compare(mode='structure')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['mode'], 'structure')
+        self.assertEqual(response.data['left_file'], {'id': self.left.id, 'name': 'act.txt'})
+        self.assertEqual(response.data['summary']['added'], 1)
+        self.assertEqual(len(response.data['blocks']), 6)
+
+    def test_results_cached_per_checksum_pair(self):
+        """Test that repeated comparisons of the same contents reuse the cached result"""
+        self.authenticate_user1()
+        first = self.compare(mode='structure').data
+        with mock.patch(
+            "propylon_document_manager.utils.structured_diff.structured_diff", side_effect=AssertionError
+        ):
+            second = self.compare(mode='structure').data
+            copy = self.create_version("copy.txt", ACT.encode(), "act-v1")
+            response = self.client.get(self.url, {'left_id': copy.id, 'right_id': self.right.id, 'mode': 'structure'})
+        self.assertEqual(first['blocks'], second['blocks'])
+        self.assertEqual(response.data['blocks'], first['blocks'])
+
+    def test_unknown_mode_rejected(self):
+        """Test that unsupported modes are rejected"""
+        self.authenticate_user1()
+        self.assertEqual(self.compare(mode='words').status_code, 400)
+
+    def test_structure_mode_checks_permissions(self):
+        """Test that users can't compare documents they can't view"""
+        self.authenticate_user2()
+        self.assertEqual(self.compare(mode='structure').status_code, 403)
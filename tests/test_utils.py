@@ -3,6 +3,7 @@
 Test cases for utility functions
 """
 
+import io
 import os
 import tempfile
 from unittest.mock import Mock, patch, mock_open
@@ -32,8 +33,8 @@ class FileManagementUtilsTest(TestCase):
         self.assertTrue(path.endswith('.pdf'))
         self.assertIn('test-document', path)  # Slugified base name
         
-        # Check date prefix (YYYYMMDD format)
-        date_prefix = path[:8]
+        # Check date prefix (YYYYMMDD format) of the name below the shard directories
+        date_prefix = os.path.basename(path)[:8]
         self.assertEqual(len(date_prefix), 8)
         self.assertTrue(date_prefix.isdigit())
         
@@ -60,7 +61,7 @@ class FileManagementUtilsTest(TestCase):
         # All should have same date prefix and extension
         for path in paths:
             self.assertTrue(path.endswith('.txt'))
-            self.assertEqual(path[:8], datetime.now().strftime("%Y%m%d"))
+            self.assertEqual(os.path.basename(path)[:8], datetime.now().strftime("%Y%m%d"))
     
         """Test handling of special characters in filename"""
         from propylon_document_manager.utils.file_management import unique_file_upload_path
@@ -290,15 +291,22 @@ class FileExtractionUtilsTest(BaseTestCase):
         from propylon_document_manager.utils.file_extraction import extract_text
         
         # Mock ODT content
-        odt_xml = b'<?xml version="1.0"?><document>ODT content here</document>'
+        odt_xml = (
+            b'<?xml version="1.0"?>'
+            b'<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+            b'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+            b'<office:body><office:text>'
+            b'<text:h>Heading</text:h>'
+            b'<text:p>ODT <text:span>content</text:span><text:s text:c="2"/>here</text:p>'
+            b'<text:p/>'
+            b'</office:text></office:body></office:document-content>'
+        )
         
-        mock_file = Mock()
-        mock_file.read.return_value = odt_xml
-        mock_file.__enter__ = Mock(return_value=mock_file)
-        mock_file.__exit__ = Mock(return_value=None)
+        mock_file = io.BytesIO(odt_xml)
         
         mock_zip = Mock()
         mock_zip.open.return_value = mock_file
+        mock_zip.namelist.return_value = ["content.xml"]
         mock_zip.__enter__ = Mock(return_value=mock_zip)
         mock_zip.__exit__ = Mock(return_value=None)
         
@@ -315,7 +323,8 @@ class FileExtractionUtilsTest(BaseTestCase):
         )
         
         extracted_text = extract_text(file_version)
-        self.assertEqual(extracted_text, odt_xml.decode('utf-8'))
+        # Paragraph text only, without markup
+        self.assertEqual(extracted_text, "Heading\n\nODT content  here")
     
     def test_extract_text_file_encoding_errors(self):
         """Test text extraction with encoding errors"""
@@ -508,7 +517,7 @@ class UtilityFunctionEdgeCasesTest(BaseTestCase):
         
         # Generate path and check date consistency
         path = unique_file_upload_path(instance, filename)
-        date_part = path[:8]
+        date_part = os.path.basename(path)[:8]
         
         # Should match current date
         from datetime import datetime
@@ -517,7 +526,7 @@ class UtilityFunctionEdgeCasesTest(BaseTestCase):
         
         # Path should be deterministic for date part
         path2 = unique_file_upload_path(instance, filename)
-        date_part2 = path2[:8]
+        date_part2 = os.path.basename(path2)[:8]
         self.assertEqual(date_part, date_part2)
     
     def test_extract_text_memory_efficiency(self):
@@ -684,7 +693,7 @@ class FileSystemInteractionTest(BaseTestCase):
             pass
     
     def test_file_path_directory_creation(self):
-        """Test that file upload paths don't require directory creation"""
+        """Test that file upload paths fan out into two levels of shard directories"""
         from propylon_document_manager.utils.file_management import unique_file_upload_path
         
         instance = Mock()
@@ -696,9 +705,11 @@ class FileSystemInteractionTest(BaseTestCase):
             path = unique_file_upload_path(instance, filename)
             paths.append(path)
         
-        # All paths should be flat (no directory separators)
+        # Two levels of two hex characters above the file name
         for path in paths:
-            self.assertNotIn('/', path)
+            shard1, shard2, name = path.split('/')
+            self.assertRegex(f"{shard1}{shard2}", r'^[0-9a-f]{4}$')
+            self.assertTrue(name.endswith('.txt'))
             self.assertNotIn('\\', path)
     
     def test_file_path_length_limits(self):